@@ -0,0 +1,73 @@
+# async_database.py
+
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+
+logger = logging.getLogger(__name__)
+
+# Все запросы к SQLite выполняются в одном выделенном потоке:
+# цикл событий не блокируется, а запись в базу остаётся последовательной.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db')
+
+
+def run_in_db_thread(func):
+    """
+    Превращает синхронную функцию работы с базой в корутину,
+    которая выполняется в потоке базы данных.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Контекст копируется, чтобы метрики относили запросы к обновлению, которое их вызвало
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
+    return wrapper
+
+
+def shutdown():
+    """
+    Дожидается завершения запросов, уже поставленных в очередь, и останавливает поток базы данных.
+    """
+    _executor.shutdown(wait=True)
+    logger.info("Поток базы данных остановлен.")
+
+
+get_all_users = run_in_db_thread(database.get_all_users)
+add_user = run_in_db_thread(database.add_user)
+get_moderators = run_in_db_thread(database.get_moderators)
+is_user_moderator = run_in_db_thread(database.is_user_moderator)
+add_game_set = run_in_db_thread(database.add_game_set)
+get_game_set = run_in_db_thread(database.get_game_set)
+get_active_game_set = run_in_db_thread(database.get_active_game_set)
+get_game_state = run_in_db_thread(database.get_game_state)
+clear_tokens = run_in_db_thread(database.clear_tokens)
+clear_game_set = run_in_db_thread(database.clear_game_set)
+add_tokens = run_in_db_thread(database.add_tokens)
+get_all_tokens = run_in_db_thread(database.get_all_tokens)
+get_token_by_id = run_in_db_thread(database.get_token_by_id)
+update_token = run_in_db_thread(database.update_token)
+update_tokens_bulk = run_in_db_thread(database.update_tokens_bulk)
+update_token_alignment = run_in_db_thread(database.update_token_alignment)
+update_token_character = run_in_db_thread(database.update_token_character)
+update_token_kill = run_in_db_thread(database.update_token_kill)
+get_red_tokens = run_in_db_thread(database.get_red_tokens)
+get_alive_tokens = run_in_db_thread(database.get_alive_tokens)
+update_token_red_neighbors = run_in_db_thread(database.update_token_red_neighbors)
+get_user_by_username = run_in_db_thread(database.get_user_by_username)
+get_user_by_id = run_in_db_thread(database.get_user_by_id)
+update_user_on_game = run_in_db_thread(database.update_user_on_game)
+reset_user_game_state = run_in_db_thread(database.reset_user_game_state)
+update_token_drunk = run_in_db_thread(database.update_token_drunk)
+make_all_tokens_sober = run_in_db_thread(database.make_all_tokens_sober)
+get_board_file_id = run_in_db_thread(database.get_board_file_id)
+save_board_file_id = run_in_db_thread(database.save_board_file_id)
+delete_board_file_id = run_in_db_thread(database.delete_board_file_id)
+add_board_history = run_in_db_thread(database.add_board_history)
+get_board_history = run_in_db_thread(database.get_board_history)
+load_persistence = run_in_db_thread(database.load_persistence)
+save_persistence = run_in_db_thread(database.save_persistence)
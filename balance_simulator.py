@@ -0,0 +1,348 @@
+# balance_simulator.py
+"""
+Симулятор баланса: разыгрывает партии для всех tokens_count из POSITIONS_MAP и red_count от 1 до 4
+по правилам бота (execute_token_player, confirm_kill, red_won) и считает долю побед синих.
+
+    python -m balance_simulator --games 100000
+    python -m balance_simulator --player suspicion --demon witness --bluff random --output balance.json
+    python -m balance_simulator --games 100000 --table balance_table.json
+
+Партии считаются пачками в массивах NumPy: одна строка массива - одна партия.
+NumPy нужен только для симулятора (requirements-dev.txt), боту он не требуется.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from distributions import POSITIONS_MAP
+
+RED_COUNTS = (1, 2, 3, 4)
+BATCH_SIZE = 65536
+
+
+class Batch:
+    """
+    Состояние пачки партий. Массивы формы (партии, жетоны), позиции жетонов с 0.
+    shown - числа, которые видит игрок (-1 у мёртвых жетонов).
+    """
+    __slots__ = ('size', 'tokens_count', 'red', 'alive', 'demon', 'shown', 'left', 'right',
+                 'done', 'blue_won', 'days')
+
+    def __init__(self, size, tokens_count, red_count, rng):
+        self.size = size
+        self.tokens_count = tokens_count
+        # Случайная рассадка, как в random_red_set: первый из выбранных жетонов - демон
+        order = np.argsort(rng.random((size, tokens_count)), axis=1)
+        self.red = np.zeros((size, tokens_count), dtype=bool)
+        np.put_along_axis(self.red, order[:, :red_count], True, axis=1)
+        self.demon = order[:, 0]
+        self.alive = np.ones((size, tokens_count), dtype=bool)
+        self.shown = np.zeros((size, tokens_count), dtype=np.int8)
+        self.left = self.right = None
+        self.done = np.zeros(size, dtype=bool)
+        self.blue_won = np.zeros(size, dtype=bool)
+        self.days = np.zeros(size, dtype=np.int32)
+
+    def rows(self):
+        return np.arange(self.size)
+
+    def keep(self, mask):
+        """
+        Оставляет в пачке только партии из mask, чтобы не считать уже законченные.
+        """
+        self.size = int(mask.sum())
+        self.red = self.red[mask]
+        self.alive = self.alive[mask]
+        self.demon = self.demon[mask]
+        self.shown = self.shown[mask]
+        self.done = self.done[mask]
+        self.blue_won = self.blue_won[mask]
+        self.days = self.days[mask]
+
+    def update_neighbors(self):
+        """
+        Находит живых соседей через таблицу по маске живых жетонов.
+        """
+        left_table, right_table = neighbor_tables(self.tokens_count)
+        mask = self.alive.astype(np.int32) @ (1 << np.arange(self.tokens_count, dtype=np.int32))
+        self.left = left_table[mask]
+        self.right = right_table[mask]
+
+
+def alive_neighbors(alive):
+    """
+    Для каждой позиции возвращает ближайших живых соседей слева и справа по кругу.
+    Если живой жетон один, его соседом считается он сам (как в NeighborRing).
+    """
+    size, tokens_count = alive.shape
+    positions = np.arange(2 * tokens_count)
+    doubled = np.concatenate([alive, alive], axis=1)
+
+    last_alive = np.where(doubled, positions, -1)
+    np.maximum.accumulate(last_alive, axis=1, out=last_alive)
+    left = last_alive[:, tokens_count - 1:2 * tokens_count - 1] % tokens_count
+
+    next_alive = np.where(doubled, positions, 2 * tokens_count)[:, ::-1]
+    next_alive = np.minimum.accumulate(next_alive, axis=1)[:, ::-1]
+    right = next_alive[:, 1:tokens_count + 1] % tokens_count
+    return left, right
+
+
+_neighbor_tables = {}
+
+
+def neighbor_tables(tokens_count):
+    """
+    Таблицы соседей для всех 2**tokens_count масок живых жетонов: строка маски -> левые и правые соседи.
+    Строятся один раз на tokens_count.
+    """
+    tables = _neighbor_tables.get(tokens_count)
+    if tables is None:
+        masks = np.arange(1 << tokens_count)
+        alive = (masks[:, None] >> np.arange(tokens_count) & 1).astype(bool)
+        left, right = alive_neighbors(alive)
+        tables = _neighbor_tables[tokens_count] = (left.astype(np.int8), right.astype(np.int8))
+    return tables
+
+
+def true_red_neighbors(batch):
+    """
+    Настоящее число красных живых соседей каждого жетона (то, что показывает трезвый синий жетон).
+    """
+    red_alive = batch.red & batch.alive
+    counts = (np.take_along_axis(red_alive, batch.left, axis=1).astype(np.int8)
+              + np.take_along_axis(red_alive, batch.right, axis=1))
+    counts[batch.left == np.arange(batch.tokens_count)] = 0
+    return counts
+
+
+def _random_choice(mask, rng):
+    """
+    Случайная позиция среди mask в каждой строке; -1, если выбирать не из чего.
+    """
+    scores = np.where(mask, rng.random(mask.shape), -1.0)
+    choice = scores.argmax(axis=1)
+    choice[~mask.any(axis=1)] = -1
+    return choice
+
+
+# Стратегии игрока: какой живой жетон казнить днём.
+
+def player_random(batch, rng):
+    return _random_choice(batch.alive, rng)
+
+
+def player_suspicion(batch, rng):
+    """
+    Казнит жетон, соседи которого показывают больше всего красных соседей.
+    """
+    shown = np.where(batch.alive, batch.shown, 0)
+    suspicion = (np.take_along_axis(shown, batch.left, axis=1)
+                 + np.take_along_axis(shown, batch.right, axis=1)).astype(np.float64)
+    suspicion += rng.random(suspicion.shape) * 0.5
+    suspicion[~batch.alive] = -1
+    return suspicion.argmax(axis=1)
+
+
+# Стратегии демона: какой жетон убить ночью (демона модератор не убивает).
+
+def demon_random(batch, rng):
+    blue_alive = batch.alive & ~batch.red
+    choice = _random_choice(blue_alive, rng)
+    fallback = batch.alive.copy()
+    fallback[batch.rows(), batch.demon] = False
+    missing = choice == -1
+    choice[missing] = _random_choice(fallback[missing], rng)
+    return choice
+
+
+def demon_witness(batch, rng):
+    """
+    Убивает синий жетон, который видит больше всего красных: он даёт игроку больше информации.
+    """
+    blue_alive = batch.alive & ~batch.red
+    scores = true_red_neighbors(batch) + rng.random(blue_alive.shape) * 0.5
+    scores[~blue_alive] = -1
+    choice = scores.argmax(axis=1)
+    missing = ~blue_alive.any(axis=1)
+    choice[missing] = demon_random(batch, rng)[missing]
+    return choice
+
+
+# Стратегии блефа: что показывают красные жетоны.
+
+def bluff_random(batch, rng, true_counts):
+    return rng.integers(0, 3, size=true_counts.shape, dtype=np.int8)
+
+
+def bluff_zero(batch, rng, true_counts):
+    return np.zeros_like(true_counts)
+
+
+def bluff_truthful(batch, rng, true_counts):
+    return true_counts
+
+
+PLAYER_STRATEGIES = {'random': player_random, 'suspicion': player_suspicion}
+DEMON_STRATEGIES = {'random': demon_random, 'witness': demon_witness}
+BLUFF_STRATEGIES = {'random': bluff_random, 'zero': bluff_zero, 'truthful': bluff_truthful}
+
+
+def refresh_board(batch, rng, bluff, drunk):
+    """
+    Пересчитывает числа на карте после смертей: синие показывают правду, красные блефуют,
+    один случайный живой синий жетон может быть пьяным и показывать случайное число.
+    """
+    batch.update_neighbors()
+    counts = true_red_neighbors(batch)
+    shown = np.where(batch.red, bluff(batch, rng, counts), counts)
+    if drunk:
+        drunk_token = _random_choice(batch.alive & ~batch.red, rng)
+        rows = np.flatnonzero(drunk_token >= 0)
+        shown[rows, drunk_token[rows]] = rng.integers(0, 3, size=rows.size, dtype=np.int8)
+    batch.shown = np.where(batch.alive, shown, -1).astype(np.int8)
+
+
+def simulate_batch(size, tokens_count, red_count, rng, player, demon, bluff, drunk):
+    """
+    Разыгрывает size партий до конца. Возвращает (число побед синих, сумма длительностей в днях).
+    Законченные партии после каждого круга убираются из пачки.
+    """
+    batch = Batch(size, tokens_count, red_count, rng)
+    refresh_board(batch, rng, bluff, drunk)
+    blue_wins = 0
+    days = 0
+
+    while batch.size:
+        rows = batch.rows()
+
+        # День: игрок казнит жетон (execute_token_player)
+        executed = player(batch, rng)
+        batch.days += 1
+        batch.blue_won = executed == batch.demon
+        batch.done = batch.blue_won.copy()
+        active = ~batch.done
+        batch.alive[rows[active], executed[active]] = False
+        # red_won: в игре осталось два жетона или меньше
+        batch.done |= batch.alive.sum(axis=1) <= 2
+        active = ~batch.done
+
+        # Ночь: демон убивает жетон (confirm_kill)
+        batch.update_neighbors()
+        victim = demon(batch, rng)
+        killed = active & (victim >= 0)
+        batch.alive[rows[killed], victim[killed]] = False
+        batch.done |= batch.alive.sum(axis=1) <= 2
+
+        blue_wins += int(batch.blue_won.sum())
+        days += int(batch.days[batch.done].sum())
+        batch.keep(~batch.done)
+        if batch.size:
+            # Утром модератор вводит новый блеф красных и выбирает пьяный жетон
+            refresh_board(batch, rng, bluff, drunk)
+
+    return blue_wins, days
+
+
+def simulate(tokens_count, red_count, games, player='suspicion', demon='random', bluff='random',
+             drunk=True, seed=0, batch_size=BATCH_SIZE):
+    """
+    Считает долю побед синих и среднюю длительность партии в днях для одной конфигурации.
+    """
+    if np is None:
+        raise RuntimeError("Для симулятора баланса нужен NumPy: pip install -r requirements-dev.txt")
+    rng = np.random.default_rng(seed)
+    player_strategy = PLAYER_STRATEGIES[player]
+    demon_strategy = DEMON_STRATEGIES[demon]
+    bluff_strategy = BLUFF_STRATEGIES[bluff]
+
+    blue_wins = 0
+    days = 0
+    remaining = games
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        batch_wins, batch_days = simulate_batch(
+            size, tokens_count, red_count, rng, player_strategy, demon_strategy, bluff_strategy, drunk
+        )
+        blue_wins += batch_wins
+        days += batch_days
+        remaining -= size
+
+    return {
+        'tokens_count': tokens_count,
+        'red_count': red_count,
+        'drunk': drunk,
+        'games': games,
+        'blue_win_rate': blue_wins / games,
+        'mean_days': days / games,
+    }
+
+
+def sweep(games, player='suspicion', demon='random', bluff='random', drunk_options=(False, True), seed=0):
+    """
+    Прогоняет все tokens_count из POSITIONS_MAP, red_count от 1 до 4 и варианты с пьяным жетоном.
+    """
+    results = []
+    for tokens_count in sorted(POSITIONS_MAP):
+        for red_count in RED_COUNTS:
+            for drunk in drunk_options:
+                config_seed = seed * 1_000_003 + tokens_count * 100 + red_count * 10 + int(drunk)
+                results.append(simulate(tokens_count, red_count, games, player, demon, bluff, drunk, config_seed))
+    return results
+
+
+def print_table(results):
+    print(f"{'жетонов':>8} {'красных':>8} {'пьяный':>7} {'победы синих':>13} {'дней':>6}")
+    for result in results:
+        print(f"{result['tokens_count']:>8} {result['red_count']:>8} {'да' if result['drunk'] else 'нет':>7} "
+              f"{result['blue_win_rate']:>12.1%} {result['mean_days']:>6.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Симулятор баланса empaths-tg-bot")
+    parser.add_argument('--games', type=int, default=100_000, help="Партий на каждую конфигурацию")
+    parser.add_argument('--player', choices=sorted(PLAYER_STRATEGIES), default='suspicion')
+    parser.add_argument('--demon', choices=sorted(DEMON_STRATEGIES), default='random')
+    parser.add_argument('--bluff', choices=sorted(BLUFF_STRATEGIES), default='random')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Файл для таблицы в JSON")
+    parser.add_argument('--table', help="Собрать файл таблицы баланса для бота (balance_table.json)")
+    args = parser.parse_args(argv)
+
+    if np is None:
+        print("Для симулятора баланса нужен NumPy: pip install -r requirements-dev.txt", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    results = sweep(args.games, args.player, args.demon, args.bluff, seed=args.seed)
+    elapsed = time.perf_counter() - started
+    print_table(results)
+    total = sum(result['games'] for result in results)
+    print(f"\n{total} партий за {elapsed:.1f} с ({total / elapsed:,.0f} партий в секунду)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump({
+                'player': args.player,
+                'demon': args.demon,
+                'bluff': args.bluff,
+                'games': args.games,
+                'results': results,
+            }, output_file, ensure_ascii=False, indent=2)
+    if args.table:
+        # Импорт здесь: модуль таблицы при импорте загружает текущий файл, который сейчас пересобирается
+        from balance_table import write_balance_table
+        write_balance_table(results, args.table, games=args.games, player=args.player,
+                            demon=args.demon, bluff=args.bluff, seed=args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
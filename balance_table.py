@@ -0,0 +1,119 @@
+# balance_table.py
+"""
+Таблица баланса, заранее посчитанная balance_simulator: доля побед синих и средняя длина партии
+для каждой пары (tokens_count, red_count) с пьяным жетоном и без.
+
+Файл balance_table.json лежит рядом с distributions.py и пересобирается командой
+
+    python -m balance_simulator --games 100000 --table balance_table.json
+
+Бот читает его один раз при импорте модуля; поиск по таблице - обращение к словарю.
+"""
+
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+BALANCE_TABLE_VERSION = 1
+BALANCE_TABLE_PATH = os.getenv(
+    'BALANCE_TABLE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'balance_table.json')
+)
+COLUMNS = ['tokens_count', 'red_count', 'drunk', 'blue_win_rate', 'mean_days']
+
+
+def write_balance_table(results, path, **meta):
+    """
+    Записывает результаты sweep() в файл таблицы. meta - параметры симуляции (стратегии, число партий).
+    """
+    rows = [
+        [result['tokens_count'], result['red_count'], int(result['drunk']),
+         round(result['blue_win_rate'], 4), round(result['mean_days'], 2)]
+        for result in results
+    ]
+    data = {'version': BALANCE_TABLE_VERSION, **meta, 'columns': COLUMNS, 'rows': rows}
+    with open(path, 'w', encoding='utf-8') as table_file:
+        table_file.write(_format_balance_table(data))
+
+
+def _format_balance_table(data):
+    """
+    Текст файла таблицы: JSON-объект с отступами, но каждая строка rows на одной строке файла,
+    чтобы изменения таблицы было удобно смотреть в diff.
+    """
+    fields = [
+        f"  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}"
+        for key, value in data.items() if key != 'rows'
+    ]
+    rows = ",\n".join(f"    {json.dumps(row)}" for row in data['rows'])
+    fields.append(f'  "rows": [\n{rows}\n  ]')
+    return "{\n" + ",\n".join(fields) + "\n}\n"
+
+
+def load_balance_table(path=BALANCE_TABLE_PATH):
+    """
+    Читает файл таблицы. Возвращает (meta, {(tokens_count, red_count, drunk): (blue_win_rate, mean_days)}).
+    Если файла нет или его версия не совпадает, возвращает пустую таблицу: бот работает и без неё.
+    """
+    try:
+        with open(path, encoding='utf-8') as table_file:
+            data = json.load(table_file)
+    except FileNotFoundError:
+        logger.warning(f"Таблица баланса {path} не найдена.")
+        return {}, {}
+    except (OSError, ValueError) as e:
+        logger.error(f"Не удалось прочитать таблицу баланса {path}: {e}")
+        return {}, {}
+
+    if data.get('version') != BALANCE_TABLE_VERSION or data.get('columns') != COLUMNS:
+        logger.warning(f"Таблица баланса {path} версии {data.get('version')} не поддерживается, "
+                       f"ожидается версия {BALANCE_TABLE_VERSION}.")
+        return {}, {}
+
+    table = {
+        (tokens_count, red_count, bool(drunk)): (blue_win_rate, mean_days)
+        for tokens_count, red_count, drunk, blue_win_rate, mean_days in data['rows']
+    }
+    meta = {key: value for key, value in data.items() if key not in ('columns', 'rows')}
+    return meta, table
+
+
+class BalanceTable:
+    """
+    Загруженная таблица баланса.
+    """
+
+    def __init__(self, path=BALANCE_TABLE_PATH):
+        self.meta, self.table = load_balance_table(path)
+        if self.table:
+            logger.info(f"Загружена таблица баланса: {len(self.table)} конфигураций, "
+                        f"{self.meta.get('games')} партий на конфигурацию.")
+
+    def lookup(self, tokens_count, red_count, drunk):
+        """
+        Возвращает {'blue_win_rate', 'mean_days'} или None, если конфигурации нет в таблице.
+        """
+        row = self.table.get((tokens_count, red_count, drunk))
+        if row is None:
+            return None
+        return {'blue_win_rate': row[0], 'mean_days': row[1]}
+
+    def describe(self, tokens_count, red_count):
+        """
+        Текст для модератора о балансе выбранных настроек или пустая строка, если данных нет.
+        """
+        sober = self.lookup(tokens_count, red_count, False)
+        drunk = self.lookup(tokens_count, red_count, True)
+        if sober is None and drunk is None:
+            return ""
+        lines = [f"Баланс по симуляции ({tokens_count} жетонов, {red_count} красных):"]
+        for label, row in (("без пьяного", sober), ("с пьяным", drunk)):
+            if row is not None:
+                lines.append(f"{label}: синие побеждают в {row['blue_win_rate']:.0%} партий, "
+                             f"партия длится в среднем {row['mean_days']:.1f} дн.")
+        return "\n".join(lines)
+
+
+# Глобальный экземпляр таблицы баланса
+balance_table = BalanceTable()
@@ -0,0 +1,75 @@
+# benchmarks/bench_database.py
+
+import itertools
+from benchmarks.common import create_game, MODERATOR_ID, PLAYER_ID
+
+
+def run(runner):
+    """
+    Каждая функция database.py по отдельности, плюс один вызов через поток базы данных
+    (async_database), чтобы видеть стоимость перехода в поток.
+    """
+    import database
+    import async_database
+
+    game_id, red_ids, demon = create_game(16, 4, seed=2)
+    blue_id = next(token_id for token_id in range(1, 17) if token_id not in red_ids)
+    counter = itertools.count(10_000)
+
+    reads = {
+        'get_all_users': lambda: database.get_all_users(),
+        'get_moderators': lambda: database.get_moderators(),
+        'is_user_moderator': lambda: database.is_user_moderator(MODERATOR_ID),
+        'get_user_by_id': lambda: database.get_user_by_id(PLAYER_ID),
+        'get_user_by_username': lambda: database.get_user_by_username('bench_player'),
+        'get_game_set': lambda: database.get_game_set(game_id),
+        'get_active_game_set': lambda: database.get_active_game_set(MODERATOR_ID),
+        'get_all_tokens': lambda: database.get_all_tokens(game_id),
+        'get_token_by_id': lambda: database.get_token_by_id(game_id, blue_id),
+        'get_red_tokens': lambda: database.get_red_tokens(game_id),
+        'get_alive_tokens': lambda: database.get_alive_tokens(game_id),
+        'get_board_file_id': lambda: database.get_board_file_id('bench-board'),
+        'load_persistence': lambda: database.load_persistence('user_data'),
+    }
+    writes = {
+        'add_user': lambda: database.add_user('bench_player', PLAYER_ID),
+        'update_user_on_game': lambda: database.update_user_on_game(PLAYER_ID, True),
+        'reset_user_game_state': lambda: database.reset_user_game_state(PLAYER_ID),
+        'update_token': lambda: database.update_token(game_id, blue_id, 'blue', 'townfolk', 1),
+        'update_token_alignment': lambda: database.update_token_alignment(game_id, blue_id, 'blue'),
+        'update_token_character': lambda: database.update_token_character(game_id, blue_id, 'townfolk'),
+        'update_token_red_neighbors': lambda: database.update_token_red_neighbors(game_id, blue_id, 2),
+        'update_token_drunk': lambda: database.update_token_drunk(game_id, blue_id),
+        'make_all_tokens_sober': lambda: database.make_all_tokens_sober(game_id),
+        'update_tokens_bulk': lambda: database.update_tokens_bulk(
+            game_id, {token_id: {'red_neighbors': next(counter) % 3} for token_id in range(1, 17)}),
+        'save_board_file_id': lambda: database.save_board_file_id('bench-board', 'bench-file-id'),
+        'save_persistence': lambda: database.save_persistence([('user_data', '1', b'x' * 256)], []),
+    }
+    for name, func in itertools.chain(reads.items(), writes.items()):
+        runner.bench(f"database.{name}", func)
+
+    # Функции, меняющие набор строк, измеряются парами с восстановлением состояния в setup
+    def revive():
+        database.update_tokens_bulk(game_id, {blue_id: {'alive': 1}})
+    runner.bench("database.update_token_kill", lambda: database.update_token_kill(game_id, blue_id), setup=revive)
+
+    runner.bench("database.add_game_set", lambda: database.add_game_set(
+        7, 2, 'bench_player', PLAYER_ID, 'bench_moderator', MODERATOR_ID))
+
+    scratch_game = database.add_game_set(16, 4, 'bench_player', PLAYER_ID, 'bench_moderator', MODERATOR_ID)
+    runner.bench("database.add_tokens [16]",
+                 lambda: database.add_tokens(scratch_game, [('blue', 'townfolk', 0)] * 16),
+                 setup=lambda: database.clear_tokens(scratch_game))
+    def refill():
+        database.clear_tokens(scratch_game)
+        database.add_tokens(scratch_game, [('blue', 'townfolk', 0)] * 16)
+    runner.bench("database.clear_tokens [16]", lambda: database.clear_tokens(scratch_game), setup=refill)
+    runner.bench("database.delete_board_file_id", lambda: database.delete_board_file_id('bench-board'),
+                 setup=lambda: database.save_board_file_id('bench-board', 'bench-file-id'))
+    runner.bench("database.clear_game_set", lambda: database.clear_game_set(MODERATOR_ID + 1),
+                 setup=lambda: create_game(16, 4, moderator_id=MODERATOR_ID + 1))
+
+    async def threaded_read():
+        await async_database.get_token_by_id(game_id, blue_id)
+    runner.bench("async_database.get_token_by_id", threaded_read)
@@ -0,0 +1,32 @@
+# benchmarks/bench_engine.py
+
+import random
+
+
+def run(runner):
+    """
+    Партия целиком на game_engine.GameState для 7-16 жетонов: казни и убийства по очереди до победы одной из сторон.
+    """
+    from game_engine import GameState
+
+    for tokens_count in (7, 10, 13, 16):
+        red_count = max(1, tokens_count // 4)
+        rng = random.Random(tokens_count)
+        red_positions = rng.sample(range(tokens_count), red_count)
+        template = GameState([position in red_positions for position in range(tokens_count)], red_positions[0])
+        order = [position for position in rng.sample(range(tokens_count), tokens_count) if position != template.demon]
+        params = {'tokens': tokens_count, 'red': red_count}
+
+        def play():
+            state = template.copy()
+            for turn, position in enumerate(order):
+                if turn % 2:
+                    state.kill(position)
+                else:
+                    state.execute(position)
+                if state.winner:
+                    break
+            return state
+
+        runner.bench(f"engine.play_game [{tokens_count} tokens]", play, params=params)
+        runner.bench(f"engine.copy [{tokens_count} tokens]", template.copy, params=params)
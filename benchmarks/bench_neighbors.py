@@ -0,0 +1,25 @@
+# benchmarks/bench_neighbors.py
+
+from benchmarks.common import create_game
+
+
+def run(runner):
+    """
+    Пересчёт красных соседей для 7-16 жетонов: без убитых и с половиной убитых синих жетонов.
+    """
+    import database
+    from red_neighbors_handlers import count_red_neighbors_of_blue_tokens, compute_red_neighbors
+
+    for tokens_count in range(7, 17):
+        red_count = max(2, tokens_count // 4)
+        for dead_count in (0, (tokens_count - red_count) // 2):
+            params = {'tokens': tokens_count, 'red': red_count, 'dead': dead_count}
+            game_id, _, _ = create_game(tokens_count, red_count, dead_count, seed=tokens_count)
+            tokens = database.get_all_tokens(game_id)
+            suffix = f"[{tokens_count} tokens, {dead_count} dead]"
+
+            runner.bench(f"neighbors.compute {suffix}", lambda: compute_red_neighbors(tokens), params=params)
+
+            async def recount():
+                await count_red_neighbors_of_blue_tokens(game_id)
+            runner.bench(f"neighbors.count_red_neighbors_of_blue_tokens {suffix}", recount, params=params)
@@ -0,0 +1,44 @@
+# benchmarks/bench_render.py
+
+import random
+from benchmarks.common import StubBot, make_context, create_game, MODERATOR_ID, PLAYER_ID
+
+
+def run(runner):
+    """
+    Отрисовка карты: BoardRenderer напрямую и show_game_set для обоих видов,
+    с горячими кэшами (повторная раскладка) и холодными (кэши очищаются перед каждым вызовом).
+    """
+    import database
+    import render_game_set
+    from board_renderer import get_board_renderer
+    from db_connection import transaction
+
+    renderer = get_board_renderer()
+    rng = random.Random(0)
+    colors = ('lightblue', 'red', 'grey')
+
+    def render_random_board():
+        tokens_colors = [rng.choice(colors) for _ in range(16)]
+        red_neighbors = [rng.randint(0, 2) if color != 'grey' else None for color in tokens_colors]
+        renderer.render(16, tokens_colors, red_neighbors, [rng.randint(1, 16)], True)
+    runner.bench("render.board_renderer [16 tokens]", render_random_board, params={'tokens': 16})
+
+    bot = StubBot()
+    context = make_context(bot)
+    game_id, _, _ = create_game(16, 4, dead_count=3, seed=1)
+
+    def clear_caches():
+        render_game_set.board_cache.clear()
+        render_game_set.board_file_ids.clear()
+        with transaction() as cursor:
+            cursor.execute('DELETE FROM board_photos')
+
+    for moderator, chat_id, view in ((True, MODERATOR_ID, 'moderator'), (False, PLAYER_ID, 'player')):
+        params = {'tokens': 16, 'view': view}
+
+        async def show():
+            await render_game_set.show_game_set(context, chat_id, moderator=moderator, game_id=game_id)
+
+        runner.bench(f"render.show_game_set [{view}, warm]", show, params=params)
+        runner.bench(f"render.show_game_set [{view}, cold]", show, setup=clear_caches, params=params)
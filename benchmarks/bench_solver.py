@@ -0,0 +1,23 @@
+# benchmarks/bench_solver.py
+
+from benchmarks.common import create_game
+
+
+def run(runner):
+    """
+    Перебор рассадок по карте игрока для 7-16 жетонов: в начале игры и после убийства половины синих.
+    """
+    import database
+    from red_neighbors_handlers import compute_red_neighbors
+    from seating_solver import solve_seating
+
+    for tokens_count in (7, 10, 13, 16):
+        for red_count in (1, 2, 3, 4):
+            for dead_count in (0, (tokens_count - red_count) // 2):
+                params = {'tokens': tokens_count, 'red': red_count, 'dead': dead_count}
+                game_id, _, _ = create_game(tokens_count, red_count, dead_count, seed=tokens_count * 10 + red_count)
+                tokens = database.get_all_tokens(game_id)
+                for token_id, count in compute_red_neighbors(tokens).items():
+                    tokens[token_id - 1]['red_neighbors'] = count
+                suffix = f"[{tokens_count} tokens, {red_count} red, {dead_count} dead]"
+                runner.bench(f"solver.solve_seating {suffix}", lambda: solve_seating(tokens, red_count), params=params)
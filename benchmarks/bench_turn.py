@@ -0,0 +1,47 @@
+# benchmarks/bench_turn.py
+
+import itertools
+from benchmarks.common import StubBot, make_context, make_update, create_game, MODERATOR_ID, PLAYER_ID
+
+
+def run(runner):
+    """
+    Полный цикл дня и ночи: казнь игроком, ввод соседей красных жетонов модератором,
+    убийство жетона и ввод "пьяного" жетона. Каждая итерация начинается с новой игры на 16 жетонов.
+    """
+    from constants import CONFIRM_INVITE
+    from game_process_handlers import execute_token_player, reenter_red_neighbors_for_red, confirm_kill
+    from red_neighbors_handlers import get_drunk_token_number, set_drunk_red_neighbors
+
+    bot = StubBot()
+    bot_data = {}
+    seeds = itertools.count()
+    state = {}
+
+    def new_game(seed):
+        game_id, red_ids, _ = create_game(16, 4, seed=seed)
+        blue_ids = [token_id for token_id in range(1, 17) if token_id not in red_ids]
+        state['blue_ids'] = blue_ids
+        state['red_count'] = len(red_ids)
+        state['moderator'] = make_context(bot, {'game_set': {'player_username': 'bench_player'}}, bot_data)
+        state['player'] = make_context(bot, {}, bot_data)
+
+    async def day_night_cycle():
+        moderator, player, blue_ids = state['moderator'], state['player'], state['blue_ids']
+        await execute_token_player(make_update(PLAYER_ID, 'bench_player', str(blue_ids[0])), player)
+
+        await reenter_red_neighbors_for_red(make_update(MODERATOR_ID, 'bench_moderator', '/enter_neighbors'), moderator)
+        for _ in range(state['red_count']):
+            await reenter_red_neighbors_for_red(make_update(MODERATOR_ID, 'bench_moderator', '1'), moderator)
+
+        await confirm_kill(make_update(MODERATOR_ID, 'bench_moderator', str(blue_ids[1])), moderator)
+        await get_drunk_token_number(make_update(MODERATOR_ID, 'bench_moderator', str(blue_ids[2])), moderator)
+        result = await set_drunk_red_neighbors(make_update(MODERATOR_ID, 'bench_moderator', '1'), moderator)
+        if result != CONFIRM_INVITE:
+            raise RuntimeError(f"Цикл хода завершился в неожиданном состоянии {result}")
+
+    iterations = max(20, runner.iterations // 4)
+    runner.bench("turn.day_night_cycle [16 tokens, same board]", day_night_cycle,
+                 setup=lambda: new_game(0), params={'tokens': 16}, iterations=iterations)
+    runner.bench("turn.day_night_cycle [16 tokens, new board]", day_night_cycle,
+                 setup=lambda: new_game(next(seeds)), params={'tokens': 16}, iterations=iterations)
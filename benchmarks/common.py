@@ -0,0 +1,206 @@
+# benchmarks/common.py
+
+import asyncio
+import gc
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def prepare_environment():
+    """
+    Переходит во временный каталог, чтобы бенчмарки работали с отдельным empaths.db,
+    и делает модули бота доступными для импорта.
+    Возвращает путь к временному каталогу.
+    """
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    os.environ.setdefault('MODERATOR_PASSWORD', 'benchmark')
+    work_dir = tempfile.mkdtemp(prefix='empaths-bench-')
+    os.chdir(work_dir)
+    return work_dir
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def summarize(name, durations_ns, allocations, params=None):
+    """
+    Собирает результат одного бенчмарка: задержки в микросекундах и пиковые выделения памяти на вызов.
+    """
+    durations = sorted(duration / 1000 for duration in durations_ns)
+    return {
+        'name': name,
+        'params': params or {},
+        'iterations': len(durations),
+        'p50_us': round(_percentile(durations, 0.50), 2),
+        'p99_us': round(_percentile(durations, 0.99), 2),
+        'mean_us': round(statistics.fmean(durations), 2),
+        'min_us': round(durations[0], 2),
+        'max_us': round(durations[-1], 2),
+        'alloc_peak_bytes': int(statistics.median(allocations)) if allocations else 0,
+    }
+
+
+class Runner:
+    """
+    Запускает бенчмарки и копит результаты.
+    Время измеряется без tracemalloc; выделения памяти - отдельным коротким проходом с tracemalloc.
+    """
+
+    def __init__(self, iterations=200, warmup=10, alloc_iterations=20, only=None):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.alloc_iterations = alloc_iterations
+        self.only = only
+        self.results = []
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def selected(self, name):
+        return not self.only or any(pattern in name for pattern in self.only)
+
+    def bench(self, name, func, setup=None, params=None, iterations=None):
+        """
+        Измеряет синхронную функцию или корутинную функцию func().
+        setup() вызывается перед каждым вызовом и не входит в измерение.
+        """
+        if not self.selected(name):
+            return None
+        iterations = iterations or self.iterations
+        run = self._run_async if asyncio.iscoroutinefunction(func) else self._run_sync
+
+        run(func, setup, self.warmup)
+        gc.collect()
+        durations = run(func, setup, iterations)
+
+        tracemalloc.start()
+        try:
+            allocations = run(func, setup, self.alloc_iterations, trace=True)
+        finally:
+            tracemalloc.stop()
+
+        result = summarize(name, durations, allocations, params)
+        self.results.append(result)
+        print(f"{name:<55} p50 {result['p50_us']:>10.1f} us   p99 {result['p99_us']:>10.1f} us   "
+              f"alloc {result['alloc_peak_bytes'] / 1024:>8.1f} KiB")
+        return result
+
+    def _run_sync(self, func, setup, iterations, trace=False):
+        samples = []
+        for _ in range(iterations):
+            if setup:
+                setup()
+            if trace:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                func()
+                samples.append(tracemalloc.get_traced_memory()[1] - before)
+            else:
+                started = time.perf_counter_ns()
+                func()
+                samples.append(time.perf_counter_ns() - started)
+        return samples
+
+    def _run_async(self, func, setup, iterations, trace=False):
+        async def measure():
+            samples = []
+            for _ in range(iterations):
+                if setup:
+                    prepared = setup()
+                    if asyncio.iscoroutine(prepared):
+                        await prepared
+                if trace:
+                    tracemalloc.reset_peak()
+                    before = tracemalloc.get_traced_memory()[0]
+                    await func()
+                    samples.append(tracemalloc.get_traced_memory()[1] - before)
+                else:
+                    started = time.perf_counter_ns()
+                    await func()
+                    samples.append(time.perf_counter_ns() - started)
+            return samples
+        return self.loop.run_until_complete(measure())
+
+    def close(self):
+        self.loop.close()
+
+
+class StubBot:
+    """
+    Заглушка Bot API: запоминает количество вызовов и сразу возвращает ответ.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self._file_ids = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(message_id=self.calls, chat_id=chat_id, text=text)
+
+    async def send_photo(self, chat_id, photo, **kwargs):
+        self.calls += 1
+        if not isinstance(photo, str):
+            photo.read()
+        self._file_ids += 1
+        return SimpleNamespace(message_id=self.calls, photo=[SimpleNamespace(file_id=f'bench-{self._file_ids}')])
+
+
+def make_context(bot, user_data=None, bot_data=None):
+    return SimpleNamespace(bot=bot, user_data={} if user_data is None else user_data,
+                           bot_data={} if bot_data is None else bot_data)
+
+
+def make_update(user_id, username, text):
+    """
+    Минимальный Update для вызова обработчиков напрямую: effective_user и message с reply_text.
+    """
+    async def reply_text(reply, **kwargs):
+        return SimpleNamespace(text=reply)
+    user = SimpleNamespace(id=user_id, username=username, first_name=username)
+    message = SimpleNamespace(text=text, reply_text=reply_text, from_user=user)
+    return SimpleNamespace(effective_user=user, message=message)
+
+
+MODERATOR_ID = 1000
+PLAYER_ID = 2000
+
+
+def register_users():
+    """
+    Регистрирует модератора и игрока, от имени которых работают бенчмарки.
+    """
+    import database
+    database.add_user('bench_moderator', MODERATOR_ID, moderator=True)
+    database.add_user('bench_player', PLAYER_ID)
+
+
+def create_game(tokens_count, red_count, dead_count=0, seed=0, moderator_id=MODERATOR_ID, player_id=PLAYER_ID):
+    """
+    Создаёт игру с рассадкой: red_count красных жетонов (первый из них - демон)
+    и dead_count убитых синих жетонов. Возвращает (game_id, red_ids, demon_id).
+    """
+    import random
+    import database
+    rng = random.Random(seed)
+    game_id = database.add_game_set(tokens_count, red_count, 'bench_player', player_id, 'bench_moderator', moderator_id)
+    database.add_tokens(game_id, [('blue', 'townfolk', 0)] * tokens_count)
+
+    ids = list(range(1, tokens_count + 1))
+    red_ids = rng.sample(ids, red_count)
+    blue_ids = [token_id for token_id in ids if token_id not in red_ids]
+    changes = {token_id: {'alignment': 'red', 'character': 'minion'} for token_id in red_ids}
+    changes[red_ids[0]]['character'] = 'demon'
+    for token_id in rng.sample(blue_ids, min(dead_count, len(blue_ids))):
+        changes[token_id] = {'alive': 0}
+    database.update_tokens_bulk(game_id, changes)
+    return game_id, red_ids, red_ids[0]
@@ -0,0 +1,370 @@
+# benchmarks/loadtest.py
+"""
+Нагрузочный тест: много одновременных столов (модератор + игрок) гоняют настоящий
+Application с moderator_conv_handler и player_conv_handler. Bot API заменён локальной
+заглушкой, которая запоминает вызовы и отвечает с заданной задержкой.
+
+    python -m benchmarks.loadtest --tables 1 10 50 --api-latency-ms 50
+    python -m benchmarks.loadtest --tables 25 --concurrent-updates 32 --output load.json
+
+Для каждого уровня нагрузки выводится пропускная способность (обновлений в секунду),
+задержка обработки обновления, задержка каждого обработчика и отставание цикла событий.
+"""
+
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import logging
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+
+from benchmarks.common import prepare_environment, _percentile
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Empaths', 'username': 'empaths_load_bot'}
+
+
+def _latency_summary(samples_seconds):
+    if not samples_seconds:
+        return {'count': 0}
+    samples = sorted(sample * 1000 for sample in samples_seconds)
+    return {
+        'count': len(samples),
+        'p50_ms': round(_percentile(samples, 0.50), 2),
+        'p99_ms': round(_percentile(samples, 0.99), 2),
+        'max_ms': round(samples[-1], 2),
+    }
+
+
+def make_stub_request(api_latency):
+    """
+    Создаёт заглушку Bot API на основе BaseRequest: методы Telegram не вызываются,
+    ответы собираются локально после задержки api_latency секунд.
+    """
+    from telegram.request import BaseRequest
+
+    class StubRequest(BaseRequest):
+        def __init__(self):
+            self.calls = Counter()
+            self.latencies = defaultdict(list)
+            self._message_ids = itertools.count(1)
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                             connect_timeout=None, pool_timeout=None):
+            started = time.perf_counter()
+            api_method = url.rsplit('/', 1)[-1]
+            self.calls[api_method] += 1
+            parameters = request_data.parameters if request_data else {}
+            if api_method != 'getMe' and api_latency:
+                await asyncio.sleep(api_latency)
+
+            if api_method == 'getMe':
+                result = BOT_USER
+            elif api_method in ('sendMessage', 'sendPhoto'):
+                message_id = next(self._message_ids)
+                result = {
+                    'message_id': message_id,
+                    'date': int(time.time()),
+                    'chat': {'id': int(parameters.get('chat_id', 0)), 'type': 'private'},
+                    'from': BOT_USER,
+                }
+                if api_method == 'sendPhoto':
+                    file_id = f'load-photo-{message_id}'
+                    result['photo'] = [{'file_id': file_id, 'file_unique_id': file_id, 'width': 500, 'height': 500}]
+                else:
+                    result['text'] = parameters.get('text', '')
+            else:
+                result = True
+            self.latencies[api_method].append(time.perf_counter() - started)
+            return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    return StubRequest()
+
+
+class LoopLagMonitor:
+    """
+    Раз в interval секунд засыпает и измеряет, насколько позже заданного времени проснулся.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def instrument_handlers(handler_latencies):
+    """
+    Оборачивает обработчики обоих ConversationHandler, чтобы замерять время каждого из них.
+    """
+    from conversation_handler import moderator_conv_handler, player_conv_handler
+
+    def wrap(callback):
+        # При повторном вызове для следующего уровня нагрузки перевешиваем замер на новый словарь
+        callback = getattr(callback, '_load_original', callback)
+
+        @functools.wraps(callback)
+        async def timed(update, context):
+            started = time.perf_counter()
+            try:
+                return await callback(update, context)
+            finally:
+                handler_latencies[callback.__name__].append(time.perf_counter() - started)
+        timed._load_original = callback
+        return timed
+
+    for conversation in (moderator_conv_handler, player_conv_handler):
+        handlers = list(conversation.entry_points) + list(conversation.fallbacks)
+        for state_handlers in conversation.states.values():
+            handlers.extend(state_handlers)
+        for handler in handlers:
+            handler.callback = wrap(handler.callback)
+    return moderator_conv_handler, player_conv_handler
+
+
+class LoadTest:
+    """
+    Один уровень нагрузки: tables одновременных столов на общем Application.
+    """
+
+    def __init__(self, tables, rounds, api_latency, think_time, concurrent_updates, id_offset, seed=0):
+        self.tables = tables
+        self.rounds = rounds
+        self.api_latency = api_latency
+        self.think_time = think_time
+        self.concurrent_updates = concurrent_updates
+        self.id_offset = id_offset
+        self.rng = random.Random(seed)
+        self.update_ids = itertools.count(1)
+        self.pending = {}
+        self.update_latencies = []
+        self.handler_latencies = defaultdict(list)
+        self.errors = Counter()
+        self.application = None
+        self.request = None
+
+    def _build_application(self):
+        from telegram.ext import ApplicationBuilder, TypeHandler
+        from telegram import Update
+        from sqlite_persistence import SQLitePersistence
+
+        self.request = make_stub_request(self.api_latency)
+        # Разговоры персистентные, как в bot.py, поэтому нагрузка включает и запись состояния
+        builder = (ApplicationBuilder().token('1:load-test').request(self.request)
+                   .persistence(SQLitePersistence()).updater(None))
+        if self.concurrent_updates:
+            builder = builder.concurrent_updates(self.concurrent_updates)
+        application = builder.build()
+
+        moderator_conv_handler, player_conv_handler = instrument_handlers(self.handler_latencies)
+        application.add_handler(moderator_conv_handler)
+        application.add_handler(player_conv_handler)
+        application.add_handler(TypeHandler(Update, self._on_processed), group=100)
+        application.add_error_handler(self._on_error)
+        return application
+
+    async def _on_processed(self, update, context):
+        future = self.pending.pop(update.update_id, None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    async def _on_error(self, update, context):
+        self.errors[type(context.error).__name__] += 1
+        logging.getLogger(__name__).debug("Ошибка обработчика", exc_info=context.error)
+
+    async def send(self, user_id, username, text):
+        """
+        Отправляет текст от пользователя и ждёт, пока приложение его обработает.
+        """
+        from telegram import Update
+        if self.think_time:
+            await asyncio.sleep(self.think_time)
+        update_id = next(self.update_ids)
+        message = {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': username, 'username': username},
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        update = Update.de_json({'update_id': update_id, 'message': message}, self.application.bot)
+
+        future = asyncio.get_running_loop().create_future()
+        self.pending[update_id] = future
+        started = time.perf_counter()
+        await self.application.update_queue.put(update)
+        await future
+        self.update_latencies.append(time.perf_counter() - started)
+
+    async def play_table(self, index):
+        """
+        Сценарий одного стола: регистрация, настройка игры на 16 жетонов и несколько ходов.
+        Ходы выбираются по состоянию базы, как это сделал бы живой модератор, глядя на карту.
+        """
+        import database
+        from registration_handlers import MODERATOR_PASSWORD
+
+        moderator_id = self.id_offset + 2 * index
+        player_id = moderator_id + 1
+        moderator = (moderator_id, f'load_mod_{moderator_id}')
+        player = (player_id, f'load_player_{player_id}')
+
+        await self.send(*player, '/start')
+        await self.send(*player, '/skip')
+        for text in ('/start', MODERATOR_PASSWORD, '@' + player[1], '16', '4', '/random_red_set'):
+            await self.send(*moderator, text)
+        for _ in range(4):
+            await self.send(*moderator, str(self.rng.randint(0, 2)))
+        # Состояние MAKE_DRUNK повторяет вопрос, затем номер жетона и его соседи
+        for text in ('-', str(self.rng.randint(1, 16)), str(self.rng.randint(0, 2)), '/pass_turn_to_player'):
+            await self.send(*moderator, text)
+
+        game_id = database.get_active_game_set(moderator_id)['id']
+        for _ in range(self.rounds):
+            candidates = [token['id'] for token in database.get_all_tokens(game_id)
+                          if token['alive'] and token['character'] != 'demon']
+            if len(candidates) <= 3:
+                break
+            await self.send(*player, '/execute_token')
+            await self.send(*player, str(self.rng.choice(candidates)))
+
+            await self.send(*moderator, '/enter_neighbors')
+            for _ in range(len(database.get_red_tokens(game_id))):
+                await self.send(*moderator, str(self.rng.randint(0, 2)))
+            candidates = [token['id'] for token in database.get_all_tokens(game_id)
+                          if token['alive'] and token['character'] != 'demon']
+            await self.send(*moderator, str(self.rng.choice(candidates)))
+            for text in ('-', str(self.rng.choice(candidates)), str(self.rng.randint(0, 2)), '/pass_turn_to_player'):
+                await self.send(*moderator, text)
+
+    async def run(self):
+        self.application = self._build_application()
+        await self.application.initialize()
+        await self.application.start()
+        monitor = LoopLagMonitor()
+        monitor.start()
+
+        started = time.perf_counter()
+        outcomes = await asyncio.gather(*(self.play_table(index) for index in range(self.tables)),
+                                        return_exceptions=True)
+        elapsed = time.perf_counter() - started
+
+        await monitor.stop()
+        await self.application.stop()
+        await self.application.shutdown()
+
+        from broadcast import broadcaster
+        failures = [repr(outcome) for outcome in outcomes if isinstance(outcome, Exception)]
+        return {
+            'tables': self.tables,
+            'concurrent_updates': self.concurrent_updates or 1,
+            'api_latency_ms': self.api_latency * 1000,
+            'updates': len(self.update_latencies),
+            'elapsed_s': round(elapsed, 3),
+            'updates_per_second': round(len(self.update_latencies) / elapsed, 1) if elapsed else 0,
+            'update_latency': _latency_summary(self.update_latencies),
+            'loop_lag': _latency_summary(monitor.samples),
+            'handlers': {name: _latency_summary(samples) for name, samples in sorted(self.handler_latencies.items())},
+            'bot_api_calls': dict(self.request.calls),
+            'bot_api_latency': {name: _latency_summary(samples) for name, samples in self.request.latencies.items()},
+            'broadcast': broadcaster.stats(),
+            'handler_errors': dict(self.errors),
+            'failed_tables': failures,
+        }
+
+
+def print_level(result):
+    latency, lag = result['update_latency'], result['loop_lag']
+    print(f"\nСтолов: {result['tables']}, concurrent_updates: {result['concurrent_updates']}, "
+          f"задержка Bot API: {result['api_latency_ms']:.0f} мс")
+    print(f"  обновлений: {result['updates']} за {result['elapsed_s']} с "
+          f"({result['updates_per_second']} в секунду)")
+    print(f"  задержка обновления: p50 {latency.get('p50_ms')} мс, p99 {latency.get('p99_ms')} мс, "
+          f"max {latency.get('max_ms')} мс")
+    print(f"  отставание цикла событий: p50 {lag.get('p50_ms')} мс, p99 {lag.get('p99_ms')} мс, "
+          f"max {lag.get('max_ms')} мс")
+    for name, summary in result['handlers'].items():
+        print(f"    {name:<35} n={summary['count']:<6} p50 {summary['p50_ms']:>8} мс   p99 {summary['p99_ms']:>8} мс")
+    if result['handler_errors'] or result['failed_tables']:
+        print(f"  ошибки обработчиков: {result['handler_errors']}, упавшие столы: {len(result['failed_tables'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест empaths-tg-bot")
+    parser.add_argument('--tables', type=int, nargs='+', default=[1, 5, 10, 25],
+                        help="Уровни нагрузки: число одновременных столов")
+    parser.add_argument('--rounds', type=int, default=3, help="Сколько ходов играет каждый стол")
+    parser.add_argument('--api-latency-ms', type=float, default=30, help="Задержка ответа заглушки Bot API")
+    parser.add_argument('--think-ms', type=float, default=0, help="Пауза пользователя перед каждым сообщением")
+    parser.add_argument('--concurrent-updates', type=int, default=0,
+                        help="Параллельная обработка обновлений в Application (0 - последовательно, как в bot.py)")
+    parser.add_argument('--output', help="Файл для результатов в JSON")
+    args = parser.parse_args(argv)
+
+    work_dir = prepare_environment()
+    logging.basicConfig(level=logging.ERROR)
+
+    import database
+    import async_database
+    from render_pool import render_pool
+    database.init_db()
+
+    async def run_levels():
+        results = []
+        # Все уровни в одном цикле событий: модульные объекты (broadcaster) привязаны к нему
+        for level, tables in enumerate(args.tables):
+            load_test = LoadTest(
+                tables=tables,
+                rounds=args.rounds,
+                api_latency=args.api_latency_ms / 1000,
+                think_time=args.think_ms / 1000,
+                concurrent_updates=args.concurrent_updates,
+                id_offset=100_000 * (level + 1),
+                seed=level
+            )
+            result = await load_test.run()
+            results.append(result)
+            print_level(result)
+        return results
+
+    try:
+        results = asyncio.run(run_levels())
+    finally:
+        render_pool.shutdown()
+        async_database.shutdown()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump({'work_dir': work_dir, 'levels': results}, output_file, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# benchmarks/run.py
+"""
+Бенчмарки горячих путей бота.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --only neighbors render --iterations 500
+    python -m benchmarks.run --output results.json --baseline previous.json
+
+Работают с временным empaths.db и заглушкой Bot API. Результаты (p50/p99 в микросекундах
+и пиковые выделения памяти на вызов) печатаются таблицей и при --output сохраняются в JSON.
+"""
+
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+
+from benchmarks.common import prepare_environment, register_users, Runner
+
+SUITES = ('neighbors', 'render', 'database', 'turn', 'solver', 'engine')
+
+
+def compare(results, baseline_path, threshold):
+    """
+    Сравнивает p50 с сохранёнными результатами. Возвращает список регрессий.
+    """
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = {result['name']: result for result in json.load(baseline_file)['results']}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['name'])
+        if not previous or not previous['p50_us']:
+            continue
+        ratio = result['p50_us'] / previous['p50_us']
+        if ratio > 1 + threshold:
+            regressions.append({'name': result['name'], 'baseline_p50_us': previous['p50_us'],
+                                'p50_us': result['p50_us'], 'ratio': round(ratio, 2)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки empaths-tg-bot")
+    parser.add_argument('--iterations', type=int, default=200, help="Число измерений на бенчмарк")
+    parser.add_argument('--only', nargs='*', help="Запустить только бенчмарки, в имени которых есть эти строки")
+    parser.add_argument('--output', help="Файл для результатов в JSON")
+    parser.add_argument('--baseline', help="JSON с прошлыми результатами для сравнения")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Допустимый рост p50 относительно baseline")
+    args = parser.parse_args(argv)
+
+    work_dir = prepare_environment()
+    logging.basicConfig(level=logging.WARNING)
+
+    import importlib
+    import database
+    import async_database
+    from render_pool import render_pool
+
+    database.init_db()
+    register_users()
+
+    runner = Runner(iterations=args.iterations, only=args.only)
+    started = time.time()
+    try:
+        for suite in SUITES:
+            importlib.import_module(f'benchmarks.bench_{suite}').run(runner)
+    finally:
+        runner.close()
+        render_pool.shutdown()
+        async_database.shutdown()
+
+    report = {
+        'started_at': started,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'iterations': args.iterations,
+        'work_dir': work_dir,
+        'results': runner.results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        regressions = compare(runner.results, args.baseline, args.threshold)
+        report['regressions'] = regressions
+        for regression in regressions:
+            print(f"РЕГРЕССИЯ {regression['name']}: p50 {regression['baseline_p50_us']} -> "
+                  f"{regression['p50_us']} us (x{regression['ratio']})")
+        exit_code = 1 if regressions else 0
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, ensure_ascii=False, indent=2)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
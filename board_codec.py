@@ -0,0 +1,171 @@
+# board_codec.py
+"""
+Компактная запись доски: вся игра из таблицы tokens в 12 байтах.
+
+Биты целого числа, начиная с младшего:
+
+    0-4     tokens_count (до 16 жетонов, поле вмещает до 31)
+    5-9     позиция демона, NO_DEMON - демона нет
+    10-25   красные жетоны, бит на позицию
+    26-41   живые жетоны
+    42-57   пьяные жетоны
+    58-89   red_neighbors, по 2 бита на позицию: 0, 1, 2 или NO_VALUE (None)
+
+Одна и та же доска всегда кодируется одинаково, поэтому запись годится как ключ кэша,
+как снимок игры для истории и как состояние для перебора и симуляций.
+"""
+
+from game_engine import GameState, MAX_RED_NEIGHBORS
+
+MAX_TOKENS = 16
+BOARD_BYTES = 12
+
+NO_DEMON = 31
+NO_VALUE = 3
+
+_DEMON_SHIFT = 5
+_RED_SHIFT = 10
+_ALIVE_SHIFT = _RED_SHIFT + MAX_TOKENS
+_DRUNK_SHIFT = _ALIVE_SHIFT + MAX_TOKENS
+_NEIGHBORS_SHIFT = _DRUNK_SHIFT + MAX_TOKENS
+_MASK = (1 << MAX_TOKENS) - 1
+
+
+def pack_board(tokens_count, red, alive, drunk, demon, red_neighbors):
+    """
+    Собирает целое число доски из масок жетонов (бит k - жетон с id=k+1),
+    позиции демона (None, если его нет) и списка red_neighbors по позициям.
+    """
+    if not 0 < tokens_count <= MAX_TOKENS:
+        raise ValueError(f"Поддерживается от 1 до {MAX_TOKENS} жетонов, получено {tokens_count}")
+    neighbors = 0
+    for position, value in enumerate(red_neighbors):
+        if value is None:
+            value = NO_VALUE
+        elif not 0 <= value <= MAX_RED_NEIGHBORS:
+            raise ValueError(f"Жетон {position + 1}: red_neighbors={value}, допустимо от 0 до {MAX_RED_NEIGHBORS}")
+        neighbors |= value << 2 * position
+    return (tokens_count
+            | (NO_DEMON if demon is None else demon) << _DEMON_SHIFT
+            | red << _RED_SHIFT
+            | alive << _ALIVE_SHIFT
+            | drunk << _DRUNK_SHIFT
+            | neighbors << _NEIGHBORS_SHIFT)
+
+
+def _board_fields(tokens):
+    """
+    Собирает поля pack_board из жетонов в формате get_all_tokens.
+    Жетон с id=k занимает позицию k-1; жетоны вне 1..len(tokens) пропускаются.
+    """
+    tokens_count = len(tokens)
+    red = alive = drunk = 0
+    demon = None
+    red_neighbors = [0] * tokens_count
+    for token in tokens:
+        position = token['id'] - 1
+        if not 0 <= position < tokens_count:
+            continue
+        bit = 1 << position
+        if token['alignment'] == 'red':
+            red |= bit
+        if token['character'] == 'demon':
+            demon = position
+        if token['alive']:
+            alive |= bit
+        if token.get('drunk'):
+            drunk |= bit
+        red_neighbors[position] = token['red_neighbors']
+    return tokens_count, red, alive, drunk, demon, red_neighbors
+
+
+def encode_board(tokens):
+    """
+    Кодирует жетоны в формате get_all_tokens в BOARD_BYTES байт.
+    Число соседей вне 0..MAX_RED_NEIGHBORS - ValueError.
+    """
+    return pack_board(*_board_fields(tokens)).to_bytes(BOARD_BYTES, 'little')
+
+
+def unpack_board(board):
+    """
+    Разбирает доску (байты или целое число) на поля pack_board:
+    (tokens_count, red, alive, drunk, demon, red_neighbors).
+    """
+    value = int.from_bytes(board, 'little') if isinstance(board, (bytes, bytearray)) else board
+    tokens_count = value & 0x1F
+    demon = value >> _DEMON_SHIFT & 0x1F
+    neighbors = value >> _NEIGHBORS_SHIFT
+    red_neighbors = []
+    for position in range(tokens_count):
+        count = neighbors >> 2 * position & 3
+        red_neighbors.append(None if count == NO_VALUE else count)
+    return (tokens_count,
+            value >> _RED_SHIFT & _MASK,
+            value >> _ALIVE_SHIFT & _MASK,
+            value >> _DRUNK_SHIFT & _MASK,
+            None if demon == NO_DEMON else demon,
+            red_neighbors)
+
+
+def decode_board(board, game_id=None):
+    """
+    Восстанавливает жетоны в формате get_all_tokens. Если game_id не передан, поле game_id не добавляется.
+    """
+    tokens_count, red, alive, drunk, demon, red_neighbors = unpack_board(board)
+    tokens = []
+    for position in range(tokens_count):
+        is_red = red >> position & 1
+        token = {
+            'id': position + 1,
+            'alignment': 'red' if is_red else 'blue',
+            'character': 'demon' if position == demon else ('minion' if is_red else 'townfolk'),
+            'red_neighbors': red_neighbors[position],
+            'alive': alive >> position & 1,
+            'drunk': drunk >> position & 1,
+        }
+        if game_id is not None:
+            token['game_id'] = game_id
+        tokens.append(token)
+    return tokens
+
+
+def visible_board(tokens, moderator):
+    """
+    Кодирует только то, что видно на карте: мёртвые жетоны серые и без числа,
+    игроку не видны цвета, демон и пьяные жетоны. Одинаковые для глаза доски дают одинаковый ключ.
+    """
+    tokens_count, red, alive, drunk, demon, red_neighbors = _board_fields(tokens)
+    red_neighbors = [value if alive >> position & 1 else None for position, value in enumerate(red_neighbors)]
+    red &= alive
+    if demon is not None and not alive >> demon & 1:
+        demon = None
+    if not moderator:
+        red = drunk = 0
+        demon = None
+    return pack_board(tokens_count, red, alive, drunk, demon, red_neighbors).to_bytes(BOARD_BYTES, 'little')
+
+
+def board_from_state(state):
+    """
+    Кодирует game_engine.GameState: у каждого жетона записывается число, которое он показывает.
+    """
+    red = alive = drunk = 0
+    for position in range(state.size):
+        bit = 1 << position
+        if state.red[position]:
+            red |= bit
+        if state.alive[position]:
+            alive |= bit
+        if state.drunk[position]:
+            drunk |= bit
+    demon = state.demon if state.demon >= 0 else None
+    red_neighbors = [state.shown(position) for position in range(state.size)]
+    return pack_board(state.size, red, alive, drunk, demon, red_neighbors).to_bytes(BOARD_BYTES, 'little')
+
+
+def state_from_board(board):
+    """
+    Строит game_engine.GameState по записи доски.
+    """
+    return GameState.from_tokens(decode_board(board))
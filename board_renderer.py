@@ -0,0 +1,147 @@
+# board_renderer.py
+
+import io
+import math
+import os
+import threading
+from PIL import Image, ImageDraw, ImageFont
+from distributions import POSITIONS_MAP
+
+FONT_PATH = os.path.join(os.path.dirname(__file__), 'fonts', 'DejaVuSans.ttf')
+FONT_SIZE = 20
+
+IMAGE_SIZE = 500  # Размер изображения
+TOKEN_RADIUS = 20
+TOKEN_COLORS = ('lightblue', 'red', 'purple', 'grey')
+
+
+class BoardRenderer:
+    """
+    Рисует карту жетонов из заранее подготовленных частей.
+    Шрифт, позиции жетонов, размеры подписей и спрайты жетонов каждого цвета
+    готовятся один раз при создании, поэтому отрисовка сводится к вставке картинок.
+    """
+
+    def __init__(self, font_path=FONT_PATH, font_size=FONT_SIZE):
+        if not os.path.isfile(font_path):
+            raise FileNotFoundError(font_path)
+        self.font = ImageFont.truetype(font_path, font_size)
+        self.background = Image.new('RGB', (IMAGE_SIZE, IMAGE_SIZE), color='white')
+        self.positions = {tokens_count: self._circle_positions(tokens_count) for tokens_count in POSITIONS_MAP}
+        max_tokens = max(POSITIONS_MAP)
+
+        # Размеры и изображения подписей: номера жетонов и значения red_neighbors
+        self.labels = {}
+        for number in range(max_tokens + 1):
+            self._label(str(number))
+
+        # Спрайты жетонов: круг нужного цвета с номером внутри
+        self.token_sprites = {}
+        for color in TOKEN_COLORS:
+            for number in range(1, max_tokens + 1):
+                self._token_sprite(color, number)
+
+        self.bottle = self._draw_bottle()
+
+    @staticmethod
+    def _circle_positions(tokens_count):
+        """
+        Рассчитывает центры жетонов по кругу. Первый жетон находится сверху.
+        """
+        center = IMAGE_SIZE // 2
+        radius = IMAGE_SIZE // 2 - 50  # Радиус круга, на котором будут расположены жетоны
+        angle_between_tokens = 360 / tokens_count
+        positions = []
+        for i in range(tokens_count):
+            angle_rad = math.radians(angle_between_tokens * i - 90)
+            positions.append((center + radius * math.cos(angle_rad), center + radius * math.sin(angle_rad)))
+        return positions
+
+    def _label(self, text):
+        """
+        Возвращает (изображение, ширина, высота) подписи, рисуя её при первом обращении.
+        """
+        label = self.labels.get(text)
+        if label is None:
+            measure = ImageDraw.Draw(self.background)
+            width, height = measure.textsize(text, font=self.font)
+            image = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+            ImageDraw.Draw(image).text((0, 0), text, fill='black', font=self.font)
+            label = self.labels[text] = (image, width, height)
+        return label
+
+    def _token_sprite(self, color, number):
+        """
+        Возвращает спрайт жетона заданного цвета с номером, рисуя его при первом обращении.
+        """
+        sprite = self.token_sprites.get((color, number))
+        if sprite is None:
+            size = TOKEN_RADIUS * 2 + 1
+            sprite = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+            draw = ImageDraw.Draw(sprite)
+            draw.ellipse([0, 0, size - 1, size - 1], fill=color, outline='black')
+            _, width, height = self._label(str(number))
+            draw.text((TOKEN_RADIUS - width / 2, TOKEN_RADIUS - height / 2), str(number), fill='black', font=self.font)
+            self.token_sprites[(color, number)] = sprite
+        return sprite
+
+    @staticmethod
+    def _draw_bottle():
+        """
+        Рисует символ бутылки, которым модератор видит "пьяные" жетоны.
+        """
+        bottle_width, bottle_height = 10, 20
+        neck_width = bottle_width * 0.4
+        neck_height = 7
+        image = Image.new('RGBA', (bottle_width + 1, bottle_height + neck_height + 1), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(image)
+        draw.rectangle([0, neck_height, bottle_width, neck_height + bottle_height], fill='brown', outline='black')
+        neck_x = (bottle_width - neck_width) / 2
+        draw.rectangle([neck_x, 0, neck_x + neck_width, neck_height], fill='brown', outline='black')
+        return image
+
+    def render(self, tokens_count, tokens_colors, red_neighbors_list, drunk_tokens, moderator):
+        """
+        Рисует карту жетонов по кругу и возвращает её в виде байтов PNG.
+        """
+        positions = self.positions.get(tokens_count)
+        if positions is None:
+            positions = self.positions[tokens_count] = self._circle_positions(tokens_count)
+
+        image = self.background.copy()
+        for i, (x, y) in enumerate(positions):
+            token_color = tokens_colors[i] if i < len(tokens_colors) else 'grey'
+            sprite = self._token_sprite(token_color, i + 1)
+            image.paste(sprite, (round(x - TOKEN_RADIUS), round(y - TOKEN_RADIUS)), sprite)
+
+            # Значение red_neighbors справа от жетона (только для живых жетонов)
+            if i < len(red_neighbors_list) and red_neighbors_list[i] is not None:
+                label, _, height = self._label(str(red_neighbors_list[i]))
+                image.paste(label, (round(x + TOKEN_RADIUS + 5), round(y - height / 2)), label)
+
+            # Если жетон "пьяный" и модератор смотрит на карту, рисуем символ бутылки над жетоном
+            if moderator and (i + 1) in drunk_tokens:
+                bottle_x = round(x - self.bottle.width / 2)
+                bottle_y = round(y - TOKEN_RADIUS - 5 - self.bottle.height)
+                image.paste(self.bottle, (bottle_x, bottle_y), self.bottle)
+
+        # Сохраняем изображение в PNG
+        image_bytes = io.BytesIO()
+        image.save(image_bytes, format='PNG')
+        return image_bytes.getvalue()
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_board_renderer():
+    """
+    Возвращает общий экземпляр BoardRenderer, создавая его при первом вызове.
+    """
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = BoardRenderer()
+    return _renderer
@@ -21,7 +21,16 @@ from telegram.ext import (
     ApplicationBuilder,
 )
 from database import init_db
+from db_connection import close_all_connections
+from user_directory import get_user_directory
+import async_database
+from board_renderer import get_board_renderer
+from render_pool import render_pool
 from conversation_handler import moderator_conv_handler, player_conv_handler
+from webhook_server import run_webhook
+from sqlite_persistence import SQLitePersistence
+from metrics import InstrumentedRequest, instrument_application, metrics_server
+from logging_config import setup_logging, install_update_context
 from telegram.ext import ContextTypes
 from telegram import Update
 
@@ -29,10 +38,12 @@ TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 if not TOKEN:
     raise ValueError("TELEGRAM_BOT_TOKEN не установлен в переменных окружения.")
 
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+# Способ получения обновлений: 'polling' или 'webhook'
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+if BOT_MODE not in ("polling", "webhook"):
+    raise ValueError(f"Неизвестный BOT_MODE: {BOT_MODE}. Допустимые значения: polling, webhook.")
+
+setup_logging()
 logger = logging.getLogger(__name__)
 
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -40,14 +51,48 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
     if isinstance(update, Update) and update.effective_message:
         await update.effective_message.reply_text("Произошла ошибка при обработке вашего запроса.")
 
+async def on_startup(application) -> None:
+    """
+    Запускает локальный сервер метрик.
+    """
+    await metrics_server.start()
+
+async def on_shutdown(application) -> None:
+    """
+    Освобождает ресурсы бота после остановки приложения.
+    """
+    await metrics_server.stop()
+    render_pool.shutdown()
+    async_database.shutdown()
+    logger.info(f"Справочник пользователей: {get_user_directory().stats()}")
+    close_all_connections()
+
 def main():
     init_db()
-    application = ApplicationBuilder().token(TOKEN).read_timeout(60).write_timeout(60).build()
+    # Шрифт и заготовки жетонов готовятся один раз при запуске
+    try:
+        get_board_renderer()
+    except Exception as e:
+        logger.error(f"Не удалось подготовить отрисовку карты жетонов: {e}")
+    application = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .request(InstrumentedRequest(connection_pool_size=256, read_timeout=60, write_timeout=60))
+        .persistence(SQLitePersistence())
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
     application.add_handler(moderator_conv_handler)
     application.add_handler(player_conv_handler)
     application.add_error_handler(error_handler)
-    logger.info("Бот запускается...")
-    application.run_polling()
+    instrument_application(application)
+    install_update_context(application)
+    logger.info(f"Бот запускается в режиме {BOT_MODE}...")
+    if BOT_MODE == "webhook":
+        run_webhook(application)
+    else:
+        application.run_polling()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,133 @@
+# broadcast.py
+
+import asyncio
+import logging
+import os
+import time
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Ограничения Telegram: около 30 сообщений в секунду на бота и около одного в секунду в один чат
+BROADCAST_GLOBAL_RATE = float(os.getenv('BROADCAST_GLOBAL_RATE', 30))
+BROADCAST_CHAT_RATE = float(os.getenv('BROADCAST_CHAT_RATE', 1))
+BROADCAST_CHAT_BURST = int(os.getenv('BROADCAST_CHAT_BURST', 3))
+BROADCAST_MAX_RETRIES = int(os.getenv('BROADCAST_MAX_RETRIES', 3))
+
+
+class TokenBucket:
+    """
+    Ведро токенов: rate токенов в секунду, не больше capacity за раз.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """
+        Забирает один токен, при необходимости дожидаясь его появления.
+        """
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    def idle(self):
+        """
+        True, если ведро полностью восстановилось и его можно не хранить.
+        """
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class Broadcaster:
+    """
+    Рассылает сообщения нескольким получателям одновременно с учётом общего лимита бота
+    и лимита на каждый чат. При RetryAfter ждёт указанное Telegram время и повторяет отправку.
+    """
+
+    def __init__(self, global_rate=BROADCAST_GLOBAL_RATE, chat_rate=BROADCAST_CHAT_RATE,
+                 chat_burst=BROADCAST_CHAT_BURST, max_retries=BROADCAST_MAX_RETRIES):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._global_bucket = TokenBucket(global_rate, max(1, int(global_rate)))
+        self._chat_buckets = {}
+
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Не храним вёдра чатов, которым давно ничего не отправляли
+            if len(self._chat_buckets) >= 1000:
+                for idle_chat_id in [key for key, value in self._chat_buckets.items() if value.idle()]:
+                    del self._chat_buckets[idle_chat_id]
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    async def send(self, send_func, chat_id, **kwargs):
+        """
+        Вызывает send_func(chat_id=chat_id, **kwargs) с учётом лимитов и повторов.
+        Возвращает результат по получателю: {'ok', 'attempts', 'error', 'result'}.
+        """
+        attempts = 0
+        while True:
+            attempts += 1
+            await self._chat_bucket(chat_id).acquire()
+            await self._global_bucket.acquire()
+            try:
+                result = await send_func(chat_id=chat_id, **kwargs)
+            except RetryAfter as e:
+                if attempts > self.max_retries:
+                    self.failed += 1
+                    logger.error(f"Не удалось отправить сообщение в чат {chat_id}: превышено число повторов.")
+                    return {'ok': False, 'attempts': attempts, 'error': str(e), 'result': None}
+                self.retries += 1
+                logger.warning(f"Telegram просит подождать {e.retry_after} с перед отправкой в чат {chat_id}.")
+                await asyncio.sleep(e.retry_after)
+                continue
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Не удалось отправить сообщение в чат {chat_id}: {e}")
+                return {'ok': False, 'attempts': attempts, 'error': str(e), 'result': None}
+            self.sent += 1
+            return {'ok': True, 'attempts': attempts, 'error': None, 'result': result}
+
+    async def broadcast(self, bot, chat_ids, text, **kwargs):
+        """
+        Отправляет одно и то же сообщение всем получателям одновременно.
+        Возвращает словарь {chat_id: результат отправки}.
+        """
+        chat_ids = list(dict.fromkeys(chat_ids))
+        results = await asyncio.gather(
+            *(self.send(bot.send_message, chat_id, text=text, **kwargs) for chat_id in chat_ids)
+        )
+        return dict(zip(chat_ids, results))
+
+    def stats(self):
+        """
+        Возвращает счётчики рассылки.
+        """
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'chat_buckets': len(self._chat_buckets)
+        }
+
+
+broadcaster = Broadcaster()
@@ -20,6 +20,7 @@ from game_set_handlers import (
     get_red_token_red_neighbors,
     random_red_set,
     manual_entry_red_set,
+    check_setup,
     make_drunk,
     get_drunk_token_number,
     set_drunk_red_neighbors
@@ -62,7 +63,8 @@ moderator_conv_handler = ConversationHandler(
         CommandHandler('start', start),
         CommandHandler('enter_neighbors', reenter_red_neighbors_for_red),
         CommandHandler('kill_token', kill_token),
-        CommandHandler('skip_enter_neighbors', skip_enter_neighbors)
+        CommandHandler('skip_enter_neighbors', skip_enter_neighbors),
+        CommandHandler('check_setup', check_setup)
     ],
     states={
         HANDLE_PASSWORD: [
@@ -116,7 +118,9 @@ moderator_conv_handler = ConversationHandler(
     fallbacks=[CommandHandler('cancel', cancel)],
     allow_reentry=True,
     per_chat=False,
-    per_user=True
+    per_user=True,
+    name='moderator_conversation',
+    persistent=True
 )
 
 
@@ -132,5 +136,7 @@ player_conv_handler = ConversationHandler(
     },
     fallbacks=[CommandHandler('cancel', cancel)],
     allow_reentry=False,  # Отключаем повторный вход в разговор
-    per_chat=False        # Отслеживаем разговор по пользователю
+    per_chat=False,       # Отслеживаем разговор по пользователю
+    name='player_conversation',
+    persistent=True
 )
\ No newline at end of file
@@ -1,39 +1,36 @@
 # database.py
 import logging
 import sqlite3
+from db_connection import get_connection, transaction, read_transaction
+from user_directory import get_user_directory
+from migrations import run_migrations
 from db_queries import (
-    CREATE_USERS_TABLE,
-    CREATE_GAME_SET_TABLE,
-    CREATE_TOKENS_TABLE,
+    UPSERT_PERSISTENCE,
+    DELETE_PERSISTENCE,
     INSERT_TOKEN,
-    UPDATE_TOKEN
+    DELETE_GAME_TOKENS,
+    GAME_SET_COLUMNS,
+    UPDATE_TOKEN,
+    TOKEN_FIELDS,
+    UPDATE_TOKEN_FIELDS
 )
 
 logger = logging.getLogger(__name__)
 
+
 def init_db(db_path='empaths.db'):
     """
-    Инициализирует базу данных, создавая необходимые таблицы.
+    Инициализирует базу данных: создаёт таблицы и применяет новые миграции схемы.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute(CREATE_USERS_TABLE)
-    cursor.execute(CREATE_GAME_SET_TABLE)
-    cursor.execute(CREATE_TOKENS_TABLE)
-    conn.commit()
-    conn.close()
+    run_migrations(db_path)
 
 
 def get_all_users(db_path='empaths.db'):
     """
     Возвращает список всех пользователей из базы данных.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('SELECT username, id FROM users')
-    users = cursor.fetchall()
-    conn.close()
-    return [{'username': row[0], 'id': row[1]} for row in users]
+    users = get_user_directory(db_path).all_users()
+    return [{'username': user['username'], 'id': user['id']} for user in users]
 
 
 def add_user(username, userid, moderator=False, db_path='empaths.db'):
@@ -41,358 +38,440 @@ def add_user(username, userid, moderator=False, db_path='empaths.db'):
     Добавляет нового пользователя в базу данных. Если пользователь уже существует, обновляет его информацию.
     Возвращает True, если пользователь новый, и False, если уже существовал.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM users WHERE id = ?', (userid,))
-    user = cursor.fetchone()
-    if user:
-        # Пользователь существует, обновляем информацию
-        cursor.execute('UPDATE users SET username = ?, moderator = ? WHERE id = ?', (username, int(moderator), userid))
-        is_new_user = False
-    else:
-        # Новый пользователь, добавляем в базу данных
-        cursor.execute('INSERT INTO users (id, username, moderator) VALUES (?, ?, ?)', (userid, username, int(moderator)))
-        is_new_user = True
-    conn.commit()
-    conn.close()
+    with transaction(db_path) as cursor:
+        cursor.execute('SELECT * FROM users WHERE id = ?', (userid,))
+        user = cursor.fetchone()
+        if user:
+            # Пользователь существует, обновляем информацию
+            cursor.execute('UPDATE users SET username = ?, moderator = ? WHERE id = ?', (username, int(moderator), userid))
+            is_new_user = False
+        else:
+            # Новый пользователь, добавляем в базу данных
+            cursor.execute('INSERT INTO users (id, username, moderator) VALUES (?, ?, ?)', (userid, username, int(moderator)))
+            is_new_user = True
+    get_user_directory(db_path).put(userid, username, moderator, on_game=None)
     return is_new_user
 
+
 def get_moderators(db_path='empaths.db'):
     """
     Возвращает список модераторов из базы данных.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, username FROM users WHERE moderator = 1')
-    moderators = cursor.fetchall()
-    conn.close()
-    # Преобразуем в список словарей
-    return [{'id': row[0], 'username': row[1]} for row in moderators]
+    moderators = get_user_directory(db_path).moderators()
+    return [{'id': user['id'], 'username': user['username']} for user in moderators]
 
 
 def is_user_moderator(userid, db_path='empaths.db'):
     """
     Проверяет, является ли пользователь модератором.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT moderator FROM users WHERE userid = ?", (userid,))
-    result = cursor.fetchone()
-    conn.close()
-
-    if result:
-        return bool(result[0])
-    return False
+    user = get_user_directory(db_path).get_by_id(userid)
+    return bool(user and user['moderator'])
 
 
 def add_game_set(tokens_count, red_count, player_username, player_id, moderator_username, moderator_id):
     """
-    Добавляет запись в таблицу game_set.
+    Добавляет запись в таблицу game_set и возвращает id новой игры.
+    """
+    with transaction() as cursor:
+        cursor.execute('''
+            INSERT INTO game_set (tokens_count, red_count, player_username, player_id, moderator_username, moderator_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (tokens_count, red_count, player_username, player_id, moderator_username, moderator_id))
+        return cursor.lastrowid
+
+
+def get_game_set(game_id, db_path='empaths.db'):
+    """
+    Получает настройки игры по её id.
     """
-    conn = sqlite3.connect('empaths.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO game_set (tokens_count, red_count, player_username, player_id, moderator_username, moderator_id)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (tokens_count, red_count, player_username, player_id, moderator_username, moderator_id))
-    conn.commit()
-    conn.close()
-    
-def get_latest_game_set(db_path='empaths.db'):
+    conn = get_connection(db_path)
+    result = conn.execute(
+        f"SELECT {GAME_SET_COLUMNS} FROM game_set WHERE id = ?", (game_id,)
+    ).fetchone()
+    return _game_set_from_row(result)
+
+
+def get_active_game_set(user_id, db_path='empaths.db'):
     """
-    Получает последние настройки игры из таблицы game_set.
+    Получает настройки последней игры, в которой пользователь участвует как модератор или игрок.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT tokens_count, red_count, player_id, player_username, moderator_id, moderator_username FROM game_set ORDER BY id DESC LIMIT 1")
-    result = cursor.fetchone()
-    conn.close()
+    conn = get_connection(db_path)
+    result = conn.execute(
+        f"""
+        SELECT {GAME_SET_COLUMNS} FROM game_set
+        WHERE id = (
+            SELECT MAX(id) FROM (
+                SELECT id FROM game_set WHERE moderator_id = ?
+                UNION ALL
+                SELECT id FROM game_set WHERE player_id = ?
+            )
+        )
+        """,
+        (user_id, user_id)
+    ).fetchone()
+    return _game_set_from_row(result)
 
+
+def get_game_state(user_id, db_path='empaths.db'):
+    """
+    Читает активную игру пользователя и все её жетоны в одной транзакции,
+    чтобы настройки и жетоны соответствовали одному и тому же моменту.
+    Возвращает (game_set, tokens) или (None, []), если игры нет.
+    """
+    with read_transaction(db_path):
+        game_set = get_active_game_set(user_id, db_path)
+        tokens = get_all_tokens(game_set['id'], db_path) if game_set else []
+    return game_set, tokens
+
+
+def _game_set_from_row(result):
+    """
+    Преобразует строку таблицы game_set в словарь.
+    """
     if result:
         return {
-            'tokens_count': result[0],
-            'red_count': result[1],
-            'player_id': result[2],
-            'player_username': result[3],
-            'moderator_id': result[4],
-            'moderator_username': result[5]
+            'id': result[0],
+            'tokens_count': result[1],
+            'red_count': result[2],
+            'player_id': result[3],
+            'player_username': result[4],
+            'moderator_id': result[5],
+            'moderator_username': result[6]
         }
     return None
 
-def clear_tokens(db_path='empaths.db'):
+
+def clear_tokens(game_id, db_path='empaths.db'):
     """
-    Очищает таблицу tokens и сбрасывает счетчик автоинкремента.
+    Удаляет жетоны игры.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM tokens")
-    cursor.execute("DELETE FROM sqlite_sequence WHERE name='tokens'")
-    conn.commit()
-    conn.close()
-    logger.info("Таблица tokens очищена и идентификаторы сброшены.")
+    with transaction(db_path) as cursor:
+        cursor.execute(DELETE_GAME_TOKENS, (game_id,))
+    logger.info(f"Жетоны игры {game_id} удалены.")
+
 
-def clear_game_set(db_path='empaths.db'):
+def clear_game_set(moderator_id, db_path='empaths.db'):
     """
-    Очищает таблицу game_set и сбрасывает счетчик автоинкремента.
+    Удаляет игры, которые ведёт модератор, вместе с их жетонами.
+    Игры других модераторов не затрагиваются.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM game_set")
-    cursor.execute("DELETE FROM sqlite_sequence WHERE name='game_set'")
-    conn.commit()
-    conn.close()
-    logger.info("Таблица game_set очищена и идентификаторы сброшены.")
-    
-def add_tokens(tokens_list, db_path='empaths.db'):
+    with transaction(db_path) as cursor:
+        cursor.execute("DELETE FROM game_set WHERE moderator_id = ?", (moderator_id,))
+        deleted = cursor.rowcount
+    logger.info(f"Удалено игр модератора {moderator_id}: {deleted}.")
+
+
+def add_tokens(game_id, tokens_list, db_path='empaths.db'):
     """
-    Добавляет список жетонов в таблицу tokens.
+    Добавляет список жетонов игры в таблицу tokens. Жетоны нумеруются с 1 в порядке списка.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.executemany(INSERT_TOKEN, tokens_list)
-    conn.commit()
-    conn.close()
-    logger.info(f"Добавлено {len(tokens_list)} жетонов в таблицу tokens.")
+    with transaction(db_path) as cursor:
+        cursor.executemany(
+            INSERT_TOKEN,
+            [(game_id, token_id, *token) for token_id, token in enumerate(tokens_list, start=1)]
+        )
+    logger.debug("Добавлено %d жетонов в игру %s.", len(tokens_list), game_id)
+
 
-def get_all_tokens(db_path='empaths.db'):
+def get_all_tokens(game_id, db_path='empaths.db'):
     """
-    Возвращает список всех жетонов из таблицы tokens в виде словарей.
+    Возвращает список всех жетонов игры в виде словарей, упорядоченных по номеру.
     """
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM tokens')
-    tokens = cursor.fetchall()
-    conn.close()
+    cursor = get_connection(db_path).cursor()
+    cursor.row_factory = sqlite3.Row
+    tokens = cursor.execute('SELECT * FROM tokens WHERE game_id = ? ORDER BY id', (game_id,)).fetchall()
     return [dict(token) for token in tokens]
 
 
-def get_token_by_id(token_id, db_path='empaths.db'):
+def get_token_by_id(game_id, token_id, db_path='empaths.db'):
     """
-    Получает информацию о жетоне по ID.
+    Получает информацию о жетоне игры по его номеру.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, alignment, character, red_neighbors, alive FROM tokens WHERE id = ?', (token_id,))
-    token = cursor.fetchone()
-    conn.close()
+    conn = get_connection(db_path)
+    token = conn.execute(
+        'SELECT id, alignment, character, red_neighbors, alive FROM tokens WHERE game_id = ? AND id = ?',
+        (game_id, token_id)
+    ).fetchone()
     if token:
         return {
             'id': token[0],
             'alignment': token[1],
             'character': token[2],
             'red_neighbors': token[3],
-            'alive': bool(token[3])
+            'alive': bool(token[4])
         }
     else:
         return None
-    
-def update_token(token_id, alignment, character, red_neighbors, db_path='empaths.db'):
+
+
+def update_token(game_id, token_id, alignment, character, red_neighbors, db_path='empaths.db'):
     """
-    Обновляет жетон по его id.
+    Обновляет жетон игры по его номеру.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute(UPDATE_TOKEN, (alignment, character, red_neighbors, token_id))
-    conn.commit()
-    conn.close()
-    logger.info(f"Жетон с id={token_id} обновлен.")
-    
-    
+    with transaction(db_path) as cursor:
+        cursor.execute(UPDATE_TOKEN, (alignment, character, red_neighbors, game_id, token_id))
+    logger.debug("Жетон с id=%s обновлен.", token_id)
+
 
-def update_token_alignment(token_id, alignment, db_path='empaths.db'):
+def update_tokens_bulk(game_id, changes, db_path='empaths.db'):
+    """
+    Применяет изменения нескольких жетонов игры в одной транзакции.
+    changes - словарь {id жетона: {поле: новое значение}}.
+    Записываются только жетоны, у которых значение действительно изменилось.
+    Возвращает применённую разницу в виде {id жетона: {поле: (старое значение, новое значение)}}.
+    """
+    for token_changes in changes.values():
+        unknown_fields = set(token_changes) - set(TOKEN_FIELDS)
+        if unknown_fields:
+            raise ValueError(f"Неизвестные поля жетона: {sorted(unknown_fields)}")
+
+    if not changes:
+        return {}
+
+    diff = {}
+    rows = []
+    found_ids = set()
+    placeholders = ', '.join('?' * len(changes))
+    with transaction(db_path) as cursor:
+        cursor.execute(
+            f"SELECT id, {', '.join(TOKEN_FIELDS)} FROM tokens WHERE game_id = ? AND id IN ({placeholders})",
+            [game_id, *changes]
+        )
+        for row in cursor.fetchall():
+            token_id = row[0]
+            found_ids.add(token_id)
+            current = dict(zip(TOKEN_FIELDS, row[1:]))
+            token_diff = {}
+            for field, value in changes[token_id].items():
+                if current[field] != value:
+                    token_diff[field] = (current[field], value)
+                    current[field] = value
+            if token_diff:
+                diff[token_id] = token_diff
+                rows.append(tuple(current[field] for field in TOKEN_FIELDS) + (game_id, token_id))
+        # Пустой executemany всё равно открывает и фиксирует транзакцию записи
+        if rows:
+            cursor.executemany(UPDATE_TOKEN_FIELDS, rows)
+
+    if len(found_ids) < len(changes):
+        logger.warning(f"Жетоны не найдены: {sorted(set(changes) - found_ids)}")
+    logger.debug("Пакетно обновлено жетонов: %d из %d.", len(diff), len(changes))
+    return diff
+
+
+def update_token_alignment(game_id, token_id, alignment, db_path='empaths.db'):
     """
     Обновляет alignment жетона по его id.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute(
-        'UPDATE tokens SET alignment = ? WHERE id = ?',
-        (alignment, token_id)
-    )
-    conn.commit()
-    conn.close()
-    logger.info(f"Жетон с id={token_id} обновлен. alignment={alignment}")
+    with transaction(db_path) as cursor:
+        cursor.execute(
+            'UPDATE tokens SET alignment = ? WHERE game_id = ? AND id = ?',
+            (alignment, game_id, token_id)
+        )
+    logger.debug("Жетон с id=%s обновлен. alignment=%s", token_id, alignment)
 
 
-def update_token_character(token_id, character, db_path='empaths.db'):
+def update_token_character(game_id, token_id, character, db_path='empaths.db'):
     """
     Обновляет поле character жетона по его id.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute(
-        'UPDATE tokens SET character = ? WHERE id = ?',
-        (character, token_id)
-    )
-    conn.commit()
-    conn.close()
-    logger.info(f"Жетон с id={token_id} обновлен. character={character}")
+    with transaction(db_path) as cursor:
+        cursor.execute(
+            'UPDATE tokens SET character = ? WHERE game_id = ? AND id = ?',
+            (character, game_id, token_id)
+        )
+    logger.debug("Жетон с id=%s обновлен. character=%s", token_id, character)
+
 
-def update_token_kill(token_id, db_path='empaths.db'):
+def update_token_kill(game_id, token_id, db_path='empaths.db'):
     """
     Обновляет поле alive жетона по его id.
     """
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute(
-            'UPDATE tokens SET alive = 0 WHERE id = ?',
-            (token_id,)  # Обратите внимание на запятую, чтобы создать кортеж
-        )
-        conn.commit()
-        logger.info(f"Жетон с id={token_id} обновлен. alive=False")
+        with transaction(db_path) as cursor:
+            cursor.execute(
+                'UPDATE tokens SET alive = 0 WHERE game_id = ? AND id = ?',
+                (game_id, token_id)
+            )
+        logger.debug("Жетон с id=%s обновлен. alive=False", token_id)
     except sqlite3.Error as e:
         logger.error(f"Ошибка при обновлении жетона: {e}")
-    finally:
-        conn.close()
 
-def get_red_tokens(db_path='empaths.db'):
+
+def get_red_tokens(game_id, db_path='empaths.db'):
     """
-    Возвращает список номеров красных жетонов из базы данных.
+    Возвращает список номеров красных жетонов игры.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM tokens WHERE alignment = 'red'")
-    rows = cursor.fetchall()
-    conn.close()
+    conn = get_connection(db_path)
+    rows = conn.execute("SELECT id FROM tokens WHERE game_id = ? AND alignment = 'red' ORDER BY id", (game_id,)).fetchall()
     red_token_ids = [row[0] for row in rows]
-    logger.info(f"get_red_tokens: retrieved red tokens: {red_token_ids}")
+    logger.debug("get_red_tokens: retrieved red tokens: %s", red_token_ids)
     return red_token_ids
 
 
-
-def get_alive_tokens(db_path='empaths.db'):
+def get_alive_tokens(game_id, db_path='empaths.db'):
     """
-    Возвращает список номеров живых жетонов из базы данных.
+    Возвращает список номеров живых жетонов игры.
     """
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM tokens WHERE alive = 1")
-        rows = cursor.fetchall()
+        conn = get_connection(db_path)
+        rows = conn.execute("SELECT id FROM tokens WHERE game_id = ? AND alive = 1 ORDER BY id", (game_id,)).fetchall()
         alive_token_ids = [row[0] for row in rows]
-        logger.info(f"get_alive_tokens: retrieved alive tokens: {alive_token_ids}")
+        logger.debug("get_alive_tokens: retrieved alive tokens: %s", alive_token_ids)
     except sqlite3.Error as e:
         logger.error(f"Database error occurred: {e}")
         alive_token_ids = []
-    finally:
-        if conn:
-            conn.close()
 
     return alive_token_ids
 
 
-def update_token_red_neighbors(token_id, red_neighbors, db_path='empaths.db'):
+def update_token_red_neighbors(game_id, token_id, red_neighbors, db_path='empaths.db'):
     """
     Обновляет поле red_neighbors жетона по его id.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute(
-        'UPDATE tokens SET red_neighbors = ? WHERE id = ?',
-        (red_neighbors, token_id)
-    )
-    conn.commit()
-    conn.close()
-    logger.info(f"Жетон с id={token_id} обновлен. red_neighbors={red_neighbors}")
+    with transaction(db_path) as cursor:
+        cursor.execute(
+            'UPDATE tokens SET red_neighbors = ? WHERE game_id = ? AND id = ?',
+            (red_neighbors, game_id, token_id)
+        )
+    logger.debug("Жетон с id=%s обновлен. red_neighbors=%s", token_id, red_neighbors)
 
 
 def get_user_by_username(username, db_path='empaths.db'):
     """
     Получает информацию о пользователе по username.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, username, moderator, on_game FROM users WHERE username = ?', (username,))
-    user = cursor.fetchone()
-    conn.close()
-    if user:
-        return {
-            'id': user[0],
-            'username': user[1],
-            'moderator': bool(user[2]),
-            'on_game': bool(user[3])
-        }
-    else:
-        return None
+    return get_user_directory(db_path).get_by_username(username)
+
 
 def get_user_by_id(userid, db_path='empaths.db'):
     """
     Получает информацию о пользователе по ID.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('SELECT id, username, moderator, on_game FROM users WHERE id = ?', (userid,))
-    user = cursor.fetchone()
-    conn.close()
-    if user:
-        return {
-            'id': user[0],
-            'username': user[1],
-            'moderator': bool(user[2]),
-            'on_game': bool(user[3])
-        }
-    else:
-        return None
+    return get_user_directory(db_path).get_by_id(userid)
+
 
 def update_user_on_game(userid, on_game, db_path='empaths.db'):
     """
     Обновляет поле on_game у пользователя.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('UPDATE users SET on_game = ? WHERE id = ?', (int(on_game), userid))
-    conn.commit()
-    conn.close()
+    with transaction(db_path) as cursor:
+        cursor.execute('UPDATE users SET on_game = ? WHERE id = ?', (int(on_game), userid))
+    get_user_directory(db_path).set_on_game(userid, on_game)
 
 
 def reset_user_game_state(user_id):
     """
     Сбрасывает состояние on_game для указанного пользователя.
     """
-    conn = sqlite3.connect('empaths.db')
-    cursor = conn.cursor()
     try:
-        cursor.execute("UPDATE users SET on_game = 0 WHERE id = ?", (user_id,))
-        conn.commit()
+        with transaction() as cursor:
+            cursor.execute("UPDATE users SET on_game = 0 WHERE id = ?", (user_id,))
+        get_user_directory().set_on_game(user_id, False)
         logger.info(f"Состояние on_game для пользователя с id {user_id} успешно сброшено.")
     except Exception as e:
         logger.error(f"Ошибка при сбросе состояния on_game для пользователя с id {user_id}: {e}")
-    finally:
-        conn.close()
 
 
-def update_token_drunk(token_id, db_path='empaths.db'):
+def update_token_drunk(game_id, token_id, db_path='empaths.db'):
     """
     Устанавливает поле drunk у жетона на True по его id.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
     try:
-        cursor.execute(
-            'UPDATE tokens SET drunk = 1 WHERE id = ?',
-            (token_id,)
-        )
-        conn.commit()
-        logger.info(f"Жетон с id={token_id} обновлен. drunk=True")
+        with transaction(db_path) as cursor:
+            cursor.execute(
+                'UPDATE tokens SET drunk = 1 WHERE game_id = ? AND id = ?',
+                (game_id, token_id)
+            )
+        logger.debug("Жетон с id=%s обновлен. drunk=True", token_id)
     except sqlite3.Error as e:
         logger.error(f"Ошибка при обновлении жетона: {e}")
-    finally:
-        conn.close()
 
-def make_all_tokens_sober(db_path='empaths.db'):
+
+def make_all_tokens_sober(game_id, db_path='empaths.db'):
     """
-    Устанавливает поле drunk у всех жетонов на False.
+    Устанавливает поле drunk у всех жетонов игры на False.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
     try:
-        cursor.execute('UPDATE tokens SET drunk = 0')
-        conn.commit()
-        logger.info("У всех жетонов обновилось поле drunk на False")
+        with transaction(db_path) as cursor:
+            cursor.execute('UPDATE tokens SET drunk = 0 WHERE game_id = ?', (game_id,))
+        logger.debug("У всех жетонов обновилось поле drunk на False")
     except sqlite3.Error as e:
         logger.error(f"Ошибка при обновлении жетона: {e}")
-    finally:
-        conn.close()
 
+
+def get_board_file_id(board_key, db_path='empaths.db'):
+    """
+    Возвращает file_id ранее отправленного изображения карты по ключу раскладки или None.
+    """
+    conn = get_connection(db_path)
+    row = conn.execute('SELECT file_id FROM board_photos WHERE board_key = ?', (board_key,)).fetchone()
+    return row[0] if row else None
+
+
+def save_board_file_id(board_key, file_id, db_path='empaths.db'):
+    """
+    Запоминает file_id изображения карты для ключа раскладки.
+    """
+    with transaction(db_path) as cursor:
+        cursor.execute(
+            'INSERT OR REPLACE INTO board_photos (board_key, file_id) VALUES (?, ?)',
+            (board_key, file_id)
+        )
+
+
+def delete_board_file_id(board_key, db_path='empaths.db'):
+    """
+    Удаляет file_id, который Telegram больше не принимает.
+    """
+    with transaction(db_path) as cursor:
+        cursor.execute('DELETE FROM board_photos WHERE board_key = ?', (board_key,))
+
+
+def add_board_history(game_id, board, db_path='empaths.db'):
+    """
+    Добавляет доску, которую увидел игрок, в историю игры.
+    Повтор последней доски не записывается. Возвращает True, если запись добавлена.
+    """
+    with transaction(db_path) as cursor:
+        last = cursor.execute(
+            'SELECT seq, board FROM board_history WHERE game_id = ? ORDER BY seq DESC LIMIT 1', (game_id,)
+        ).fetchone()
+        if last and bytes(last[1]) == bytes(board):
+            return False
+        cursor.execute(
+            'INSERT INTO board_history (game_id, seq, board) VALUES (?, ?, ?)',
+            (game_id, last[0] + 1 if last else 1, bytes(board))
+        )
+        return True
+
+
+def get_board_history(game_id, db_path='empaths.db'):
+    """
+    Возвращает доски игры в порядке показа игроку.
+    """
+    conn = get_connection(db_path)
+    rows = conn.execute('SELECT board FROM board_history WHERE game_id = ? ORDER BY seq', (game_id,)).fetchall()
+    return [bytes(row[0]) for row in rows]
+
+
+def load_persistence(kind, db_path='empaths.db'):
+    """
+    Возвращает сохранённые записи состояния бота заданного вида в виде словаря {key: value}.
+    """
+    conn = get_connection(db_path)
+    rows = conn.execute('SELECT key, value FROM persistence WHERE kind = ?', (kind,)).fetchall()
+    return {key: value for key, value in rows}
+
+
+def save_persistence(upserts, deletes, db_path='empaths.db'):
+    """
+    Записывает накопленные изменения состояния бота одной транзакцией.
+    upserts - список (kind, key, value), deletes - список (kind, key).
+    """
+    with transaction(db_path) as cursor:
+        if upserts:
+            cursor.executemany(UPSERT_PERSISTENCE, upserts)
+        if deletes:
+            cursor.executemany(DELETE_PERSISTENCE, deletes)
@@ -0,0 +1,107 @@
+# db_connection.py
+
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from metrics import METRICS_ENABLED, trace_sql
+
+logger = logging.getLogger(__name__)
+
+# Размер кэша подготовленных выражений на одно соединение.
+# sqlite3 переиспользует скомпилированный запрос, если текст SQL совпадает.
+STATEMENT_CACHE_SIZE = 256
+
+# Сколько миллисекунд ждать снятия блокировки базы другим соединением
+BUSY_TIMEOUT_MS = 5000
+
+_local = threading.local()
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _open_connection(db_path):
+    """
+    Открывает новое соединение и настраивает его для долгой жизни.
+    """
+    conn = sqlite3.connect(
+        db_path,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE
+    )
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA foreign_keys=ON')
+    conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+    if METRICS_ENABLED:
+        # Счётчики выражений и фиксаций для /metrics
+        conn.set_trace_callback(trace_sql)
+    logger.debug(f"Открыто соединение с базой {db_path} в потоке {threading.current_thread().name}")
+    return conn
+
+
+def get_connection(db_path='empaths.db'):
+    """
+    Возвращает соединение текущего потока с базой данных.
+    Соединение открывается один раз на поток и переиспользуется всеми запросами.
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+        with _registry_lock:
+            _registry.append(connections)
+
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = _open_connection(db_path)
+        connections[db_path] = conn
+    return conn
+
+
+@contextmanager
+def transaction(db_path='empaths.db'):
+    """
+    Выполняет блок запросов в одной транзакции.
+    При выходе без ошибок изменения фиксируются, при исключении откатываются.
+    """
+    conn = get_connection(db_path)
+    with conn:
+        yield conn.cursor()
+
+
+@contextmanager
+def read_transaction(db_path='empaths.db'):
+    """
+    Выполняет несколько чтений в одном снимке базы.
+    BEGIN и COMMIT/ROLLBACK выдаются явно, поэтому блок не зависит от того, как sqlite3
+    открывает неявные транзакции (isolation_level). Внутри блока допускаются только чтения.
+    """
+    conn = get_connection(db_path)
+    conn.execute('BEGIN')
+    try:
+        yield conn.cursor()
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
+
+
+def close_all_connections():
+    """
+    Закрывает все открытые соединения во всех потоках.
+    Вызывается при остановке бота.
+    """
+    with _registry_lock:
+        registry = list(_registry)
+
+    closed = 0
+    for connections in registry:
+        for conn in connections.values():
+            try:
+                conn.close()
+                closed += 1
+            except sqlite3.Error as e:
+                logger.error(f"Ошибка при закрытии соединения: {e}")
+        connections.clear()
+
+    logger.info(f"Закрыто соединений с базой данных: {closed}")
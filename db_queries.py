@@ -10,6 +10,12 @@ CREATE TABLE IF NOT EXISTS users (
 )
 '''
 
+# Индексы для поиска пользователя по username и списка модераторов
+CREATE_USERS_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_users_username ON users (username)',
+    'CREATE INDEX IF NOT EXISTS idx_users_moderator ON users (id) WHERE moderator = 1',
+)
+
 INSERT_USER = '''
 INSERT INTO users (username, userid, moderator, on_game)
 VALUES (?, ?, ?, ?)
@@ -52,37 +58,99 @@ WHERE id = ?
 '''
 
 
-# Создание таблицы tokens с обновленным столбцом alignment
+# Поля игры в порядке, который ожидает database._game_set_from_row
+GAME_SET_COLUMNS = 'id, tokens_count, red_count, player_id, player_username, moderator_id, moderator_username'
+
+# Индексы для поиска активной игры пользователя
+CREATE_GAME_SET_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_game_set_moderator_id ON game_set (moderator_id)',
+    'CREATE INDEX IF NOT EXISTS idx_game_set_player_id ON game_set (player_id)',
+)
+
+# Создание таблицы tokens: жетоны принадлежат игре, id - номер жетона за столом этой игры
 CREATE_TOKENS_TABLE = '''
 CREATE TABLE IF NOT EXISTS tokens (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    game_id INTEGER NOT NULL REFERENCES game_set (id) ON DELETE CASCADE,
+    id INTEGER NOT NULL,
     alignment TEXT CHECK(alignment IN ('blue', 'red')),
     character TEXT CHECK(character IN ('townfolk', 'minion', 'demon')),
     red_neighbors INTEGER DEFAULT 0,
     alive BOOLEAN NOT NULL DEFAULT 1,
-    drunk BOOLEAN NOT NULL DEFAULT 0
+    drunk BOOLEAN NOT NULL DEFAULT 0,
+    PRIMARY KEY (game_id, id)
 )
 '''
 
 # Вставка нового жетона
 INSERT_TOKEN = '''
-INSERT INTO tokens (alignment, character, red_neighbors)
-VALUES (?, ?, ?)
+INSERT INTO tokens (game_id, id, alignment, character, red_neighbors)
+VALUES (?, ?, ?, ?, ?)
 '''
 
-# Очистка таблицы tokens
-DELETE_ALL_TOKENS = '''
+# Очистка жетонов игры
+DELETE_GAME_TOKENS = '''
 DELETE FROM tokens
+WHERE game_id = ?
 '''
 
-# Получение всех жетонов
+# Получение всех жетонов игры
 SELECT_ALL_TOKENS = '''
 SELECT id, alignment, character, red_neighbors FROM tokens
+WHERE game_id = ?
 '''
 
 # Обновление жетона
 UPDATE_TOKEN = '''
 UPDATE tokens
 SET alignment = ?, character = ?, red_neighbors = ?
-WHERE id = ?
-'''
\ No newline at end of file
+WHERE game_id = ? AND id = ?
+'''
+
+# Поля жетона, которые можно менять пакетным обновлением
+TOKEN_FIELDS = ('alignment', 'character', 'red_neighbors', 'alive', 'drunk')
+
+# Полное обновление изменяемых полей жетона (используется в executemany)
+UPDATE_TOKEN_FIELDS = '''
+UPDATE tokens
+SET alignment = ?, character = ?, red_neighbors = ?, alive = ?, drunk = ?
+WHERE game_id = ? AND id = ?
+'''
+
+
+# Таблица file_id, которые Telegram вернул для отправленных изображений карты
+CREATE_BOARD_PHOTOS_TABLE = '''
+CREATE TABLE IF NOT EXISTS board_photos (
+    board_key TEXT PRIMARY KEY,
+    file_id TEXT NOT NULL
+)
+'''
+
+
+# Доски, которые видел игрок, в записи board_codec: история игры для перебора рассадок
+CREATE_BOARD_HISTORY_TABLE = '''
+CREATE TABLE IF NOT EXISTS board_history (
+    game_id INTEGER NOT NULL REFERENCES game_set (id) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    board BLOB NOT NULL,
+    PRIMARY KEY (game_id, seq)
+)
+'''
+
+
+# Состояние бота между перезапусками: user_data, bot_data и состояния ConversationHandler
+CREATE_PERSISTENCE_TABLE = '''
+CREATE TABLE IF NOT EXISTS persistence (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (kind, key)
+)
+'''
+
+UPSERT_PERSISTENCE = '''
+INSERT OR REPLACE INTO persistence (kind, key, value) VALUES (?, ?, ?)
+'''
+
+DELETE_PERSISTENCE = '''
+DELETE FROM persistence WHERE kind = ? AND key = ?
+'''
@@ -1,6 +1,7 @@
 import arcade
 import random
 import math
+import game_engine
 
 SCREEN_WIDTH = 1600  # Увеличиваем ширину окна для двух областей
 SCREEN_HEIGHT = 600
@@ -9,18 +10,21 @@ SCREEN_TITLE = "Кровь на Часовой Башне: Эмпаты"
 NUM_PLAYERS = 16
 NUM_REDS = 4  # Количество красных игроков, включая демона
 
-# Класс для хранения состояния игры
+# Класс для хранения состояния игры на экране; правила игры - в game_engine.GameState
 class GameState:
     def __init__(self):
-        self.players = []
+        self.roles = []
         self.night_phase = False  # Начинаем с дневной фазы
         self.demon = None
         self.game_over = False
         self.pending_night_kill = None  # Для хранения игрока, убитого ночью, но еще не показанного игроку
+        self.engine = None  # game_engine.GameState: жизни, соседи и числа на жетонах
+        self.executed = [False] * NUM_PLAYERS
+        self.visible_to_player = [True] * NUM_PLAYERS  # Контролирует видимость на экране игрока
         self.init_game()
 
     def init_game(self):
-        self.players = []
+        self.roles = []
         print("Ведущий, вы хотите случайную рассадку игроков? (y/n)")
         random_seating = input().strip().lower()
 
@@ -28,11 +32,8 @@ class GameState:
             # Случайная рассадка
             roles = ['blue'] * (NUM_PLAYERS - NUM_REDS) + ['red'] * (NUM_REDS - 1) + ['demon']
             random.shuffle(roles)
-            for i in range(NUM_PLAYERS):
-                role = roles[i]
-                if role == 'demon':
-                    self.demon = i
-                self.players.append(Player(role, i))
+            self.roles = roles
+            self.demon = roles.index('demon')
         else:
             # Вручную назначаем роли
             print("Введите 'b' для синего эмпата, 'r' для красного эмпата, 'd' для демона.")
@@ -60,50 +61,43 @@ class GameState:
                             print("Демон уже назначен. Выберите другую роль.")
                     else:
                         print("Неверный ввод. Попробуйте снова.")
-                self.players.append(Player(role, i))
+                self.roles.append(role)
 
-        # Устанавливаем количество красных соседей для эмпатов
-        for player in self.players:
-            player.update_neighbors(self.players)
+        # Движок сам считает красных соседей для эмпатов
+        self.engine = game_engine.GameState([role in ['red', 'demon'] for role in self.roles], self.demon)
 
         # Предлагаем ведущему установить случайные цифры для красных эмпатов
         print("Ведущий, вы хотите случайные цифры для красных эмпатов? (y/n)")
         random_fake_info = input().strip().lower()
+        self.update_red_fake_info(randomize=random_fake_info == 'y')
 
-        if random_fake_info == 'y':
-            self.update_red_fake_info(randomize=True)
-        else:
-            # Вручную вводим цифры для красных эмпатов
-            for i, player in enumerate(self.players):
-                if player.role == 'red':
-                    while True:
-                        try:
-                            fake_info = int(input(f"Введите цифру (0, 1 или 2) для красного эмпата {i + 1}: "))
-                            if fake_info in [0, 1, 2]:
-                                player.fake_red_neighbors_count = fake_info
-                                break
-                            else:
-                                print("Нужно ввести 0, 1 или 2.")
-                        except ValueError:
-                            print("Пожалуйста, введите число 0, 1 или 2.")
+    def is_alive(self, position):
+        return bool(self.engine.alive[position])
+
+    def get_info(self, position):
+        return f"{self.engine.shown(position)}"
 
-    def update_all_blue_neighbors(self):
-        for player in self.players:
-            if player.alive and player.role == 'blue':
-                player.update_neighbors(self.players)
+    def kill_player(self, position):
+        # Ночное убийство: движок убирает игрока из кольца и обновляет двух его соседей
+        self.engine.kill(position)
+
+    def execute_player(self, position):
+        # Дневная казнь
+        self.executed[position] = True
+        self.engine.execute(position)
 
     def update_red_fake_info(self, randomize=True):
-        for player in self.players:
-            if player.alive and player.role in ['red', 'demon']:
+        for position, role in enumerate(self.roles):
+            if self.is_alive(position) and role in ['red', 'demon']:
                 if randomize:
-                    player.fake_red_neighbors_count = random.randint(0, 2)
+                    self.engine.set_bluff(position, random.randint(0, 2))
                 else:
                     # Если не рандом, ведущий вводит цифры вручную
                     while True:
                         try:
-                            fake_info = int(input(f"Введите цифру (0, 1 или 2) для красного эмпата {player.position + 1}: "))
+                            fake_info = int(input(f"Введите цифру (0, 1 или 2) для красного эмпата {position + 1}: "))
                             if fake_info in [0, 1, 2]:
-                                player.fake_red_neighbors_count = fake_info
+                                self.engine.set_bluff(position, fake_info)
                                 break
                             else:
                                 print("Нужно ввести 0, 1 или 2.")
@@ -111,16 +105,10 @@ class GameState:
                             print("Пожалуйста, введите число 0, 1 или 2.")
 
     def check_game_over(self):
-        alive_blues = sum(1 for player in self.players if player.alive and player.role == 'blue')
-        alive_reds = sum(1 for player in self.players if player.alive and player.role in ['red', 'demon'])
-
-        if alive_blues == 0:
-            print("Все синие игроки мертвы. Красные игроки победили!")
+        if self.engine.winner == game_engine.RED:
+            print("В игре осталось два жетона. Красные игроки победили!")
             self.game_over = True
-        elif alive_blues == 1 and alive_reds == 1 and self.players[self.demon].alive:
-            print("Остались только один синий игрок и демон. Красные игроки победили!")
-            self.game_over = True
-        elif not self.players[self.demon].alive:
+        elif self.engine.winner == game_engine.BLUE:
             print("Демон мертв. Синие игроки победили!")
             self.game_over = True
 
@@ -130,49 +118,6 @@ class GameState:
         else:
             return "День: ход игроков"
 
-class Player:
-    def __init__(self, role, position):
-        self.role = role  # 'blue', 'red', 'demon'
-        self.position = position
-        self.alive = True
-        self.visible_to_player = True  # Контролирует видимость на экране игрока
-        self.executed = False
-        self.red_neighbors_count = 0
-        self.fake_red_neighbors_count = 0
-
-    def update_neighbors(self, players):
-        if self.role == 'blue':
-            # Обновляем количество красных соседей
-            left_index = self.position
-            while True:
-                left_index = (left_index - 1) % NUM_PLAYERS
-                if players[left_index].alive and left_index != self.position:
-                    break
-                if left_index == self.position:
-                    break
-
-            right_index = self.position
-            while True:
-                right_index = (right_index + 1) % NUM_PLAYERS
-                if players[right_index].alive and right_index != self.position:
-                    break
-                if right_index == self.position:
-                    break
-
-            neighbors = []
-            if left_index != self.position and players[left_index].alive:
-                neighbors.append(players[left_index])
-            if right_index != self.position and players[right_index].alive:
-                neighbors.append(players[right_index])
-
-            self.red_neighbors_count = sum(1 for neighbor in neighbors if neighbor.role in ['red', 'demon'])
-
-    def get_info(self):
-        if self.role == 'blue':
-            return f"{self.red_neighbors_count}"
-        else:
-            return f"{self.fake_red_neighbors_count}"
-
 
 # Представление игры
 class GameView(arcade.View):
@@ -219,27 +164,27 @@ class GameView(arcade.View):
         radius = 250
 
         for i in range(NUM_PLAYERS):
-            player = self.game_state.players[i]
+            role = self.game_state.roles[i]
             angle = math.radians((360 / NUM_PLAYERS) * i)
             x = center_x + radius * math.cos(angle)
             y = center_y + radius * math.sin(angle)
 
             # Цвет по роли
-            if player.alive:
-                if player.executed:
+            if self.game_state.is_alive(i):
+                if self.game_state.executed[i]:
                     color = arcade.color.YELLOW
-                elif player.role == 'blue':
+                elif role == 'blue':
                     color = arcade.color.BLUE
-                elif player.role == 'red':
+                elif role == 'red':
                     color = arcade.color.RED
-                elif player.role == 'demon':
+                elif role == 'demon':
                     color = arcade.color.BLACK
                 else:
                     color = arcade.color.LIGHT_GRAY
                 arcade.draw_circle_filled(x, y, 20, color)
 
                 # Отображаем информацию эмпата
-                info = player.get_info()
+                info = self.game_state.get_info(i)
                 arcade.draw_text(info, x + 25, y - 10, arcade.color.WHITE, 12)
             else:
                 # Жетон мертвого игрока
@@ -275,15 +220,15 @@ class GameView(arcade.View):
         radius = 250
 
         for i in range(NUM_PLAYERS):
-            player = self.game_state.players[i]
+            executed = self.game_state.executed[i]
             angle = math.radians((360 / NUM_PLAYERS) * i)
             x = center_x + radius * math.cos(angle)
             y = center_y + radius * math.sin(angle)
 
             # Проверяем видимость игрока на экране игрока
-            if player.visible_to_player:
-                if player.alive:
-                    if player.executed:
+            if self.game_state.visible_to_player[i]:
+                if self.game_state.is_alive(i):
+                    if executed:
                         color = arcade.color.YELLOW
                     else:
                         color = arcade.color.LIGHT_GRAY
@@ -294,14 +239,14 @@ class GameView(arcade.View):
             else:
                 # Если игрок скрыт от игрока (например, убит ночью, но еще не открыт игроку)
                 # Отображаем как живого
-                if player.executed:
+                if executed:
                     color = arcade.color.YELLOW
                 else:
                     color = arcade.color.LIGHT_GRAY
                 arcade.draw_circle_filled(x, y, 20, color)
 
             # Отображаем информацию эмпата
-            info = player.get_info()
+            info = self.game_state.get_info(i)
             arcade.draw_text(info, x + 25, y - 10, arcade.color.BLACK, 12)
 
             # Отображаем номер игрока
@@ -363,10 +308,9 @@ class GameView(arcade.View):
 
     def night_phase_actions(self, target):
         if 0 <= target < NUM_PLAYERS:
-            player = self.game_state.players[target]
-            if player.alive and target != self.game_state.demon:
-                player.alive = False
-                player.visible_to_player = False  # Скрываем от игрока информацию об убийстве
+            if self.game_state.is_alive(target) and target != self.game_state.demon:
+                self.game_state.kill_player(target)
+                self.game_state.visible_to_player[target] = False  # Скрываем от игрока информацию об убийстве
                 self.game_state.pending_night_kill = target
                 print(f"Ночью демон убил игрока {target + 1}")
 
@@ -374,35 +318,28 @@ class GameView(arcade.View):
                 self.window.invalid = True
 
                 # Обновляем информацию после ночи
-                self.game_state.update_all_blue_neighbors()
-                self.game_state.update_red_fake_info(randomize=False)  # Ведущий вводит цифры после ночи
                 self.game_state.check_game_over()
+                if not self.game_state.game_over:
+                    self.game_state.update_red_fake_info(randomize=False)  # Ведущий вводит цифры после ночи
                 self.game_state.night_phase = False  # Переход в дневную фазу
 
                 # После выбора цифр для красных эмпатов открываем игроку информацию об убийстве
-                killed_player = self.game_state.players[self.game_state.pending_night_kill]
-                killed_player.visible_to_player = True  # Теперь игрок видит, что этот игрок мертв
+                self.game_state.visible_to_player[self.game_state.pending_night_kill] = True
                 self.game_state.pending_night_kill = None
 
     def day_phase_actions(self, selected_player):
-        player = self.game_state.players[selected_player]
-        if player.alive:
-            player.executed = True
-            player.alive = False
-            player.visible_to_player = True  # Сразу показываем игроку, что этот игрок мертв
+        if self.game_state.is_alive(selected_player):
+            self.game_state.execute_player(selected_player)
+            self.game_state.visible_to_player[selected_player] = True  # Сразу показываем игроку, что этот игрок мертв
             print(f"Днем был казнен игрок {selected_player + 1}")
 
             # Обновляем экран, чтобы отобразить изменения сразу
             self.window.invalid = True
 
-            # Обновляем информацию после дня
-            self.game_state.update_all_blue_neighbors()
+            # Информация соседей уже обновлена движком при казни
             # Не вызываем update_red_fake_info(), так как цифры для красных эмпатов выбираются только после ночи
             self.game_state.check_game_over()
-            if player.position == self.game_state.demon:
-                print("Демон казнен! Синие игроки победили!")
-                self.game_state.game_over = True
-            else:
+            if not self.game_state.game_over:
                 self.game_state.night_phase = True  # Переход в ночную фазу
 
     def on_key_press(self, key, modifiers):
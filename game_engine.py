@@ -0,0 +1,191 @@
+# game_engine.py
+"""
+Правила игры без Telegram, базы данных и arcade: состояние стола и переходы дня и ночи.
+
+Позиции жетонов нумеруются с 0 (жетон с id=k занимает позицию k-1). Каждый переход
+возвращает кортеж событий (вид, позиция, значение), по которым вызывающий код
+обновляет базу данных или экран:
+
+    (EXECUTED, позиция, 0)   - жетон казнён днём и умер
+    (KILLED, позиция, 0)     - жетон убит ночью и умер
+    (SHOWN, позиция, число)  - изменилось число, которое показывает жетон
+    (WON, позиция, сторона)  - игра окончена, сторона BLUE или RED; для BLUE позиция - демон,
+                               который остаётся живым, чтобы карта победы его показала
+
+Порядок фаз не проверяется: его задают обработчики бота или экран arcade.
+"""
+
+from neighbor_ring import NeighborRing
+
+BLUE = 'blue'
+RED = 'red'
+
+EXECUTED = 'executed'
+KILLED = 'killed'
+SHOWN = 'shown'
+WON = 'won'
+
+# Красные побеждают, когда живых жетонов остаётся столько или меньше
+RED_WIN_ALIVE = 2
+
+# Жетон показывает от 0 до MAX_RED_NEIGHBORS красных соседей
+MAX_RED_NEIGHBORS = 2
+
+NO_EVENTS = ()
+
+
+class GameState(NeighborRing):
+    """
+    Состояние одной игры в массивах по позициям. Кольцо живых жетонов и настоящие числа
+    красных соседей (red, alive, left/right, red_neighbors) ведёт NeighborRing - тот же,
+    что считает числа для бота; drunk - bytearray пьяных жетонов, bluff - число, которое
+    показывает красный или пьяный жетон.
+    """
+    __slots__ = ('drunk', 'bluff', 'demon', 'alive_count', 'day', 'night', 'winner')
+
+    def __init__(self, red, demon=-1, alive=None):
+        super().__init__(red, alive)
+        self.drunk = bytearray(self.size)
+        self.bluff = [0] * self.size
+        self.demon = demon
+        self.day = 1
+        self.night = False
+        self.alive_count = sum(self.alive)
+        self.winner = RED if self.alive_count <= RED_WIN_ALIVE else None
+
+    def copy(self):
+        """
+        Независимая копия состояния. Для симуляций дешевле, чем строить стол заново.
+        """
+        state = GameState.__new__(GameState)
+        state.size = self.size
+        state.red = self.red[:]
+        state.alive = self.alive[:]
+        state.drunk = self.drunk[:]
+        state.left = self.left[:]
+        state.right = self.right[:]
+        state.red_neighbors = self.red_neighbors[:]
+        state.bluff = self.bluff[:]
+        state.demon = self.demon
+        state.alive_count = self.alive_count
+        state.day = self.day
+        state.night = self.night
+        state.winner = self.winner
+        return state
+
+    @classmethod
+    def from_tokens(cls, tokens):
+        """
+        Строит состояние по жетонам в формате get_all_tokens.
+        Жетоны, которых нет в списке, считаются мёртвыми синими.
+        """
+        size = len(tokens)
+        red = [False] * size
+        alive = [False] * size
+        demon = -1
+        for token in tokens:
+            position = token['id'] - 1
+            if 0 <= position < size:
+                red[position] = token['alignment'] == RED
+                alive[position] = bool(token['alive'])
+                if token['character'] == 'demon':
+                    demon = position
+
+        state = cls(red, demon, alive)
+        for token in tokens:
+            position = token['id'] - 1
+            if 0 <= position < size:
+                state.drunk[position] = 1 if token.get('drunk') else 0
+                state.bluff[position] = token['red_neighbors'] or 0
+        return state
+
+    def shown(self, position):
+        """
+        Число, которое видит игрок на жетоне: правда у трезвых синих, блеф у красных и пьяных.
+        """
+        if self.red[position] or self.drunk[position]:
+            return self.bluff[position]
+        return self.red_neighbors[position]
+
+    def _remove(self, position, kind):
+        """
+        Убирает живой жетон из кольца и возвращает события: сама смерть, изменения чисел соседей
+        и, если живых осталось мало, победа красных.
+        """
+        self.alive_count -= 1
+        events = ((kind, position, 0),)
+        # Числа могут измениться только у двух соседей убитого жетона
+        for neighbor in self.remove(position):
+            if not (self.red[neighbor] or self.drunk[neighbor]):
+                events += ((SHOWN, neighbor, self.red_neighbors[neighbor]),)
+
+        if self.alive_count <= RED_WIN_ALIVE:
+            self.winner = RED
+            events += ((WON, -1, RED),)
+        return events
+
+    def execute(self, position):
+        """
+        Дневная казнь. Казнь демона - победа синих (сам жетон демона остаётся на месте).
+        Мёртвый жетон или законченная игра ничего не меняют.
+        """
+        if self.winner or not self.alive[position]:
+            return NO_EVENTS
+        if position == self.demon:
+            self.winner = BLUE
+            return ((WON, position, BLUE),)
+        self.night = True
+        return self._remove(position, EXECUTED)
+
+    def kill(self, position):
+        """
+        Ночное убийство. Если модератор убил демона, это победа синих (жетон демона остаётся на месте).
+        """
+        if self.winner or not self.alive[position]:
+            return NO_EVENTS
+        if position == self.demon:
+            self.winner = BLUE
+            return ((WON, position, BLUE),)
+        self.night = False
+        self.day += 1
+        return self._remove(position, KILLED)
+
+    def set_bluff(self, position, value):
+        """
+        Задаёт число, которое показывает красный жетон.
+        """
+        if not self.red[position]:
+            raise ValueError(f"Жетон {position + 1} не красный")
+        if self.bluff[position] == value:
+            return NO_EVENTS
+        self.bluff[position] = value
+        return ((SHOWN, position, value),) if self.alive[position] else NO_EVENTS
+
+    def set_drunk(self, position, value):
+        """
+        Делает синий жетон пьяным: до отрезвления он показывает value вместо правды.
+        """
+        if self.red[position]:
+            raise ValueError(f"Жетон {position + 1} красный и не может быть пьяным")
+        previous = self.shown(position)
+        self.drunk[position] = 1
+        self.bluff[position] = value
+        if previous == value or not self.alive[position]:
+            return NO_EVENTS
+        return ((SHOWN, position, value),)
+
+    def sober_all(self):
+        """
+        Отрезвляет все жетоны. Живые синие снова показывают настоящее число красных соседей.
+        """
+        events = []
+        for position in range(self.size):
+            if not self.drunk[position]:
+                continue
+            self.drunk[position] = 0
+            if self.alive[position] and not self.red[position] and self.bluff[position] != self.red_neighbors[position]:
+                events.append((SHOWN, position, self.red_neighbors[position]))
+        return tuple(events)
+
+    def alive_positions(self):
+        return [position for position in range(self.size) if self.alive[position]]
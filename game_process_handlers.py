@@ -1,20 +1,15 @@
 # game_process_handlers.py
 
+import asyncio
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
-from database import (
-    get_alive_tokens,
+from async_database import (
     update_user_on_game,
-    get_moderators,
-    get_latest_game_set,
-    get_token_by_id,
-    get_red_tokens,
-    update_token_red_neighbors,
-    update_token_kill,
-    reset_user_game_state,
-    make_all_tokens_sober
+    reset_user_game_state
 )
-from red_neighbors_handlers import count_red_neighbors_of_blue_tokens, make_drunk
+from red_neighbors_handlers import make_drunk
+from game_snapshot import load_game_snapshot, get_caller_snapshot
+from game_engine import BLUE, RED, MAX_RED_NEIGHBORS
 from render_game_set import show_game_set
 from constants import (
   EXECUTE_TOKEN, 
@@ -28,6 +23,7 @@ import logging
 
 from player_manager import invite_player
 from utils import escape_html
+from broadcast import broadcaster
 
 logger = logging.getLogger(__name__)
 
@@ -40,19 +36,23 @@ async def start_game(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     username = user.username or user.first_name or "Unknown"
 
     # Проверяем, является ли пользователь игроком
-    game_set = get_latest_game_set()
-    player_id = game_set.get('player_id')
-    player_username = game_set.get('player_username')
+    snapshot = await load_game_snapshot(user_id)
+    if not snapshot:
+        return ConversationHandler.END
+    game_id = snapshot.game_id
+    player_id = snapshot.player_id
+    player_username = snapshot.game_set.get('player_username')
 
     if user_id != player_id:
         # Если это не игрок, игнорируем сообщение
         return ConversationHandler.END
 
     # Отправляем карту жетонов игроку
-    count_red_neighbors_of_blue_tokens()
-    await show_game_set(context, player_id, moderator=False)
+    snapshot.recount_red_neighbors()
+    await snapshot.commit()
+    await show_game_set(context, player_id, moderator=False, game_id=game_id, snapshot=snapshot)
     logger.info(f"Игроку @{player_username} ({player_id}) отправлена карта жетонов.")
-    update_user_on_game(player_id, True)
+    await update_user_on_game(player_id, True)
 
     await context.bot.send_message(
         chat_id=player_id,
@@ -83,64 +83,58 @@ async def execute_token_player(update: Update, context: ContextTypes.DEFAULT_TYP
 
     token_id = int(text)
 
-    # Проверяем, существует ли жетон в базе данных
-    token = get_token_by_id(token_id)
+    snapshot = await get_caller_snapshot(update)
+    if not snapshot:
+        return ConversationHandler.END
+    game_id = snapshot.game_id
+    moderator_id = snapshot.moderator_id
+
+    # Проверяем, существует ли жетон в игре
+    token = snapshot.token(token_id)
     if not token:
         await update.message.reply_text(f"Жетон с номером {token_id} не найден в базе данных. Пожалуйста, выберите существующий жетон.")
         return EXECUTE_TOKEN
 
-    # Проверка, является ли выбранный жетон демоном
-    if token['character'] == 'demon':
+    # Казнь демона заканчивает игру победой синих, иначе жетон убит и числа соседей обновлены
+    snapshot.execute(token_id)
+    if snapshot.winner == BLUE:
         # Сообщение игроку о победе
-        count_red_neighbors_of_blue_tokens()
-        await show_game_set(context, user_id, moderator=True)
+        snapshot.recount_red_neighbors()
+        await snapshot.commit()
+        await show_game_set(context, user_id, moderator=True, game_id=game_id, snapshot=snapshot)
         await update.message.reply_text("🏆 Вы казнили демона, победа синего города!")
 
-        # Сообщение модератору о победе синих
-        moderators = get_moderators()
-        if moderators:
-            moderator = moderators[0]
-            moderator_id = moderator['id']
-            await context.bot.send_message(
-                chat_id=moderator_id,
-                text=f"💀 Игрок @{username} казнил демона. Победа синих. Нажмите /start, чтобы начать игру заново"
-            )
-            logger.info(f"Игрок @{username} казнил демона. Победа синих объявлена.")
-            reset_user_game_state(user_id)
-            reset_user_game_state(moderator_id)
-        else:
-            logger.warning("Модератор не найден для отправки сообщения.")
+        # Сообщение модератору этой игры о победе синих
+        await context.bot.send_message(
+            chat_id=moderator_id,
+            text=f"💀 Игрок @{username} казнил демона. Победа синих. Нажмите /start, чтобы начать игру заново"
+        )
+        logger.info(f"Игрок @{username} казнил демона в игре {game_id}. Победа синих объявлена.")
+        await reset_user_game_state(user_id)
+        await reset_user_game_state(moderator_id)
 
         # Завершение игры
         return ConversationHandler.END
 
-    # Если жетон не является демоном, обновляем его статус на "убит"
-    update_token_kill(token_id)
+    # Смерть жетона и новые числа его соседей записываются одной транзакцией
+    await snapshot.commit()
     logger.info(f"Игрок @{username} выбрал для казни жетон {token_id}, и его статус был обновлен на 'убит'.")
-    # count_red_neighbors_of_blue_tokens()
-    # await show_game_set(context, user_id, moderator=False)
     await update.message.reply_text(f"Жетон {token_id} выбран для казни и его статус обновлен. Ждем ход модератора..")
 
-    moderators = get_moderators()
-    if moderators:
-        moderator = moderators[0]
-        moderator_id = moderator['id']
-        message = f"Игрок @{username} выбрал для казни жетон {token_id}."
-        try:
-            count_red_neighbors_of_blue_tokens()
-            await show_game_set(context, moderator_id, moderator=True)
-            await context.bot.send_message(chat_id=moderator_id, text=message)
-            logger.info(f"Модератору отправлено сообщение о выборе игрока @{username}.")
-        except Exception as e:
-            logger.error(f"Не удалось отправить сообщение модератору: {e}")
-    else:
-        logger.warning("Модератор не найден для отправки сообщения.")
+    message = f"Игрок @{username} выбрал для казни жетон {token_id}."
+    try:
+        await show_game_set(context, moderator_id, moderator=True, game_id=game_id, snapshot=snapshot)
+        await context.bot.send_message(chat_id=moderator_id, text=message)
+        logger.info(f"Модератору отправлено сообщение о выборе игрока @{username}.")
+    except Exception as e:
+        logger.error(f"Не удалось отправить сообщение модератору: {e}")
 
-    is_red_won = await red_won(context)
+    is_red_won = await red_won(context, snapshot)
     if is_red_won:
         return ConversationHandler.END
-    
-    context.bot_data['awaiting_red_neighbors'] = True
+
+    # Игры, в которых модератор должен ввести соседей красных жетонов
+    context.bot_data.setdefault('awaiting_red_neighbors', set()).add(game_id)
 
     await context.bot.send_message(
         chat_id=moderator_id,
@@ -156,9 +150,14 @@ async def skip_enter_neighbors(update: Update, context: ContextTypes.DEFAULT_TYP
     """
     Пропускает ввод количества соседей для красных жетонов и переходит к этапу выбора жетона для убийства.
     """
+    snapshot = await get_caller_snapshot(update)
+    if not snapshot:
+        return ConversationHandler.END
+
     await update.message.reply_text("Переходим к выбору жетона для убийства.")
-    
-    make_all_tokens_sober()
+
+    snapshot.sober_all()
+    await snapshot.commit()
     
     return await kill_token(update, context)
 
@@ -167,21 +166,27 @@ async def reenter_red_neighbors_for_red(update: Update, context: ContextTypes.DE
     """
     Запрашивает у модератора количество красных соседей для каждого красного жетона.
     """
-    # Проверяем, ожидается ли ввод красных соседей
-    if not context.bot_data.get('awaiting_red_neighbors'):
+    snapshot = await get_caller_snapshot(update)
+    if not snapshot:
+        return ConversationHandler.END
+    game_id = snapshot.game_id
+    awaiting_games = context.bot_data.setdefault('awaiting_red_neighbors', set())
+
+    # Проверяем, ожидается ли ввод красных соседей в этой игре
+    if game_id not in awaiting_games:
         await update.message.reply_text("Сейчас нет необходимости вводить количество красных соседей.")
         return ConversationHandler.END
 
     # Если это первый вызов функции, инициализируем данные
     if 'red_tokens' not in context.user_data or not context.user_data.get('awaiting_red_neighbors_input'):
-        # Получаем список красных жетонов из базы данных
-        red_tokens = get_red_tokens()
-        logger.info(f"Red tokens retrieved: {red_tokens}")
+        # Получаем список красных жетонов игры
+        red_tokens = snapshot.red_tokens()
+        logger.debug("Red tokens retrieved: %s", red_tokens)
 
         if not red_tokens:
             await update.message.reply_text("Нет красных жетонов для обработки.")
             # Сбрасываем флаг, чтобы избежать повторного ввода
-            context.bot_data['awaiting_red_neighbors'] = False
+            awaiting_games.discard(game_id)
             return ConversationHandler.END
 
         context.user_data['red_tokens'] = red_tokens
@@ -199,7 +204,7 @@ async def reenter_red_neighbors_for_red(update: Update, context: ContextTypes.DE
     if current_index >= len(red_tokens):
         await update.message.reply_text("Все красные жетоны уже обработаны.")
         # Сбрасываем флаги
-        context.bot_data['awaiting_red_neighbors'] = False
+        awaiting_games.discard(game_id)
         context.user_data.pop('awaiting_red_neighbors_input', None)
         context.user_data.pop('red_tokens', None)
         context.user_data.pop('current_red_token_index', None)
@@ -215,9 +220,12 @@ async def reenter_red_neighbors_for_red(update: Update, context: ContextTypes.DE
         return GET_RED_TOKEN_RED_NEIGHBORS_IN_GAME
 
     red_neighbors = int(red_neighbors_text)
+    if red_neighbors > MAX_RED_NEIGHBORS:
+        await update.message.reply_text(f"У жетона может быть от 0 до {MAX_RED_NEIGHBORS} красных соседей.")
+        return GET_RED_TOKEN_RED_NEIGHBORS_IN_GAME
 
-    # Обновляем поле red_neighbors в базе данных для текущего красного жетона
-    update_token_red_neighbors(token_number, red_neighbors)
+    # Обновляем поле red_neighbors для текущего красного жетона
+    snapshot.set_bluff(token_number, red_neighbors)
     logger.info(f"Жетон {token_number}: количество соседей обновлено до {red_neighbors}")
 
     # Проверяем, есть ли ещё красные жетоны для обработки
@@ -226,22 +234,23 @@ async def reenter_red_neighbors_for_red(update: Update, context: ContextTypes.DE
 
     if current_index < len(red_tokens):
         next_token_number = red_tokens[current_index]
+        await snapshot.commit()
         await update.message.reply_text(f"Введи количество красных соседей для жетона номер {next_token_number}:")
         return GET_RED_TOKEN_RED_NEIGHBORS_IN_GAME
     else:
         # Все данные введены, сохраняем изменения и отправляем обновлённую раскладку
         await update.message.reply_text("Ввод количества красных соседей завершён.")
 
-        make_all_tokens_sober()
-
-        player_id = get_latest_game_set().get('player_id')
+        # Соседи последнего красного жетона, отрезвление и пересчёт записываются вместе
+        snapshot.sober_all()
+        snapshot.recount_red_neighbors()
+        await snapshot.commit()
 
         # Отправляем обновлённую раскладку модератору
-        count_red_neighbors_of_blue_tokens()
-        await show_game_set(context, update.effective_user.id, moderator=True)
+        await show_game_set(context, update.effective_user.id, moderator=True, game_id=game_id, snapshot=snapshot)
 
         # Сбрасываем флаги и очищаем данные
-        context.bot_data['awaiting_red_neighbors'] = False
+        awaiting_games.discard(game_id)
         context.user_data.pop('awaiting_red_neighbors_input', None)
         context.user_data.pop('red_tokens', None)
         context.user_data.pop('current_red_token_index', None)
@@ -267,19 +276,25 @@ async def confirm_kill(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
 
     token_id = int(text)
 
-    token = get_token_by_id(token_id)
+    snapshot = await get_caller_snapshot(update)
+    if not snapshot:
+        return ConversationHandler.END
+    game_id = snapshot.game_id
+
+    token = snapshot.token(token_id)
     if not token:
         await update.message.reply_text(f"Жетон с номером {token_id} не найден в базе данных. Пожалуйста, выбери существующий жетон.")
         return CONFIRM_KILL
 
-    # Проверка, является ли жетон демоном
-    if token['character'] == 'demon':
+    # Убийство демона заканчивает игру победой синих
+    snapshot.kill(token_id)
+    if snapshot.winner == BLUE:
         # Сообщение игроку о том, что демона убили
-        game_set = get_latest_game_set()
-        player_id = game_set.get('player_id')
-        
-        count_red_neighbors_of_blue_tokens()
-        await show_game_set(context, player_id, moderator=True)
+        player_id = snapshot.player_id
+
+        snapshot.recount_red_neighbors()
+        await snapshot.commit()
+        await show_game_set(context, player_id, moderator=True, game_id=game_id, snapshot=snapshot)
         await context.bot.send_message(
             chat_id=player_id,
             text="🏆 Модератор зачем-то убил демона, победа синего города!"
@@ -291,21 +306,20 @@ async def confirm_kill(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         )
         logger.info(f"Модератор убил демона (жетон {token_id}). Победа синего города.")
         
-        reset_user_game_state(player_id)
+        await reset_user_game_state(player_id)
         moderator_id = update.effective_user.id
-        reset_user_game_state(moderator_id)
+        await reset_user_game_state(moderator_id)
 
         return ConversationHandler.END
 
-    # Обновляем статус жетона на "убит"
-    update_token_kill(token_id)
+    # Смерть жетона и новые числа его соседей записываются одной транзакцией
+    await snapshot.commit()
     logger.info(f"Жетон {token_id} выбран для убийства и помечен как убит.")
     await update.message.reply_text(f"Жетон {token_id} выбран для убийства и его статус обновлен.")
-    count_red_neighbors_of_blue_tokens()
-    await show_game_set(context, update.effective_user.id, moderator=True)
+    await show_game_set(context, update.effective_user.id, moderator=True, game_id=game_id, snapshot=snapshot)
 
     # Проверяем, не закончилась ли игра победой красных
-    is_red_won = await red_won(context)
+    is_red_won = await red_won(context, snapshot)
     
     if is_red_won:
         return ConversationHandler.END
@@ -313,37 +327,36 @@ async def confirm_kill(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     await make_drunk(update, context)
     return MAKE_DRUNK
 
-async def red_won(context: ContextTypes.DEFAULT_TYPE) -> bool:
+async def red_won(context: ContextTypes.DEFAULT_TYPE, snapshot) -> bool:
     """
     Проверяет, остались ли в игре два или меньше жетонов, и возвращает True, если победа красных.
+    Итог берётся из GameState в snapshot (GameSnapshot) текущего обновления.
     """
-    alive_tokens = get_alive_tokens()  # Получаем список живых жетонов
-
-    if len(alive_tokens) <= 2:
-        # Получаем информацию о текущем игроке и модераторе
-        game_set = get_latest_game_set()
-        player_id = game_set.get('player_id')
-
-        moderators = get_moderators()
-        if moderators:
-            moderator = moderators[0]
-            moderator_id = moderator['id']
-            count_red_neighbors_of_blue_tokens()
-            await show_game_set(context, moderator_id, moderator=True)
-            await context.bot.send_message(
-                chat_id=moderator_id,
-                text="🔥 В игре осталось всего 2 жетона, это победа красных!\n\n/start чтобы начать заново",
+    game_id = snapshot.game_id
+
+    if snapshot.winner == RED:
+        # Игрок и модератор этой игры
+        player_id = snapshot.player_id
+        moderator_id = snapshot.moderator_id
+
+        async def announce(chat_id, text, **kwargs):
+            await show_game_set(context, chat_id, moderator=True, game_id=game_id, snapshot=snapshot)
+            return await broadcaster.send(context.bot.send_message, chat_id, text=text, **kwargs)
+
+        # Модератор и игрок получают итог игры одновременно
+        snapshot.recount_red_neighbors()
+        await snapshot.commit()
+        await asyncio.gather(
+            announce(
+                moderator_id,
+                "🔥 В игре осталось всего 2 жетона, это победа красных!\n\n/start чтобы начать заново",
                 parse_mode='HTML'
-            )
-            count_red_neighbors_of_blue_tokens()
-            await show_game_set(context, player_id, moderator=True)
-            await context.bot.send_message(
-                chat_id=player_id,
-                text="😞 Ты так и не убил демона, это победа красного города 🫠"
-            )
-
-            logger.info("Объявлена победа красного города, осталось 2 или меньше жетонов.")
-        
+            ),
+            announce(player_id, "😞 Ты так и не убил демона, это победа красного города 🫠")
+        )
+
+        logger.info(f"Объявлена победа красного города в игре {game_id}, осталось 2 или меньше жетонов.")
+
         return True
 
     return False
@@ -3,19 +3,18 @@
 import random
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
-from database import (
+from async_database import (
     add_game_set,
-    clear_tokens,
     clear_game_set,
     add_tokens,
-    update_token_alignment,
-    update_token_character,
-    get_latest_game_set,
+    update_tokens_bulk,
+    get_active_game_set,
     get_user_by_id,
     get_user_by_username,
     update_token_red_neighbors,
     update_token_drunk,
-    make_all_tokens_sober
+    make_all_tokens_sober,
+    get_board_history
 )
 import logging
 from constants import (
@@ -29,11 +28,26 @@ from constants import (
 )
 from red_neighbors_handlers import count_red_neighbors_of_blue_tokens
 from render_game_set import show_game_set
-from player_manager import invite_player
+from balance_table import balance_table
+from player_manager import invite_player, get_caller_game_set
+from logging_config import bind_log_context
+from game_snapshot import get_caller_snapshot
+from seating_solver import solve_seating, solve_board, seating_space
+from board_codec import visible_board
+from game_engine import MAX_RED_NEIGHBORS
 from red_neighbors_handlers import make_drunk, get_drunk_token_number, set_drunk_red_neighbors
 
 logger = logging.getLogger(__name__)
 
+def red_seating(red_tokens, demon):
+    """
+    Строит изменения жетонов для рассадки красных: все выбранные жетоны становятся
+    красными миньонами, а один из них - демоном.
+    """
+    seating = {token_number: {'alignment': 'red', 'character': 'minion'} for token_number in red_tokens}
+    seating[demon]['character'] = 'demon'
+    return seating
+
 async def set_up_game(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
     Начинает настройку игры после ввода имени пользователя.
@@ -78,7 +92,7 @@ async def get_red_count(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
 
     tokens_count = context.user_data['game_set']['tokens_count']
     player_username = context.user_data['game_set'].get('player_username', 'unknown')
-    player = get_user_by_username(player_username)
+    player = await get_user_by_username(player_username)
     player_id = player['id']
 
     moderator = update.message.from_user
@@ -91,16 +105,17 @@ async def get_red_count(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         return GET_RED_COUNT
 
     # Сохраняем настройки игры в базе данных
-    add_game_set(tokens_count, red_count, player_username, player_id, moderator_username, moderator_id)
-    await update.message.reply_text("Настройки игры успешно сохранены!")
-    logger.info(f"Игра создана: tokens_count={tokens_count}, red_count={red_count}, player_username={player_username}")
-
-    # Очищаем таблицу tokens перед добавлением новых жетонов
-    clear_tokens()
+    game_id = await add_game_set(tokens_count, red_count, player_username, player_id, moderator_username, moderator_id)
+    bind_log_context(game_id=game_id)
+    balance = balance_table.describe(tokens_count, red_count)
+    await update.message.reply_text(
+        "Настройки игры успешно сохранены!" + (f"\n\n{balance}" if balance else "")
+    )
+    logger.info(f"Игра {game_id} создана: tokens_count={tokens_count}, red_count={red_count}, player_username={player_username}")
 
-    # Создаём список жетонов: все синие по умолчанию
+    # Создаём список жетонов новой игры: все синие по умолчанию
     tokens_list = [('blue', 'townfolk', 0) for _ in range(tokens_count)]
-    add_tokens(tokens_list)
+    await add_tokens(game_id, tokens_list)
     logger.info(f"Создано {tokens_count} жетонов в таблице tokens.")
 
     # Сохраняем red_count в context.user_data для дальнейшего использования
@@ -121,11 +136,16 @@ async def random_red_set(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     """
     logger.debug("Функция random_red_set вызвана")
 
+    game_set = await get_caller_game_set(update)
+    if not game_set:
+        return ConversationHandler.END
+    game_id = game_set['id']
+
     tokens_count = context.user_data['game_set']['tokens_count']
     red_count = context.user_data['game_set']['red_count']
 
     player_username = context.user_data['game_set']['player_username']
-    player = get_user_by_username(player_username)
+    player = await get_user_by_username(player_username)
     player_id = player['id']
     await context.bot.send_message(
         chat_id=player_id,
@@ -135,18 +155,13 @@ async def random_red_set(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     # Генерируем случайные индексы для красных жетонов
     red_indices = random.sample(range(1, tokens_count + 1), red_count)
 
-    # Обновляем базу данных с красными жетонами и назначаем демона
-    for i, token_number in enumerate(red_indices):
-        update_token_alignment(token_number, 'red')
-        if i == 0:
-            update_token_character(token_number, 'demon')
-            logger.info(f"Жетон номер {token_number} помечен как демон.")
-        else:
-            update_token_character(token_number, 'minion')
-            logger.info(f"Жетон номер {token_number} помечен как красный.")
+    # Обновляем базу данных с красными жетонами и назначаем демона одной транзакцией
+    seating = red_seating(red_indices, demon=red_indices[0])
+    applied = await update_tokens_bulk(game_id, seating)
+    logger.info(f"Красные жетоны {red_indices} рассажены, демон - жетон номер {red_indices[0]}. Изменения: {applied}")
 
-    count_red_neighbors_of_blue_tokens()
-    await show_game_set(context, update.effective_user.id, moderator=True)
+    await count_red_neighbors_of_blue_tokens(game_id)
+    await show_game_set(context, update.effective_user.id, moderator=True, game_id=game_id)
 
     # Переходим к следующему этапу — запросу количества соседей для красных жетонов
     context.user_data['red_tokens'] = red_indices
@@ -163,9 +178,14 @@ async def manual_entry_red_set(update: Update, context: ContextTypes.DEFAULT_TYP
     Начинает процесс ручного выбора красных жетонов.
     """
     logger.debug("Функция manual_entry_red_set вызвана")
-    
+
+    game_set = await get_caller_game_set(update)
+    if not game_set:
+        return ConversationHandler.END
+    game_id = game_set['id']
+
     player_username = context.user_data['game_set']['player_username']
-    player = get_user_by_username(player_username)
+    player = await get_user_by_username(player_username)
     player_id = player['id']
 
     # Отправляем сообщение выбранному игроку о выборе случайной рассадки
@@ -178,8 +198,8 @@ async def manual_entry_red_set(update: Update, context: ContextTypes.DEFAULT_TYP
     context.user_data['selected_red_tokens'] = []
     context.user_data['current_red_token_index'] = 1  # Индекс текущего запрашиваемого красного жетона
 
-    count_red_neighbors_of_blue_tokens()
-    await show_game_set(context, update.effective_user.id, moderator=True)
+    await count_red_neighbors_of_blue_tokens(game_id)
+    await show_game_set(context, update.effective_user.id, moderator=True, game_id=game_id)
     await update.message.reply_text(f"Какие номера жетонов будут красными?")
     await update.message.reply_text(f"Выберите первый из {red_count} красных жетонов:")
     return GET_RED_TOKEN_NUMBER
@@ -212,10 +232,9 @@ async def get_red_token_number(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.message.reply_text(f"Жетон номер {token_number} уже выбран. Пожалуйста, выберите другой номер.")
         return GET_RED_TOKEN_NUMBER
 
-    update_token_alignment(token_number, 'red')
-    update_token_character(token_number, 'minion')
+    # В базу рассадка записывается целиком после выбора демона
     selected_red_tokens.append(token_number)
-    logger.info(f"Жетон номер {token_number} помечен как красный.")
+    logger.info(f"Жетон номер {token_number} выбран красным.")
 
     await update.message.reply_text(f"Жетон номер {token_number} стал красным игроком.")
 
@@ -249,17 +268,21 @@ async def get_demon_token_number(update: Update, context: ContextTypes.DEFAULT_T
         await update.message.reply_text("Пожалуйста, введите номер жетона из выбранных красных жетонов.")
         return GET_DEMON_TOKEN_NUMBER
 
-    # Обновляем жетон в базе данных, помечая его как демона
-    from database import update_token_character
-    update_token_character(token_number, 'demon')
-    logger.info(f"Жетон номер {token_number} помечен как демон.")
+    game_set = await get_caller_game_set(update)
+    if not game_set:
+        return ConversationHandler.END
+    game_id = game_set['id']
+
+    # Записываем всю рассадку красных жетонов и демона одной транзакцией
+    applied = await update_tokens_bulk(game_id, red_seating(selected_red_tokens, demon=token_number))
+    logger.info(f"Жетон номер {token_number} помечен как демон. Изменения рассадки: {applied}")
     await update.message.reply_text(f"Жетон номер {token_number} теперь является демоном.")
 
     # Вызываем функцию для подсчёта красных соседей у синих жетонов
     logger.info("Подсчёт красных соседей для синих жетонов завершён.")
     player_id = update.effective_user.id
-    count_red_neighbors_of_blue_tokens()
-    await show_game_set(context, player_id, moderator=True)
+    await count_red_neighbors_of_blue_tokens(game_id)
+    await show_game_set(context, player_id, moderator=True, game_id=game_id)
 
     # Инициализируем данные для ввода red_neighbors для красных жетонов
     context.user_data['red_tokens'] = selected_red_tokens
@@ -285,9 +308,16 @@ async def get_red_token_red_neighbors(update: Update, context: ContextTypes.DEFA
         return GET_RED_TOKEN_RED_NEIGHBORS
 
     red_neighbors = int(red_neighbors_text)
+    if red_neighbors > MAX_RED_NEIGHBORS:
+        await update.message.reply_text(f"У жетона может быть от 0 до {MAX_RED_NEIGHBORS} красных соседей.")
+        return GET_RED_TOKEN_RED_NEIGHBORS
+
+    game_set = await get_caller_game_set(update)
+    if not game_set:
+        return ConversationHandler.END
 
     # Обновляем поле red_neighbors в базе данных для текущего красного жетона
-    update_token_red_neighbors(token_number, red_neighbors)
+    await update_token_red_neighbors(game_set['id'], token_number, red_neighbors)
     logger.info(f"Жетон {token_number}: количество соседей обновлено до {red_neighbors}")
 
     # Проверяем, есть ли ещё красные жетоны для обработки
@@ -314,7 +344,7 @@ async def show_setup_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user_id = user.id
     username = user.username or user.first_name or "Unknown"
 
-    game_set = get_latest_game_set()
+    game_set = await get_active_game_set(user_id)
 
     if not game_set:
         await update.message.reply_text("Игра не найдена или еще не начата.")
@@ -322,7 +352,7 @@ async def show_setup_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
 
     player_id = game_set.get('player_id')
-    user_data = get_user_by_id(user_id)
+    user_data = await get_user_by_id(user_id)
 
     if not user_data:
         await update.message.reply_text("Вы не зарегистрированы в системе.")
@@ -331,14 +361,69 @@ async def show_setup_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     is_moderator = user_data.get('moderator', False)
 
-    count_red_neighbors_of_blue_tokens()
+    game_id = game_set['id']
+    await count_red_neighbors_of_blue_tokens(game_id)
     if is_moderator:
-        await show_game_set(update, context, moderator=True)
+        await show_game_set(context, user_id, moderator=True, game_id=game_id)
         logger.info(f"Модератор {username} ({user_id}) вызвал /showsetup.")
     else:
         if user_id == player_id:
-            await show_game_set(update, context, moderator=False)
+            await show_game_set(context, user_id, moderator=False, game_id=game_id)
             logger.info(f"Игрок {username} ({user_id}) вызвал /showsetup.")
         else:
             await update.message.reply_text("У вас нет прав использовать эту команду.")
             logger.warning(f"Пользователь {username} ({user_id}) попытался вызвать /showsetup без прав.")
+
+
+def _format_probabilities(probabilities, limit=8):
+    ranked = sorted(
+        ((probability, token_id) for token_id, probability in probabilities.items() if probability > 0),
+        key=lambda item: (-item[0], item[1])
+    )
+    return ', '.join(f"{token_id} - {probability:.0%}" for probability, token_id in ranked[:limit])
+
+
+async def check_setup(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Обрабатывает команду /check_setup: показывает модератору, сколько рассадок красных
+    согласуется с картой, которую видит игрок, и с картами прошлых дней,
+    и вероятности красного и демона по жетонам.
+    Состояние разговора не меняется.
+    """
+    snapshot = await get_caller_snapshot(update)
+    if not snapshot:
+        return None
+    if update.effective_user.id != snapshot.moderator_id:
+        await update.message.reply_text("Проверка рассадки доступна только модератору игры.")
+        return None
+
+    # Игрок видит числа после пересчёта, поэтому пересчитываем их в памяти перед проверкой
+    snapshot.recount_red_neighbors()
+    tokens_count = snapshot.game_set['tokens_count']
+    red_count = snapshot.game_set['red_count']
+    history = tuple(await get_board_history(snapshot.game_id))
+    try:
+        # Перебор зависит только от того, что видит игрок: одинаковые карты берутся из кэша
+        result = solve_board(visible_board(snapshot.token_list(), moderator=False), red_count, history=history)
+    except ValueError:
+        result = solve_seating(snapshot.token_list(), red_count, history=history)
+    seatings = result['seatings']
+
+    if not seatings:
+        await update.message.reply_text(
+            "Ни одна рассадка не согласуется с картой игрока. Проверь числа на красных и пьяном жетонах."
+        )
+        return None
+
+    lines = [f"Рассадок, которые согласуются с картой игрока: {seatings} из {seating_space(tokens_count, red_count)}."]
+    if history:
+        lines.append(f"Учтены карты, которые игрок видел раньше: {len(history)}.")
+    else:
+        lines.append("Карт прошлых дней нет: проверена только текущая карта.")
+    if seatings == 1:
+        lines.append("Карта однозначно выдаёт рассадку красных.")
+    lines.append(f"Вероятность красного: {_format_probabilities(result['red'])}")
+    lines.append(f"Вероятность демона: {_format_probabilities(result['demon'])}")
+    await update.message.reply_text("\n".join(lines))
+    logger.info(f"Проверка рассадки игры {snapshot.game_id}: {seatings} подходящих рассадок.")
+    return None
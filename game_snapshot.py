@@ -0,0 +1,176 @@
+# game_snapshot.py
+
+import logging
+from telegram import Update
+from async_database import get_game_state, update_tokens_bulk
+from game_engine import GameState, EXECUTED, KILLED, SHOWN
+from board_codec import encode_board
+from logging_config import bind_log_context
+
+logger = logging.getLogger(__name__)
+
+
+class GameSnapshot:
+    """
+    Состояние одной игры на время обработки обновления: настройки и все жетоны,
+    прочитанные одним запросом. Ходы выполняет GameState из game_engine, а его события
+    переносятся в жетоны; commit() записывает все накопленные изменения одной транзакцией.
+    """
+
+    def __init__(self, game_set, tokens):
+        self.game_set = game_set
+        self.tokens = {token['id']: dict(token) for token in tokens}
+        self._changes = {}
+        self._state = None
+
+    @property
+    def state(self):
+        """
+        GameState этой игры, строится по жетонам при первом обращении.
+        """
+        if self._state is None:
+            self._state = GameState.from_tokens(self.token_list())
+        return self._state
+
+    @property
+    def winner(self):
+        """
+        BLUE или RED, если игра закончилась, иначе None.
+        """
+        return self.state.winner
+
+    @property
+    def game_id(self):
+        return self.game_set['id']
+
+    @property
+    def moderator_id(self):
+        return self.game_set['moderator_id']
+
+    @property
+    def player_id(self):
+        return self.game_set['player_id']
+
+    def participants(self):
+        """
+        Возвращает id модератора и игрока этой игры.
+        """
+        return [self.moderator_id, self.player_id]
+
+    def token(self, token_id):
+        """
+        Возвращает жетон по номеру или None.
+        """
+        return self.tokens.get(token_id)
+
+    def token_list(self):
+        """
+        Возвращает жетоны, упорядоченные по номеру.
+        """
+        return [self.tokens[token_id] for token_id in sorted(self.tokens)]
+
+    def red_tokens(self):
+        return [token_id for token_id in sorted(self.tokens) if self.tokens[token_id]['alignment'] == 'red']
+
+    def alive_tokens(self):
+        return [token_id for token_id in sorted(self.tokens) if self.tokens[token_id]['alive']]
+
+    def _set(self, token_id, **fields):
+        token = self.tokens.get(token_id)
+        if token is None:
+            logger.warning(f"Жетон с id={token_id} не найден в игре {self.game_id}.")
+            return
+        for field, value in fields.items():
+            if token[field] != value:
+                token[field] = value
+                self._changes.setdefault(token_id, {})[field] = value
+
+    def apply(self, events):
+        """
+        Переносит события GameState в жетоны. Возвращает те же события.
+        """
+        for kind, position, value in events:
+            if kind == EXECUTED or kind == KILLED:
+                self._set(position + 1, alive=0)
+            elif kind == SHOWN:
+                self._set(position + 1, red_neighbors=value)
+        return events
+
+    def execute(self, token_id):
+        return self.apply(self.state.execute(token_id - 1))
+
+    def kill(self, token_id):
+        return self.apply(self.state.kill(token_id - 1))
+
+    def set_bluff(self, token_id, red_neighbors):
+        return self.apply(self.state.set_bluff(token_id - 1, red_neighbors))
+
+    def set_drunk(self, token_id, red_neighbors):
+        events = self.apply(self.state.set_drunk(token_id - 1, red_neighbors))
+        self._set(token_id, drunk=1, red_neighbors=red_neighbors)
+        return events
+
+    def sober_all(self):
+        events = self.apply(self.state.sober_all())
+        for token_id in self.tokens:
+            self._set(token_id, drunk=0)
+        return events
+
+    def recount_red_neighbors(self):
+        """
+        Записывает в жетоны числа, которые показывает GameState, для синих живых трезвых жетонов.
+        Нужно, если жетоны в базе менялись в обход GameState (например, при настройке игры).
+        """
+        state = self.state
+        for position in state.alive_positions():
+            if not state.red[position] and not state.drunk[position]:
+                self._set(position + 1, red_neighbors=state.red_neighbors[position])
+
+    def board(self):
+        """
+        Доска в записи board_codec (BOARD_BYTES байт) - снимок игры для истории и логов.
+        """
+        return encode_board(self.token_list())
+
+    @property
+    def dirty(self):
+        return bool(self._changes)
+
+    async def commit(self):
+        """
+        Записывает все изменения жетонов одной транзакцией.
+        Возвращает применённую разницу, как update_tokens_bulk.
+        """
+        if not self._changes:
+            return {}
+        changes, self._changes = self._changes, {}
+        applied = await update_tokens_bulk(self.game_id, changes)
+        if logger.isEnabledFor(logging.DEBUG):
+            try:
+                logger.debug("Игра %s: доска %s", self.game_id, self.board().hex())
+            except ValueError as e:
+                logger.debug(f"Игра {self.game_id}: доска не кодируется: {e}")
+        return applied
+
+
+async def load_game_snapshot(user_id):
+    """
+    Загружает активную игру пользователя. Возвращает GameSnapshot или None, если игры нет.
+    """
+    game_set, tokens = await get_game_state(user_id)
+    if not game_set:
+        return None
+    bind_log_context(game_id=game_set['id'])
+    return GameSnapshot(game_set, tokens)
+
+
+async def get_caller_snapshot(update: Update):
+    """
+    Загружает игру, в которой участвует отправитель обновления.
+    Если игры нет, сообщает об этом пользователю и возвращает None.
+    """
+    snapshot = await load_game_snapshot(update.effective_user.id)
+    if snapshot is None:
+        await update.message.reply_text("Игра не найдена. Нажми /start, чтобы начать заново.")
+        logger.warning(f"Игра пользователя {update.effective_user.id} не найдена.")
+    return snapshot
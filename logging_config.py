@@ -0,0 +1,208 @@
+# logging_config.py
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from telegram import Update
+from telegram.ext import TypeHandler
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# 'json' - одна JSON-запись на строку, 'text' - прежний текстовый формат
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+# Выборка сообщений ниже WARNING по логгерам: 'database=10,game_process_handlers=5'
+# означает, что пишется каждое 10-е (5-е) сообщение этого логгера и его потомков
+LOG_SAMPLING = os.getenv('LOG_SAMPLING', '')
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Поля, которые добавляются к каждой записи в пределах обработки одного обновления
+_log_context = contextvars.ContextVar('log_context', default={})
+
+_listener = None
+
+
+def bind_log_context(**fields):
+    """
+    Добавляет поля (game_id, user_id) ко всем записям до конца обработки текущего обновления.
+    Поток базы данных получает их вместе с контекстом из run_in_db_thread.
+    """
+    _log_context.set({**_log_context.get(), **fields})
+
+
+def clear_log_context():
+    _log_context.set({})
+
+
+class ContextFilter(logging.Filter):
+    """
+    Записывает в запись поля контекста обновления. Работает в потоке, который пишет лог.
+    """
+
+    def filter(self, record):
+        context = _log_context.get()
+        record.game_id = context.get('game_id')
+        record.user_id = context.get('user_id')
+        return True
+
+
+def parse_sampling(spec):
+    """
+    Разбирает LOG_SAMPLING в словарь {имя логгера: каждое N-е сообщение}.
+    """
+    rates = {}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, _, every = item.partition('=')
+        rates[name.strip()] = max(1, int(every))
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает только каждое N-е сообщение ниже WARNING у логгеров из настроек.
+    Предупреждения и ошибки пишутся всегда.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._counters = {}
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def _rate(self, logger_name):
+        rate = self._resolved.get(logger_name)
+        if rate is None:
+            rate = 1
+            name = logger_name
+            while name:
+                if name in self.rates:
+                    rate = self.rates[name]
+                    break
+                name = name.rpartition('.')[0]
+            self._resolved[logger_name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        if rate == 1:
+            return True
+        with self._lock:
+            count = self._counters.get(record.name, 0)
+            self._counters[record.name] = count + 1
+        return count % rate == 0
+
+
+_IMMUTABLE_ARGS = (str, int, float, bool, type(None), tuple, frozenset)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, который не форматирует сообщение в вызывающем потоке.
+    Если аргументы неизменяемые, подстановка откладывается до потока QueueListener;
+    изменяемые аргументы подставляются сразу, чтобы запись не поменялась по дороге.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        if record.args and not all(isinstance(arg, _IMMUTABLE_ARGS) for arg in record.args):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # Трассировку форматируем сразу: объекты исключения не должны жить в очереди
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Одна JSON-запись на строку с полями game_id и user_id, если они известны.
+    """
+
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        game_id = getattr(record, 'game_id', None)
+        if game_id is not None:
+            entry['game_id'] = game_id
+        user_id = getattr(record, 'user_id', None)
+        if user_id is not None:
+            entry['user_id'] = user_id
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging(level=LOG_LEVEL, log_format=LOG_FORMAT, sampling=LOG_SAMPLING):
+    """
+    Настраивает логирование через очередь: вызывающий код только кладёт запись в очередь,
+    форматирование и запись в stderr выполняет поток QueueListener.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if log_format == 'json':
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(parse_sampling(sampling)))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(level)
+    # httpx пишет INFO на каждый запрос к Bot API
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """
+    Дописывает оставшиеся в очереди записи и останавливает поток логирования.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+async def _bind_update_context(update, context):
+    clear_log_context()
+    if update.effective_user:
+        bind_log_context(user_id=update.effective_user.id)
+
+
+async def _clear_update_context(update, context):
+    clear_log_context()
+
+
+def install_update_context(application):
+    """
+    Привязывает user_id отправителя к логам обработки каждого обновления
+    и сбрасывает контекст после того, как обновление обработано.
+    """
+    application.add_handler(TypeHandler(Update, _bind_update_context), group=-1001)
+    application.add_handler(TypeHandler(Update, _clear_update_context), group=1001)
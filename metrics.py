@@ -0,0 +1,314 @@
+# metrics.py
+
+import asyncio
+import bisect
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from aiohttp import web
+from telegram import Update
+from telegram.ext import ConversationHandler, TypeHandler
+from telegram.request import HTTPXRequest
+
+import constants
+
+logger = logging.getLogger(__name__)
+
+# Метрики можно выключить целиком: обработчики и соединения с базой тогда не оборачиваются
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') not in ('0', 'false', 'no')
+# По умолчанию /metrics доступен только локально
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9108))
+# Как часто проверять отставание цикла событий, в секундах
+METRICS_LOOP_LAG_INTERVAL = float(os.getenv('METRICS_LOOP_LAG_INTERVAL', 0.5))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = (4096, 16384, 32768, 65536, 131072, 262144, 524288, 1048576)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, labels, extra=None):
+    pairs = list(zip(labelnames, labels))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    """
+    Монотонный счётчик с метками. Значения меток передаются позиционно в порядке labelnames.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {value}'
+
+
+class Gauge(Counter):
+    """
+    Текущее значение с метками.
+    """
+    kind = 'gauge'
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    """
+    Гистограмма с фиксированными границами корзин, как в Prometheus.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, labels, ("le", bound))} {cumulative}'
+            yield f'{self.name}_bucket{_format_labels(self.labelnames, labels, ("le", "+Inf"))} {count}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, labels)} {total}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, labels)} {count}'
+
+
+def render_metrics():
+    """
+    Возвращает все метрики в текстовом формате Prometheus.
+    """
+    lines = []
+    for metric in _registry:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+HANDLER_SECONDS = Histogram(
+    'empaths_handler_seconds', "Время работы обработчика разговора",
+    ('conversation', 'state', 'handler')
+)
+UPDATE_SECONDS = Histogram('empaths_update_seconds', "Время обработки одного обновления")
+SQL_STATEMENTS = Counter('empaths_sql_statements_total', "Выполненные выражения SQLite", ('kind',))
+SQL_COMMITS = Counter('empaths_sql_commits_total', "Фиксации транзакций SQLite")
+SQL_STATEMENTS_PER_UPDATE = Histogram(
+    'empaths_sql_statements_per_update', "Выражения SQLite на одно обновление", buckets=COUNT_BUCKETS
+)
+SQL_COMMITS_PER_UPDATE = Histogram(
+    'empaths_sql_commits_per_update', "Фиксации транзакций SQLite на одно обновление", buckets=COUNT_BUCKETS
+)
+RENDER_SECONDS = Histogram('empaths_render_seconds', "Время отрисовки карты жетонов в PNG в воркере пула")
+RENDER_QUEUE_SECONDS = Histogram('empaths_render_queue_seconds', "Ожидание отрисовки в очереди пула")
+RENDER_PNG_BYTES = Histogram('empaths_render_png_bytes', "Размер PNG карты жетонов", buckets=BYTES_BUCKETS)
+BOT_API_SECONDS = Histogram('empaths_bot_api_seconds', "Время запроса к Bot API", ('method',))
+BOT_API_ERRORS = Counter('empaths_bot_api_errors_total', "Запросы к Bot API, завершившиеся исключением", ('method',))
+LOOP_LAG_SECONDS = Histogram('empaths_event_loop_lag_seconds', "Отставание цикла событий")
+
+STATE_NAMES = {
+    value: name for name, value in vars(constants).items()
+    if name.isupper() and isinstance(value, int)
+}
+
+# Счётчики SQL текущего обновления: [выражения, фиксации]. Поток базы данных видит их
+# через контекст, скопированный в run_in_db_thread.
+_update_sql = contextvars.ContextVar('metrics_update_sql', default=None)
+_update_started = contextvars.ContextVar('metrics_update_started', default=None)
+
+
+def trace_sql(statement):
+    """
+    Колбэк для sqlite3.Connection.set_trace_callback: считает выражения и фиксации.
+    """
+    words = statement.split(None, 1)
+    kind = words[0].upper() if words else ''
+    SQL_STATEMENTS.inc(kind)
+    is_commit = kind == 'COMMIT'
+    if is_commit:
+        SQL_COMMITS.inc()
+    counts = _update_sql.get()
+    if counts is not None:
+        counts[0] += 1
+        if is_commit:
+            counts[1] += 1
+
+
+def _timed_callback(callback, conversation, state):
+    @functools.wraps(callback)
+    async def timed(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, conversation, state, callback.__name__)
+    timed._metrics_instrumented = True
+    return timed
+
+
+def instrument_conversation(conversation):
+    """
+    Оборачивает обработчики ConversationHandler замером времени с меткой состояния из constants.py.
+    """
+    groups = [('entry', conversation.entry_points), ('fallback', conversation.fallbacks)]
+    groups.extend((STATE_NAMES.get(state, str(state)), handlers) for state, handlers in conversation.states.items())
+    for state, handlers in groups:
+        for handler in handlers:
+            if not getattr(handler.callback, '_metrics_instrumented', False):
+                handler.callback = _timed_callback(handler.callback, conversation.name, state)
+
+
+async def _begin_update(update, context):
+    _update_started.set(time.perf_counter())
+    _update_sql.set([0, 0])
+
+
+async def _end_update(update, context):
+    started = _update_started.get()
+    counts = _update_sql.get()
+    if started is None or counts is None:
+        return
+    UPDATE_SECONDS.observe(time.perf_counter() - started)
+    SQL_STATEMENTS_PER_UPDATE.observe(counts[0])
+    SQL_COMMITS_PER_UPDATE.observe(counts[1])
+    _update_started.set(None)
+    _update_sql.set(None)
+
+
+def instrument_application(application):
+    """
+    Подключает метрики к приложению: время обработчиков разговоров и счётчики на одно обновление.
+    Вызывается после добавления обработчиков.
+    """
+    if not METRICS_ENABLED:
+        return
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            if isinstance(handler, ConversationHandler):
+                instrument_conversation(handler)
+    # Крайние группы: начало замера до всех обработчиков, конец - после
+    application.add_handler(TypeHandler(Update, _begin_update), group=-1000)
+    application.add_handler(TypeHandler(Update, _end_update), group=1000)
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """
+    HTTPXRequest, который замеряет время каждого запроса к Bot API по имени метода.
+    """
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        try:
+            return await super().do_request(
+                url, method, request_data=request_data, read_timeout=read_timeout,
+                write_timeout=write_timeout, connect_timeout=connect_timeout, pool_timeout=pool_timeout
+            )
+        except Exception:
+            BOT_API_ERRORS.inc(api_method)
+            raise
+        finally:
+            BOT_API_SECONDS.observe(time.perf_counter() - started, api_method)
+
+
+async def _monitor_loop_lag(interval):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - expected))
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        body=render_metrics().encode(),
+        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+    )
+
+
+class MetricsServer:
+    """
+    Локальный HTTP-сервер с /metrics и фоновая задача замера отставания цикла событий.
+    """
+
+    def __init__(self, listen=METRICS_LISTEN, port=METRICS_PORT, loop_lag_interval=METRICS_LOOP_LAG_INTERVAL):
+        self.listen = listen
+        self.port = port
+        self.loop_lag_interval = loop_lag_interval
+        self._runner = None
+        self._lag_task = None
+
+    async def start(self):
+        if not METRICS_ENABLED or self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get('/metrics', handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.listen, self.port).start()
+        self._lag_task = asyncio.get_running_loop().create_task(_monitor_loop_lag(self.loop_lag_interval))
+        logger.info(f"Метрики доступны на http://{self.listen}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            try:
+                await self._lag_task
+            except asyncio.CancelledError:
+                pass
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics_server = MetricsServer()
@@ -0,0 +1,117 @@
+# migrations.py
+
+import logging
+from db_connection import transaction
+from db_queries import (
+    CREATE_USERS_TABLE,
+    CREATE_USERS_INDEXES,
+    CREATE_GAME_SET_TABLE,
+    CREATE_GAME_SET_INDEXES,
+    CREATE_TOKENS_TABLE,
+    CREATE_BOARD_PHOTOS_TABLE,
+    CREATE_PERSISTENCE_TABLE,
+    CREATE_BOARD_HISTORY_TABLE
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _create_base_tables(cursor):
+    """
+    Исходная схема: пользователи и настройки игры.
+    """
+    cursor.execute(CREATE_USERS_TABLE)
+    cursor.execute(CREATE_GAME_SET_TABLE)
+
+
+def _scope_tokens_by_game(cursor):
+    """
+    Жетоны принадлежат игре: таблица tokens с game_id и индексы для поиска активной игры.
+    Жетоны из старой глобальной таблицы tokens (без game_id) переходят к последней созданной игре.
+    """
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(tokens)").fetchall()]
+    if columns and 'game_id' not in columns:
+        cursor.execute("ALTER TABLE tokens RENAME TO tokens_legacy")
+        cursor.execute(CREATE_TOKENS_TABLE)
+        cursor.execute('''
+            INSERT INTO tokens (game_id, id, alignment, character, red_neighbors, alive, drunk)
+            SELECT (SELECT MAX(id) FROM game_set), id, alignment, character, red_neighbors, alive, drunk
+            FROM tokens_legacy
+            WHERE EXISTS (SELECT 1 FROM game_set)
+        ''')
+        cursor.execute("DROP TABLE tokens_legacy")
+        logger.info("Таблица tokens переведена на схему с game_id.")
+    else:
+        cursor.execute(CREATE_TOKENS_TABLE)
+    for statement in CREATE_GAME_SET_INDEXES:
+        cursor.execute(statement)
+
+
+def _create_board_photos(cursor):
+    cursor.execute(CREATE_BOARD_PHOTOS_TABLE)
+
+
+def _create_persistence(cursor):
+    cursor.execute(CREATE_PERSISTENCE_TABLE)
+
+
+def _index_users(cursor):
+    for statement in CREATE_USERS_INDEXES:
+        cursor.execute(statement)
+
+
+def _create_board_history(cursor):
+    cursor.execute(CREATE_BOARD_HISTORY_TABLE)
+
+
+# Миграции применяются по порядку, номер версии хранится в PRAGMA user_version.
+# Уже выпущенные миграции не меняются: любое изменение схемы - новая запись в конце списка.
+MIGRATIONS = (
+    (1, "Таблицы users и game_set", _create_base_tables),
+    (2, "Жетоны привязаны к игре", _scope_tokens_by_game),
+    (3, "Таблица board_photos", _create_board_photos),
+    (4, "Таблица persistence", _create_persistence),
+    (5, "Индексы users по username и модераторам", _index_users),
+    (6, "Таблица board_history", _create_board_history),
+)
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(cursor):
+    return cursor.execute('PRAGMA user_version').fetchone()[0]
+
+
+def run_migrations(db_path='empaths.db'):
+    """
+    Применяет к базе все миграции новее её текущей версии.
+    Каждая миграция выполняется в своей транзакции вместе с записью новой версии,
+    поэтому прерванная миграция не оставляет базу в промежуточном состоянии.
+    Возвращает версию схемы после миграции.
+    """
+    with transaction(db_path) as cursor:
+        version = get_schema_version(cursor)
+
+    if version > LATEST_VERSION:
+        raise RuntimeError(f"Версия схемы базы {version} новее, чем известна боту ({LATEST_VERSION}).")
+
+    for migration_version, description, migrate in MIGRATIONS:
+        if migration_version <= version:
+            continue
+        with transaction(db_path) as cursor:
+            # sqlite3 не открывает транзакцию перед DDL сам, поэтому открываем её явно
+            cursor.execute('BEGIN IMMEDIATE')
+            # Другой процесс мог применить миграцию, пока мы ждали блокировку
+            if get_schema_version(cursor) >= migration_version:
+                continue
+            migrate(cursor)
+            cursor.execute(f'PRAGMA user_version = {migration_version}')
+        version = migration_version
+        logger.info(f"Применена миграция {migration_version}: {description}")
+
+    return version
+
+
+if __name__ == '__main__':
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+    print(f"Версия схемы: {run_migrations()}")
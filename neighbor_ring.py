@@ -0,0 +1,97 @@
+# neighbor_ring.py
+
+
+class NeighborRing:
+    """
+    Круг жетонов для подсчёта красных соседей.
+    Живые жетоны связаны в двусвязное кольцо (left/right), цвета хранятся в массиве red.
+    Позиции нумеруются с 0, у мёртвых жетонов left и right равны -1.
+    red_neighbors хранит актуальное количество красных живых соседей каждого живого жетона.
+    """
+    __slots__ = ('size', 'red', 'alive', 'left', 'right', 'red_neighbors')
+
+    def __init__(self, red, alive=None):
+        size = len(red)
+        self.size = size
+        self.red = bytearray(1 if is_red else 0 for is_red in red)
+        self.alive = bytearray(1 for _ in range(size)) if alive is None else bytearray(1 if a else 0 for a in alive)
+        self.left = [-1] * size
+        self.right = [-1] * size
+        self.red_neighbors = [0] * size
+
+        alive_positions = [position for position in range(size) if self.alive[position]]
+        alive_count = len(alive_positions)
+        for index, position in enumerate(alive_positions):
+            self.left[position] = alive_positions[index - 1]
+            self.right[position] = alive_positions[(index + 1) % alive_count]
+        for position in alive_positions:
+            self.red_neighbors[position] = self._count(position)
+
+    def _count(self, position):
+        """
+        Считает красных соседей живого жетона по текущим ссылкам кольца.
+        Если живых жетонов два, один и тот же сосед учитывается с обеих сторон.
+        """
+        left = self.left[position]
+        if left == position:
+            return 0
+        return self.red[left] + self.red[self.right[position]]
+
+    def neighbors(self, position):
+        """
+        Возвращает пару (левый, правый) ближайших живых соседей или None, если соседей нет.
+        """
+        left = self.left[position]
+        if left == -1 or left == position:
+            return None
+        return left, self.right[position]
+
+    def remove(self, position):
+        """
+        Убирает жетон из кольца за O(1).
+        Возвращает позиции соседей, у которых изменилось количество красных соседей.
+        """
+        if not self.alive[position]:
+            return ()
+        left = self.left[position]
+        right = self.right[position]
+        self.alive[position] = 0
+        self.left[position] = self.right[position] = -1
+        self.red_neighbors[position] = 0
+        if left == position:
+            return ()
+
+        self.right[left] = right
+        self.left[right] = left
+        return self._refresh(left, right)
+
+    def set_red(self, position, red):
+        """
+        Меняет цвет жетона и обновляет счётчики его живых соседей.
+        Возвращает позиции соседей, у которых изменилось количество красных соседей.
+        """
+        value = 1 if red else 0
+        if self.red[position] == value:
+            return ()
+        self.red[position] = value
+        neighbors = self.neighbors(position) if self.alive[position] else None
+        if neighbors is None:
+            return ()
+        return self._refresh(*neighbors)
+
+    def _refresh(self, left, right):
+        """
+        Пересчитывает счётчики двух соседей (left может совпадать с right) и возвращает
+        те, что изменились, слева направо.
+        """
+        changed = ()
+        count = self._count(left)
+        if count != self.red_neighbors[left]:
+            self.red_neighbors[left] = count
+            changed = (left,)
+        if right != left:
+            count = self._count(right)
+            if count != self.red_neighbors[right]:
+                self.red_neighbors[right] = count
+                changed += (right,)
+        return changed
@@ -1,52 +1,78 @@
 # player_manager.py
 
 import logging
-from database import get_user_by_username, get_moderators, update_user_on_game
+from async_database import get_user_by_username, get_moderators, update_user_on_game, get_active_game_set
 
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from constants import CONFIRM_INVITE, START_GAME
 from render_game_set import show_game_set
+from broadcast import broadcaster
+from logging_config import bind_log_context
 
 logger = logging.getLogger(__name__)
 
+async def get_caller_game_set(update: Update):
+    """
+    Возвращает игру, в которой участвует отправитель обновления (как модератор или игрок).
+    Если игры нет, сообщает об этом пользователю и возвращает None.
+    """
+    game_set = await get_active_game_set(update.effective_user.id)
+    if not game_set:
+        await update.message.reply_text("Игра не найдена. Нажми /start, чтобы начать заново.")
+        logger.warning(f"Игра пользователя {update.effective_user.id} не найдена.")
+    else:
+        bind_log_context(game_id=game_set['id'])
+    return game_set
+
+def _notify_moderators(context: ContextTypes.DEFAULT_TYPE, moderators, message: str) -> None:
+    """
+    Запускает рассылку сообщения модераторам фоновой задачей приложения и сразу возвращается:
+    ожидание лимитов Telegram не задерживает ответ пользователю и обработку других обновлений.
+    """
+    usernames = {moderator['id']: moderator['username'] for moderator in moderators}
+    task = context.application.create_task(broadcaster.broadcast(context.bot, usernames, message))
+    task.add_done_callback(lambda done: _log_notice_results(done, usernames))
+
+def _log_notice_results(task, usernames) -> None:
+    """
+    Логирует модераторов, которым не удалось отправить уведомление.
+    """
+    if task.cancelled():
+        logger.warning("Рассылка уведомления модераторам отменена.")
+        return
+    if task.exception() is not None:
+        logger.error(f"Рассылка уведомления модераторам завершилась с ошибкой: {task.exception()}")
+        return
+    for moderator_id, result in task.result().items():
+        if not result['ok']:
+            logger.error(f"Не удалось отправить сообщение модератору {usernames[moderator_id]} ({moderator_id}): {result['error']}")
+
 async def player_registration_notice(context: ContextTypes.DEFAULT_TYPE, player_username: str, player_userid: int):
     """
     Отправляет уведомление модератору(ам) о том, что зарегистрировался новый игрок.
     """
-    moderators = get_moderators()
+    moderators = await get_moderators()
     if not moderators:
         logger.warning("Модераторы не найдены для уведомления о регистрации нового игрока.")
         return
 
     message = f"Зарегистрирован новый пользователь @{player_username}."
-
-    for moderator in moderators:
-        moderator_id = moderator['id']
-        try:
-            await context.bot.send_message(chat_id=moderator_id, text=message)
-            logger.info(f"Уведомлен модератор {moderator['username']} ({moderator_id}) о новом игроке @{player_username}.")
-        except Exception as e:
-            logger.error(f"Не удалось отправить сообщение модератору {moderator['username']} ({moderator_id}): {e}")
+    _notify_moderators(context, moderators, message)
+    logger.info(f"Уведомление модераторам о новом игроке @{player_username} поставлено в очередь.")
 
 async def player_start_game_notice(context: ContextTypes.DEFAULT_TYPE, player_username: str, player_userid: int):
     """
     Отправляет уведомление модератору(ам) о том, что пользователь нажал /start и ожидает начало игры.
     """
-    moderators = get_moderators()
+    moderators = await get_moderators()
     if not moderators:
         logger.warning("Модераторы не найдены для уведомления о начале игры пользователем.")
         return
 
     message = f"Пользователь @{player_username} нажал кнопку старта и ожидает начало игры."
-
-    for moderator in moderators:
-        moderator_id = moderator['id']
-        try:
-            await context.bot.send_message(chat_id=moderator_id, text=message)
-            logger.info(f"Уведомлен модератор {moderator['username']} ({moderator_id}) о начале игры пользователем @{player_username}.")
-        except Exception as e:
-            logger.error(f"Не удалось отправить сообщение модератору {moderator['username']} ({moderator_id}): {e}")
+    _notify_moderators(context, moderators, message)
+    logger.info(f"Уведомление модераторам о начале игры пользователем @{player_username} поставлено в очередь.")
 
 async def invite_player(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """
@@ -70,14 +96,17 @@ async def confirm_invite(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     """
     if update.message.text.strip() == "/pass_turn_to_player":
         player_username = context.user_data.get('player_username')
-        player = get_user_by_username(player_username)
+        player = await get_user_by_username(player_username)
         player_userid = player['id']
+        game_set = await get_caller_game_set(update)
+        if not game_set:
+            return ConversationHandler.END
 
         # Обновляем статус и отправляем раскладку жетонов игроку
-        update_user_on_game(update.effective_user.id, True)        # Обновляем статус модератора
-        update_user_on_game(player_userid, True)                   # Обновляем статус игрока
+        await update_user_on_game(update.effective_user.id, True)        # Обновляем статус модератора
+        await update_user_on_game(player_userid, True)                   # Обновляем статус игрока
 
-        await show_game_set(context, player_userid, moderator=False)
+        await show_game_set(context, player_userid, moderator=False, game_id=game_set['id'])
         await update.message.reply_text(f"Игрок @{player_username} получил раскладку. Ждем его ход.")
 
         await context.bot.send_message(
@@ -2,11 +2,14 @@
 
 import logging
 from telegram import Update
-from telegram.ext import ContextTypes
-from database import update_token_red_neighbors, update_token_drunk, get_all_tokens
+from telegram.ext import ContextTypes, ConversationHandler
+import database
+from async_database import update_token_red_neighbors, update_token_drunk, run_in_db_thread
 from render_game_set import show_game_set
-from player_manager import invite_player
+from player_manager import invite_player, get_caller_game_set
 from constants import GET_DRUNK_TOKEN_NUMBER, SET_DRUNK_RED_NEIGHBORS
+from game_engine import MAX_RED_NEIGHBORS
+from neighbor_ring import NeighborRing
 
 logger = logging.getLogger(__name__)
 
@@ -27,10 +30,13 @@ async def get_drunk_token_number(update: Update, context: ContextTypes.DEFAULT_T
         return GET_DRUNK_TOKEN_NUMBER
 
     token_number = int(token_number_text)
+    game_set = await get_caller_game_set(update)
+    if not game_set:
+        return ConversationHandler.END
     context.user_data['drunk_token_number'] = token_number
 
     # Устанавливаем поле drunk на True для выбранного жетона
-    update_token_drunk(token_number)
+    await update_token_drunk(game_set['id'], token_number)
     logger.info(f"Жетон {token_number} помечен как 'пьяный'.")
 
     await update.message.reply_text("Введите количество красных соседей для этого жетона:")
@@ -46,93 +52,91 @@ async def set_drunk_red_neighbors(update: Update, context: ContextTypes.DEFAULT_
         return SET_DRUNK_RED_NEIGHBORS
 
     red_neighbors = int(red_neighbors_text)
+    if red_neighbors > MAX_RED_NEIGHBORS:
+        await update.message.reply_text(f"У жетона может быть от 0 до {MAX_RED_NEIGHBORS} красных соседей.")
+        return SET_DRUNK_RED_NEIGHBORS
+
     token_number = context.user_data['drunk_token_number']
+    game_set = await get_caller_game_set(update)
+    if not game_set:
+        return ConversationHandler.END
+    game_id = game_set['id']
 
-    update_token_red_neighbors(token_number, red_neighbors)
+    await update_token_red_neighbors(game_id, token_number, red_neighbors)
     logger.info(f"Жетон {token_number}: количество красных соседей обновлено до {red_neighbors}")
 
     await update.message.reply_text(f"Жетон {token_number} теперь имеет {red_neighbors} красных соседей и помечен как 'пьяный'.")
 
     player_id = update.effective_user.id
-    count_red_neighbors_of_blue_tokens()
-    await show_game_set(context, player_id, moderator=True)
+    await count_red_neighbors_of_blue_tokens(game_id)
+    await show_game_set(context, player_id, moderator=True, game_id=game_id)
 
     return await invite_player(update, context)
 
 
-def count_red_neighbors_of_blue_tokens():
+async def count_red_neighbors_of_blue_tokens(game_id):
     """
-    Рассчитывает количество красных соседей для каждого синего живого жетона
-    и обновляет поле red_neighbors в базе данных.
+    Рассчитывает количество красных соседей для каждого синего живого жетона игры
+    и обновляет поле red_neighbors в базе данных одной транзакцией.
     Мёртвые жетоны и "пьяные" жетоны, для которых производится расчёт, пропускаются при обновлении.
+    Возвращает множество id жетонов, у которых значение изменилось.
     """
-    # Получаем все жетоны из базы данных
-    tokens = get_all_tokens()
-    
-    # Создаем словарь для удобного доступа к жетонам по их id
-    tokens_dict = {
-        token['id']: {
-            'alignment': token['alignment'],
-            'character': token['character'],
-            'red_neighbors': token['red_neighbors'],
-            'alive': token['alive'],
-            'drunk': token.get('drunk', False)
-        } for token in tokens
-    }
-    
-    tokens_count = len(tokens)
+    applied = await _recount_red_neighbors(game_id)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Пересчитаны красные соседи, изменены жетоны: %s", sorted(applied))
+    return set(applied)
+
+
+@run_in_db_thread
+def _recount_red_neighbors(game_id):
+    """
+    Читает жетоны и записывает изменившиеся значения red_neighbors.
+    Выполняется целиком в потоке базы данных, чтобы между чтением и записью
+    не вклинивались другие запросы.
+    """
+    tokens = database.get_all_tokens(game_id)
+    red_neighbors = compute_red_neighbors(tokens)
+    return database.update_tokens_bulk(
+        game_id,
+        {token_id: {'red_neighbors': count} for token_id, count in red_neighbors.items()}
+    )
 
-    # Обходим каждый жетон
-    for token_id in range(1, tokens_count + 1):
-        token = tokens_dict.get(token_id)
-        if not token:
-            logger.warning(f"Жетон с id={token_id} не найден.")
+
+def compute_red_neighbors(tokens):
+    """
+    Считает в памяти количество красных соседей для синих живых трезвых жетонов.
+    Возвращает словарь {id жетона: количество красных соседей}.
+    """
+    ring, tokens_by_position = build_neighbor_ring(tokens)
+    result = {}
+    for position, token in enumerate(tokens_by_position):
+        if token is None:
+            continue
+        # Для красных жетонов, мёртвых и "пьяных" синих жетонов red_neighbors не обновляем
+        if token['alignment'] != 'blue' or not token['alive'] or token.get('drunk', False):
             continue
+        result[token['id']] = ring.red_neighbors[position]
+    return result
 
-        if token['alignment'] == 'blue' and token['alive']:
-            # Если жетон "пьяный", оставляем информацию без изменений
-            if token['drunk']:
-                logger.info(f"Жетон {token_id} помечен как 'пьяный'. Информация не изменяется.")
-                continue
-
-            # Для синего живого жетона считаем количество красных соседей
-            red_neighbors = 0
-            
-            # Находим левого живого соседа
-            left_neighbor_id = token_id
-            for _ in range(tokens_count - 1):  # Максимум tokens_count - 1 шагов
-                left_neighbor_id = left_neighbor_id - 1 if left_neighbor_id > 1 else tokens_count
-                if left_neighbor_id == token_id:
-                    # Возвратились к самому себе
-                    break
-                left_neighbor = tokens_dict.get(left_neighbor_id)
-                if left_neighbor and left_neighbor['alive']:
-                    break
-            else:
-                left_neighbor = None
-
-            # Находим правого живого соседа
-            right_neighbor_id = token_id
-            for _ in range(tokens_count - 1):
-                right_neighbor_id = right_neighbor_id + 1 if right_neighbor_id < tokens_count else 1
-                if right_neighbor_id == token_id:
-                    # Возвратились к самому себе
-                    break
-                right_neighbor = tokens_dict.get(right_neighbor_id)
-                if right_neighbor and right_neighbor['alive']:
-                    break
-            else:
-                right_neighbor = None
-
-            # Проверяем цвет соседей (включая "пьяные" жетоны)
-            if left_neighbor and left_neighbor['alignment'] == 'red':
-                red_neighbors += 1
-            if right_neighbor and right_neighbor['alignment'] == 'red':
-                red_neighbors += 1
-
-            # Обновляем поле red_neighbors в базе данных
-            update_token_red_neighbors(token_id, red_neighbors)
-            logger.info(f"Жетон {token_id}: количество красных соседей обновлено до {red_neighbors}")
-        else:
-            # Для красных жетонов и мёртвых синих жетонов red_neighbors не обновляем
-            pass
+
+def build_neighbor_ring(tokens):
+    """
+    Строит кольцо соседей по списку жетонов из базы данных.
+    Жетон с id=k занимает позицию k-1. Возвращает кольцо и список жетонов по позициям
+    (None на месте отсутствующих жетонов, такие места считаются мёртвыми).
+    """
+    tokens_count = len(tokens)
+    tokens_by_position = [None] * tokens_count
+    for token in tokens:
+        if 1 <= token['id'] <= tokens_count:
+            tokens_by_position[token['id'] - 1] = token
+
+    for position, token in enumerate(tokens_by_position):
+        if token is None:
+            logger.warning(f"Жетон с id={position + 1} не найден.")
+
+    ring = NeighborRing(
+        [token is not None and token['alignment'] == 'red' for token in tokens_by_position],
+        [token is not None and bool(token['alive']) for token in tokens_by_position]
+    )
+    return ring, tokens_by_position
@@ -3,7 +3,7 @@
 import os
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
-from database import add_user, get_user_by_username, reset_user_game_state, clear_game_set, get_all_users
+from async_database import add_user, get_user_by_username, reset_user_game_state, clear_game_set, get_all_users
 import logging
 from constants import HANDLE_PASSWORD, GET_USERNAME
 from game_set_handlers import set_up_game
@@ -40,9 +40,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     username, userid = extract_user_info(user)
 
     # Сохраняем пользователя в базе данных и получаем флаг is_new_user
-    is_new_user = add_user(username, userid)
+    is_new_user = await add_user(username, userid)
     context.user_data['is_new_user'] = is_new_user
-    clear_game_set()
+    # Удаляем только игры, которые ведёт этот пользователь: остальные столы продолжают играть
+    await clear_game_set(userid)
 
     await update.message.reply_text(
             f"Привет, {escape_html(username)}! Это 'Кровь на часовой башне'\n"
@@ -65,10 +66,10 @@ async def handle_password(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     username, userid = extract_user_info(user)
 
     if password == MODERATOR_PASSWORD:
-        add_user(username, userid, moderator=True)
+        await add_user(username, userid, moderator=True)
 
         # Получаем список пользователей из базы данных
-        users = get_all_users()
+        users = await get_all_users()
         users_list = "\n".join([f"@{user['username']} (ID: {user['id']})" for user in users])
 
         await update.message.reply_text(
@@ -120,15 +121,15 @@ async def get_username(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         parse_mode='HTML'
     )
     
-    player = get_user_by_username(player_username)
+    player = await get_user_by_username(player_username)
     player_id = player['id']
 
     await context.bot.send_message(
         chat_id=player_id,
         text=(f"Модератор @{update.effective_user.username} выбрал тебя для игры.")
     )
-    reset_user_game_state(player_id)
-    reset_user_game_state(update.effective_user.id)
+    await reset_user_game_state(player_id)
+    await reset_user_game_state(update.effective_user.id)
     return await set_up_game(update, context)
 
 async def skip(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
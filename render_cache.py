@@ -0,0 +1,71 @@
+# render_cache.py
+
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class RenderCache:
+    """
+    LRU-кэш готовых PNG-изображений карты жетонов с ограничением по суммарному размеру в байтах.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """
+        Возвращает байты PNG по ключу или None, если изображения нет в кэше.
+        """
+        png_bytes = self._entries.get(key)
+        if png_bytes is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return png_bytes
+
+    def put(self, key, png_bytes):
+        """
+        Сохраняет изображение в кэш, вытесняя самые давно использованные записи при превышении лимита.
+        """
+        if len(png_bytes) > self.max_bytes:
+            logger.debug(f"Изображение размером {len(png_bytes)} байт не помещается в кэш.")
+            return
+
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size_bytes -= len(previous)
+        self._entries[key] = png_bytes
+        self.size_bytes += len(png_bytes)
+
+        while self.size_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size_bytes -= len(evicted)
+
+    def clear(self):
+        """
+        Очищает кэш.
+        """
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """
+        Возвращает статистику кэша.
+        """
+        return {
+            'entries': len(self._entries),
+            'size_bytes': self.size_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses
+        }
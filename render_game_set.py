@@ -3,16 +3,33 @@
 import os
 import re
 import logging
-from PIL import Image, ImageDraw, ImageFont
-import math
 import io
+import hashlib
 from telegram import Update
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
-from database import get_latest_game_set, get_all_tokens
+from async_database import (
+    get_game_set,
+    get_all_tokens,
+    get_board_file_id,
+    save_board_file_id,
+    delete_board_file_id,
+    add_board_history
+)
 from distributions import POSITIONS_MAP
+from render_cache import RenderCache
+from board_codec import visible_board
+from board_renderer import FONT_PATH, get_board_renderer
+from render_pool import render_pool
+from metrics import RENDER_SECONDS, RENDER_QUEUE_SECONDS, RENDER_PNG_BYTES
 logger = logging.getLogger(__name__)
 
-FONT_PATH = os.path.join(os.path.dirname(__file__), 'fonts', 'DejaVuSans.ttf')
+# Кэш готовых изображений карты: одинаковая раскладка для одного вида не перерисовывается
+RENDER_CACHE_BYTES = int(os.getenv('RENDER_CACHE_BYTES', 8 * 1024 * 1024))
+board_cache = RenderCache(RENDER_CACHE_BYTES)
+
+# file_id уже отправленных картинок по ключу раскладки (копия таблицы board_photos в памяти)
+board_file_ids = {}
 
 def escape_markdown_v2(text: str) -> str:
     """
@@ -20,15 +37,17 @@ def escape_markdown_v2(text: str) -> str:
     """
     return re.sub(r'([_*\[\]()~`>#+\-=|{}.!])', r'\\\1', text)
 
-async def show_game_set(context: ContextTypes.DEFAULT_TYPE, chat_id: int, moderator: bool) -> None:
+async def show_game_set(context: ContextTypes.DEFAULT_TYPE, chat_id: int, moderator: bool, game_id: int,
+                        snapshot=None) -> None:
     """
-    Показывает настройки игры, включая визуализацию карты жетонов.
+    Показывает настройки игры game_id, включая визуализацию карты жетонов.
     Если moderator=True, отображает реальные цвета жетонов.
     Если moderator=False, отображает все живые жетоны одного цвета.
     Мертвые жетоны отображаются серым цветом без значения red_neighbors.
+    Если передан snapshot (GameSnapshot), настройки и жетоны берутся из него без запросов к базе.
     """
     
-    game_set = get_latest_game_set()
+    game_set = snapshot.game_set if snapshot is not None else await get_game_set(game_id)
 
     if game_set:
         tokens_count = game_set['tokens_count']
@@ -46,7 +65,7 @@ async def show_game_set(context: ContextTypes.DEFAULT_TYPE, chat_id: int, modera
             return
 
         # Получаем список жетонов из базы данных
-        tokens_data = get_all_tokens()
+        tokens_data = snapshot.token_list() if snapshot is not None else await get_all_tokens(game_id)
 
         if not tokens_data:
             message = "Жетоны не найдены."
@@ -96,97 +115,25 @@ async def show_game_set(context: ContextTypes.DEFAULT_TYPE, chat_id: int, modera
                 # Добавляем red_neighbors для всех живых жетонов (и для игрока, и для модератора)
                 red_neighbors_list.append(red_neighbors)
 
-        # Рассчитываем позиции жетонов по кругу
-        image_size = 500  # Размер изображения
-        center = image_size // 2
-        radius = image_size // 2 - 50  # Радиус круга, на котором будут расположены жетоны
-        angle_between_tokens = 360 / tokens_count
-
-        # Создаем новое изображение
-        image = Image.new('RGB', (image_size, image_size), color='white')
-        draw = ImageDraw.Draw(image)
-
-        # Проверяем наличие шрифта
-        if not os.path.isfile(FONT_PATH):
-            message = f"Файл шрифта не найден по пути '{FONT_PATH}'."
-            escaped_message = escape_markdown_v2(message)
-            await context.bot.send_message(chat_id=chat_id, text=escaped_message, parse_mode='MarkdownV2')
-            logger.error(f"Файл шрифта не найден по пути '{FONT_PATH}'.")
-            return
+        render_args = (tokens_count, tuple(tokens_colors), tuple(red_neighbors_list), tuple(drunk_tokens), moderator)
 
-        # Загружаем шрифт
-        font_size = 20
+        # Ключ кэша - видимая часть доски в записи board_codec: всё, что влияет на картинку
         try:
-            font = ImageFont.truetype(FONT_PATH, font_size)
-        except Exception as e:
-            message = "Не удалось загрузить шрифт."
-            escaped_message = escape_markdown_v2(message)
-            await context.bot.send_message(chat_id=chat_id, text=escaped_message, parse_mode='MarkdownV2')
-            logger.error(f"Ошибка при загрузке шрифта: {e}")
-            return
-
-        for i in range(tokens_count):
-            angle_deg = angle_between_tokens * i - 90  # Смещаем на 90 градусов, чтобы первый жетон был сверху
-            angle_rad = math.radians(angle_deg)
-
-            # Позиция жетона
-            x = center + radius * math.cos(angle_rad)
-            y = center + radius * math.sin(angle_rad)
-
-            # Цвет жетона
-            if i < len(tokens_colors):
-                token_color = tokens_colors[i]
-            else:
-                token_color = 'grey'
-
-            # Рисуем жетон (круг)
-            token_radius = 20
-            left_up_point = (x - token_radius, y - token_radius)
-            right_down_point = (x + token_radius, y + token_radius)
-            draw.ellipse([left_up_point, right_down_point], fill=token_color, outline='black')
-
-            # Номер жетона внутри круга
-            token_number = str(i + 1)
-            number_width, number_height = draw.textsize(token_number, font=font)
-            number_x = x - number_width / 2
-            number_y = y - number_height / 2
-            draw.text((number_x, number_y), token_number, fill='black', font=font)
-
-            # Значение red_neighbors справа от жетона (только для живых жетонов)
-            if red_neighbors_list[i] is not None:
-                red_neighbors = red_neighbors_list[i]
-                red_neighbors_text = str(red_neighbors)
-                rn_width, rn_height = draw.textsize(red_neighbors_text, font=font)
-                rn_x = x + token_radius + 5
-                rn_y = y - rn_height / 2
-                draw.text((rn_x, rn_y), red_neighbors_text, fill='black', font=font)
-
-            # Если жетон "пьяный" и модератор смотрит на карту, рисуем символ бутылки
-            if moderator and (i + 1) in drunk_tokens:
-                # Рисуем символ бутылки на жетоне
-                bottle_width, bottle_height = 10, 20
-                bottle_x = x - bottle_width / 2
-                bottle_y = y - token_radius - bottle_height - 5
-                draw.rectangle(
-                    [bottle_x, bottle_y, bottle_x + bottle_width, bottle_y + bottle_height],
-                    fill='brown',
-                    outline='black'
-                )
-                # Нарисуем горлышко бутылки
-                neck_width = bottle_width * 0.4
-                neck_height = 7
-                neck_x = bottle_x + (bottle_width - neck_width) / 2
-                neck_y = bottle_y - neck_height
-                draw.rectangle(
-                    [neck_x, neck_y, neck_x + neck_width, neck_y + neck_height],
-                    fill='brown',
-                    outline='black'
-                )
-
-        # Сохраняем изображение в байтовый поток
-        image_bytes = io.BytesIO()
-        image.save(image_bytes, format='PNG')
-        image_bytes.seek(0)
+            cache_key = visible_board(tokens_data, moderator)
+            board_key = cache_key.hex()
+        except ValueError as e:
+            # Старые игры могли сохранить число соседей больше 2, такую доску не закодировать
+            logger.warning(f"Доска не кодируется, ключ кэша строится по параметрам отрисовки: {e}")
+            cache_key = render_args
+            board_key = hashlib.sha1(repr(cache_key).encode()).hexdigest()
+
+        # Если такая картинка уже отправлялась, повторно используем её file_id и не рисуем заново
+        file_id = board_file_ids.get(board_key) or await get_board_file_id(board_key)
+        png_bytes = None
+        if file_id is None:
+            png_bytes = await get_board_png(context, chat_id, cache_key, render_args)
+            if png_bytes is None:
+                return
 
         # Экранирование и форматирование информации об игре
         escaped_player_username = escape_markdown_v2(player_username)
@@ -200,10 +147,70 @@ async def show_game_set(context: ContextTypes.DEFAULT_TYPE, chat_id: int, modera
 
         # Отправляем информацию и изображение
         await context.bot.send_message(chat_id=chat_id, text=game_info, parse_mode='MarkdownV2')
-        await context.bot.send_photo(chat_id=chat_id, photo=image_bytes, caption="Карта распределения жетонов")
+        if file_id is not None:
+            try:
+                await context.bot.send_photo(chat_id=chat_id, photo=file_id, caption="Карта распределения жетонов")
+                board_file_ids[board_key] = file_id
+            except BadRequest as e:
+                logger.warning(f"Telegram не принял сохранённый file_id карты, изображение будет загружено заново: {e}")
+                board_file_ids.pop(board_key, None)
+                await delete_board_file_id(board_key)
+                file_id = None
+                png_bytes = await get_board_png(context, chat_id, cache_key, render_args)
+                if png_bytes is None:
+                    return
+
+        if file_id is None:
+            message = await context.bot.send_photo(
+                chat_id=chat_id,
+                photo=io.BytesIO(png_bytes),
+                caption="Карта распределения жетонов"
+            )
+            if message.photo:
+                board_file_ids[board_key] = message.photo[-1].file_id
+                await save_board_file_id(board_key, message.photo[-1].file_id)
+
+        # Карты, которые видел игрок, - история игры для /check_setup
+        if not moderator and isinstance(cache_key, bytes):
+            await add_board_history(game_set['id'], cache_key)
         logger.info("Показаны настройки игры с картой жетонов.")
     else:
         message = "Настройки игры не найдены."
         escaped_message = escape_markdown_v2(message)
         await context.bot.send_message(chat_id=chat_id, text=escaped_message, parse_mode='MarkdownV2')
         logger.warning("Настройки игры не найдены.")
+
+
+async def get_board_png(context: ContextTypes.DEFAULT_TYPE, chat_id: int, cache_key, render_args: tuple):
+    """
+    Возвращает PNG карты из кэша по cache_key или рисует её заново с аргументами render_args.
+    Если шрифт недоступен, сообщает об ошибке в чат и возвращает None.
+    """
+    png_bytes = board_cache.get(cache_key)
+    if png_bytes is not None:
+        return png_bytes
+
+    # Шрифт и заготовки жетонов загружаются один раз при создании рендерера
+    try:
+        get_board_renderer()
+    except FileNotFoundError:
+        message = f"Файл шрифта не найден по пути '{FONT_PATH}'."
+        escaped_message = escape_markdown_v2(message)
+        await context.bot.send_message(chat_id=chat_id, text=escaped_message, parse_mode='MarkdownV2')
+        logger.error(f"Файл шрифта не найден по пути '{FONT_PATH}'.")
+        return None
+    except Exception as e:
+        message = "Не удалось загрузить шрифт."
+        escaped_message = escape_markdown_v2(message)
+        await context.bot.send_message(chat_id=chat_id, text=escaped_message, parse_mode='MarkdownV2')
+        logger.error(f"Ошибка при загрузке шрифта: {e}")
+        return None
+
+    # Рисование и кодирование PNG выполняются в пуле, чтобы не блокировать цикл событий
+    png_bytes, wait_seconds, render_seconds = await render_pool.render(*render_args)
+    RENDER_QUEUE_SECONDS.observe(wait_seconds)
+    RENDER_SECONDS.observe(render_seconds)
+    RENDER_PNG_BYTES.observe(len(png_bytes))
+    board_cache.put(cache_key, png_bytes)
+    return png_bytes
+
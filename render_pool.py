@@ -0,0 +1,121 @@
+# render_pool.py
+
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from board_renderer import get_board_renderer
+
+logger = logging.getLogger(__name__)
+
+# Тип пула: 'thread' или 'process'. Кодирование PNG в zlib отпускает GIL, поэтому потоков обычно достаточно.
+RENDER_POOL_KIND = os.getenv('RENDER_POOL_KIND', 'thread')
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', min(4, os.cpu_count() or 1)))
+# Сколько отрисовок может одновременно находиться в пуле; остальные ждут своей очереди
+RENDER_QUEUE_SIZE = int(os.getenv('RENDER_QUEUE_SIZE', RENDER_WORKERS * 2))
+
+
+def _render_in_worker(args):
+    """
+    Рисует карту в рабочем потоке или процессе. У каждого процесса свой BoardRenderer.
+    Возвращает байты PNG и время самой отрисовки, измеренное в воркере.
+    """
+    started = time.perf_counter()
+    png_bytes = get_board_renderer().render(*args)
+    return png_bytes, time.perf_counter() - started
+
+
+class RenderPool:
+    """
+    Пул для отрисовки карт вне цикла событий с ограниченной очередью.
+    Если очередь заполнена, корутина render ждёт освобождения места (backpressure).
+    """
+
+    def __init__(self, kind=RENDER_POOL_KIND, workers=RENDER_WORKERS, queue_size=RENDER_QUEUE_SIZE):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Неизвестный тип пула отрисовки: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = None
+        self._slots = asyncio.Semaphore(queue_size)
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.wait_seconds = 0.0
+        self.render_seconds = 0.0
+
+    def _get_executor(self):
+        """
+        Создаёт пул при первой отрисовке.
+        """
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=get_board_renderer)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='render')
+            logger.info(f"Запущен пул отрисовки: {self.kind}, воркеров {self.workers}, очередь {self.queue_size}")
+        return self._executor
+
+    async def render(self, *args):
+        """
+        Рисует карту в пуле. Аргументы те же, что у BoardRenderer.render.
+        Возвращает (байты PNG, ожидание в очереди в секундах, время отрисовки в секундах):
+        ожидание - всё время до и после работы воркера (место в пуле, очередь исполнителя),
+        отрисовка измеряется в самом воркере.
+        """
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        queued_at = time.perf_counter()
+        async with self._slots:
+            self.waiting -= 1
+            self.submitted += 1
+            self.in_flight += 1
+            loop = asyncio.get_running_loop()
+            try:
+                png_bytes, render_seconds = await loop.run_in_executor(self._get_executor(), _render_in_worker, args)
+            except Exception:
+                self.failed += 1
+                raise
+            finally:
+                self.in_flight -= 1
+            self.completed += 1
+        wait_seconds = max(0.0, time.perf_counter() - queued_at - render_seconds)
+        self.wait_seconds += wait_seconds
+        self.render_seconds += render_seconds
+        return png_bytes, wait_seconds, render_seconds
+
+    def stats(self):
+        """
+        Возвращает метрики пула: загрузку очереди и суммарное время ожидания и отрисовки.
+        """
+        return {
+            'kind': self.kind,
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'in_flight': self.in_flight,
+            'waiting': self.waiting,
+            'max_waiting': self.max_waiting,
+            'wait_seconds': self.wait_seconds,
+            'render_seconds': self.render_seconds
+        }
+
+    def shutdown(self):
+        """
+        Останавливает пул, дождавшись текущих отрисовок.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            logger.info(f"Пул отрисовки остановлен. Статистика: {self.stats()}")
+
+
+render_pool = RenderPool()
@@ -0,0 +1,135 @@
+# seating_solver.py
+
+from functools import lru_cache
+from math import comb
+from board_codec import decode_board, unpack_board
+from neighbor_ring import NeighborRing
+
+
+def _history_board(board, tokens_count):
+    """
+    Живые жетоны и показанные числа доски из истории (запись board_codec) или None,
+    если доска от другого размера поля.
+    """
+    board_tokens_count, _, alive_mask, _, _, red_neighbors = unpack_board(board)
+    if board_tokens_count != tokens_count:
+        return None
+    return [bool(alive_mask >> position & 1) for position in range(tokens_count)], red_neighbors
+
+
+def solve_seating(tokens, red_count, max_drunk=1, history=()):
+    """
+    Перебирает все рассадки красных жетонов, которые согласуются с тем, что видит игрок:
+    живые жетоны и числа красных соседей на них - на текущей карте и на всех картах
+    из history, которые игрок видел в прошлые дни.
+
+    Правила те же, что в NeighborRing: синий трезвый живой жетон показывает число красных
+    живых соседей в кольце живых жетонов этого дня. Красные жетоны показывают любое число,
+    на каждой карте до max_drunk синих жетонов могут быть "пьяными" и показывать неверное число
+    (пьяный жетон выбирается заново каждую ночь). Мёртвые жетоны тоже могут быть красными,
+    но демоном может быть только жетон, живой на текущей карте (иначе игра уже закончилась бы).
+    Порядок казней и убийств учитывается через кольцо живых жетонов каждой карты истории.
+    Все подходящие рассадки считаются равновероятными, демон - любой из живых красных жетонов рассадки.
+
+    tokens - жетоны в формате get_all_tokens (используются только id, alive и red_neighbors).
+    history - доски в записи board_codec в порядке показа игроку (см. board_history).
+    Возвращает {'seatings': число рассадок, 'red': {id: вероятность}, 'demon': {id: вероятность}}.
+    """
+    tokens_count = len(tokens)
+    alive = [False] * tokens_count
+    shown = [None] * tokens_count
+    for token in tokens:
+        position = token['id'] - 1
+        if 0 <= position < tokens_count:
+            alive[position] = bool(token['alive'])
+            # Как в visible_board: у мёртвых жетонов числа нет
+            shown[position] = token['red_neighbors'] or 0 if alive[position] else None
+
+    boards = [(alive, shown)]
+    for board in history:
+        day = _history_board(board, tokens_count)
+        if day is not None and day not in boards:
+            boards.append(day)
+
+    # Проверка синего жетона выполняется, как только решены он сам и оба его соседа.
+    # Расхождения (пьяные жетоны) считаются отдельно для каждой карты.
+    checks_at = [[] for _ in range(tokens_count)]
+    for board_index, (board_alive, board_shown) in enumerate(boards):
+        # Соседство берётся из того же кольца, что у бота и game_engine; цвета здесь не нужны
+        ring = NeighborRing([False] * tokens_count, board_alive)
+        for position in range(tokens_count):
+            if not board_alive[position] or board_shown[position] is None:
+                continue
+            left, right = ring.left[position], ring.right[position]
+            checks_at[max(position, left, right)].append(
+                (board_index, position, left, right, board_shown[position])
+            )
+
+    red_hits = [0.0] * tokens_count
+    demon_hits = [0.0] * tokens_count
+    seatings = 0
+
+    # Стек перебора: (позиция, маска красных, осталось красных, расхождения по картам)
+    stack = [(0, 0, red_count, (0,) * len(boards))]
+    while stack:
+        position, mask, reds_left, mismatches = stack.pop()
+        if position == tokens_count:
+            alive_reds = [p for p in range(tokens_count) if mask >> p & 1 and alive[p]]
+            if not alive_reds:
+                continue
+            seatings += 1
+            for p in range(tokens_count):
+                if mask >> p & 1:
+                    red_hits[p] += 1
+            share = 1 / len(alive_reds)
+            for p in alive_reds:
+                demon_hits[p] += share
+            continue
+
+        remaining = tokens_count - position
+        choices = []
+        if reds_left < remaining:
+            choices.append((mask, reds_left))
+        if reds_left:
+            choices.append((mask | 1 << position, reds_left - 1))
+
+        for next_mask, next_reds_left in choices:
+            next_mismatches = mismatches
+            consistent = True
+            for board_index, checked, left, right, value in checks_at[position]:
+                if next_mask >> checked & 1:
+                    continue
+                count = 0 if left == checked else (next_mask >> left & 1) + (next_mask >> right & 1)
+                if count != value:
+                    misses = next_mismatches[board_index] + 1
+                    if misses > max_drunk:
+                        consistent = False
+                        break
+                    next_mismatches = next_mismatches[:board_index] + (misses,) + next_mismatches[board_index + 1:]
+            if consistent:
+                stack.append((position + 1, next_mask, next_reds_left, next_mismatches))
+
+    ids = range(1, tokens_count + 1)
+    if not seatings:
+        return {'seatings': 0, 'red': {i: 0.0 for i in ids}, 'demon': {i: 0.0 for i in ids}}
+    return {
+        'seatings': seatings,
+        'red': {i: red_hits[i - 1] / seatings for i in ids},
+        'demon': {i: demon_hits[i - 1] / seatings for i in ids},
+    }
+
+
+@lru_cache(maxsize=1024)
+def solve_board(board, red_count, max_drunk=1, history=()):
+    """
+    solve_seating для доски в записи board_codec и кортежа досок истории.
+    Результаты кэшируются по доскам, поэтому возвращаемый словарь нельзя менять.
+    """
+    return solve_seating(decode_board(board), red_count, max_drunk, history)
+
+
+def seating_space(tokens_count, red_count):
+    """
+    Число всех рассадок красных жетонов без учёта показанных чисел.
+    """
+    return comb(tokens_count, red_count)
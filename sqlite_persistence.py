@@ -0,0 +1,139 @@
+# sqlite_persistence.py
+
+import asyncio
+import json
+import logging
+import os
+import pickle
+from telegram.ext import BasePersistence, PersistenceInput
+import async_database
+
+logger = logging.getLogger(__name__)
+
+# Как часто (в секундах) приложение передаёт изменённые данные в persistence
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv('PERSISTENCE_UPDATE_INTERVAL', 5))
+
+USER_DATA = 'user_data'
+CHAT_DATA = 'chat_data'
+BOT_DATA = 'bot_data'
+CONVERSATION = 'conversation:'
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    Хранит user_data, chat_data, bot_data и состояния ConversationHandler в таблице persistence.
+
+    Запись отложенная: приложение раз в update_interval секунд передаёт только изменённые
+    записи, они копятся в памяти и записываются на диск одной транзакцией.
+    Последний сброс выполняется при остановке приложения (flush).
+    """
+
+    def __init__(self, db_path='empaths.db', update_interval=PERSISTENCE_UPDATE_INTERVAL,
+                 store_data=PersistenceInput(callback_data=False)):
+        super().__init__(store_data=store_data, update_interval=update_interval)
+        self.db_path = db_path
+        self._pending = {}
+        self._saved = {}
+        self._flush_task = None
+        self.flushes = 0
+
+    async def _load(self, kind):
+        rows = await async_database.load_persistence(kind, self.db_path)
+        for key, value in rows.items():
+            self._saved[(kind, key)] = value
+        return {key: pickle.loads(value) for key, value in rows.items()}
+
+    async def get_user_data(self):
+        return {int(key): value for key, value in (await self._load(USER_DATA)).items()}
+
+    async def get_chat_data(self):
+        return {int(key): value for key, value in (await self._load(CHAT_DATA)).items()}
+
+    async def get_bot_data(self):
+        return (await self._load(BOT_DATA)).get('', {})
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        rows = await self._load(CONVERSATION + name)
+        return {tuple(json.loads(key)): state for key, state in rows.items()}
+
+    def _mark(self, kind, key, value):
+        """
+        Откладывает запись (или удаление, если value is None) до ближайшего сброса.
+        Значения, совпадающие с уже записанными, пропускаются.
+        Все изменения одного прохода update_persistence попадают в одну транзакцию.
+        """
+        entry = (kind, str(key))
+        value = None if value is None else pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if value == self._saved.get(entry):
+            self._pending.pop(entry, None)
+            return
+        self._pending[entry] = value
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._write_pending())
+
+    async def update_user_data(self, user_id, data):
+        self._mark(USER_DATA, user_id, data)
+
+    async def update_chat_data(self, chat_id, data):
+        self._mark(CHAT_DATA, chat_id, data)
+
+    async def update_bot_data(self, data):
+        self._mark(BOT_DATA, '', data)
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name, key, new_state):
+        self._mark(CONVERSATION + name, json.dumps(list(key)), new_state)
+
+    async def drop_user_data(self, user_id):
+        self._mark(USER_DATA, user_id, None)
+
+    async def drop_chat_data(self, chat_id):
+        self._mark(CHAT_DATA, chat_id, None)
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        """
+        Дожидается текущей записи и сохраняет всё, что осталось в буфере.
+        Вызывается приложением при остановке.
+        """
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+        await self._write_pending()
+
+    async def _write_pending(self):
+        """
+        Записывает все накопленные изменения одной транзакцией.
+        Изменения, пришедшие во время записи, записываются следующей транзакцией.
+        """
+        while self._pending:
+            pending, self._pending = self._pending, {}
+            upserts = [(kind, key, value) for (kind, key), value in pending.items() if value is not None]
+            deletes = [(kind, key) for (kind, key), value in pending.items() if value is None]
+            try:
+                await async_database.save_persistence(upserts, deletes, self.db_path)
+            except Exception as e:
+                # Возвращаем изменения в буфер, более новые значения не перезаписываем
+                pending.update(self._pending)
+                self._pending = pending
+                logger.error(f"Не удалось сохранить состояние бота: {e}")
+                return
+            for entry, value in pending.items():
+                if value is None:
+                    self._saved.pop(entry, None)
+                else:
+                    self._saved[entry] = value
+            self.flushes += 1
+            logger.debug(f"Состояние бота сохранено: записано {len(upserts)}, удалено {len(deletes)}.")
@@ -0,0 +1,26 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# Модули бота лежат в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """
+    Временная база empaths.db в отдельном каталоге; соединения закрываются после теста.
+    """
+    import database
+    import user_directory
+    from db_connection import close_all_connections
+
+    monkeypatch.chdir(tmp_path)
+    # Справочники пользователей кэшируются по пути к базе, а путь у всех тестов один - empaths.db
+    monkeypatch.setattr(user_directory, '_directories', {})
+    database.init_db()
+    yield database
+    close_all_connections()
@@ -0,0 +1,59 @@
+# tests/test_async_database.py
+
+import asyncio
+import contextvars
+import threading
+
+import pytest
+
+from async_database import run_in_db_thread
+
+request_id = contextvars.ContextVar('request_id', default=None)
+
+
+@run_in_db_thread
+def describe(value, suffix=''):
+    return f"{value}{suffix}", threading.current_thread().name, request_id.get()
+
+
+@run_in_db_thread
+def fail(message):
+    raise LookupError(message)
+
+
+def test_result_comes_back_from_db_thread():
+    async def scenario():
+        request_id.set('update-1')
+        return await describe(41, suffix='!')
+
+    value, thread_name, seen_request_id = asyncio.run(scenario())
+
+    assert value == '41!'
+    assert thread_name.startswith('db') and thread_name != threading.current_thread().name
+    # Контекст вызывающей корутины виден в потоке базы данных
+    assert seen_request_id == 'update-1'
+
+
+def test_exception_reaches_caller():
+    async def scenario():
+        with pytest.raises(LookupError, match='нет такой игры'):
+            await fail('нет такой игры')
+        # Поток базы данных продолжает работать после ошибки
+        return await describe('ok')
+
+    assert asyncio.run(scenario())[0] == 'ok'
+
+
+def test_calls_run_one_at_a_time_in_order():
+    order = []
+
+    @run_in_db_thread
+    def record(index):
+        order.append(index)
+        return index
+
+    async def scenario():
+        return await asyncio.gather(*(record(index) for index in range(20)))
+
+    assert asyncio.run(scenario()) == list(range(20))
+    assert order == list(range(20))
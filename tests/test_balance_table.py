@@ -0,0 +1,26 @@
+# tests/test_balance_table.py
+
+import json
+
+from balance_table import BalanceTable, write_balance_table
+
+
+def test_written_table_loads_back(tmp_path):
+    path = tmp_path / 'balance_table.json'
+    results = [
+        {'tokens_count': 7, 'red_count': 2, 'drunk': False, 'blue_win_rate': 0.84231, 'mean_days': 1.963},
+        {'tokens_count': 7, 'red_count': 2, 'drunk': True, 'blue_win_rate': 0.71489, 'mean_days': 2.158},
+    ]
+
+    write_balance_table(results, path, games=1000, player='suspicion', note='проверка')
+
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert data['games'] == 1000 and data['note'] == 'проверка'
+    assert data['rows'] == [[7, 2, 0, 0.8423, 1.96], [7, 2, 1, 0.7149, 2.16]]
+    # Одна конфигурация на строку файла
+    assert "    [7, 2, 1, 0.7149, 2.16]\n" in path.read_text(encoding='utf-8')
+
+    table = BalanceTable(str(path))
+    assert table.meta['player'] == 'suspicion'
+    assert table.lookup(7, 2, True) == {'blue_win_rate': 0.7149, 'mean_days': 2.16}
+    assert table.lookup(8, 2, True) is None
@@ -0,0 +1,138 @@
+# tests/test_board_codec.py
+
+import random
+
+import pytest
+
+from board_codec import (
+    BOARD_BYTES,
+    decode_board,
+    encode_board,
+    unpack_board,
+    visible_board,
+    board_from_state,
+    state_from_board,
+)
+from game_engine import GameState
+
+
+def create_game(database, tokens_count, rng):
+    """
+    Создаёт игру со случайной рассадкой, смертями, пьяными жетонами и числами соседей.
+    """
+    game_id = database.add_game_set(tokens_count, 3, 'player', 200, 'moderator', 100)
+    database.add_tokens(game_id, [('blue', 'townfolk', 0)] * tokens_count)
+    red_ids = rng.sample(range(1, tokens_count + 1), 3)
+    changes = {}
+    for token_id in range(1, tokens_count + 1):
+        change = changes[token_id] = {'red_neighbors': rng.randint(0, 2)}
+        if token_id in red_ids:
+            change.update(alignment='red', character='minion')
+        if rng.random() < 0.3:
+            change['alive'] = 0
+        if rng.random() < 0.1:
+            change['drunk'] = 1
+    changes[red_ids[0]]['character'] = 'demon'
+    database.update_tokens_bulk(game_id, changes)
+    return game_id
+
+
+def test_round_trip_against_tokens_table(temp_db):
+    rng = random.Random(1)
+    for tokens_count in range(7, 17):
+        game_id = create_game(temp_db, tokens_count, rng)
+        tokens = temp_db.get_all_tokens(game_id)
+
+        board = encode_board(tokens)
+
+        assert len(board) == BOARD_BYTES
+        assert decode_board(board, game_id) == tokens
+
+
+def test_round_trip_keeps_empty_value():
+    tokens = decode_board(encode_board([
+        {'id': 1, 'alignment': 'red', 'character': 'demon', 'red_neighbors': None, 'alive': 1, 'drunk': 0},
+        {'id': 2, 'alignment': 'blue', 'character': 'townfolk', 'red_neighbors': 1, 'alive': 1, 'drunk': 0},
+        {'id': 3, 'alignment': 'blue', 'character': 'townfolk', 'red_neighbors': 1, 'alive': 1, 'drunk': 0},
+    ]))
+    assert [token['red_neighbors'] for token in tokens] == [None, 1, 1]
+
+
+def test_state_round_trip():
+    rng = random.Random(2)
+    for _ in range(200):
+        tokens_count = rng.randint(7, 16)
+        red_positions = rng.sample(range(tokens_count), 4)
+        state = GameState([position in red_positions for position in range(tokens_count)], red_positions[0])
+        for position in red_positions:
+            state.set_bluff(position, rng.randint(0, 2))
+        blue = [position for position in range(tokens_count) if position not in red_positions]
+        state.set_drunk(rng.choice(blue), rng.randint(0, 2))
+        for position in rng.sample(blue, 3):
+            state.kill(position)
+
+        restored = state_from_board(board_from_state(state))
+
+        assert bytes(restored.red) == bytes(state.red)
+        assert bytes(restored.alive) == bytes(state.alive)
+        assert bytes(restored.drunk) == bytes(state.drunk)
+        assert restored.demon == state.demon
+        assert restored.left == state.left and restored.right == state.right
+        assert restored.red_neighbors == state.red_neighbors
+        assert [restored.shown(p) for p in range(tokens_count)] == [state.shown(p) for p in range(tokens_count)]
+
+
+def board_tokens():
+    return [
+        {'id': 1, 'alignment': 'red', 'character': 'demon', 'red_neighbors': 1, 'alive': 1, 'drunk': 0},
+        {'id': 2, 'alignment': 'blue', 'character': 'townfolk', 'red_neighbors': 2, 'alive': 1, 'drunk': 1},
+        {'id': 3, 'alignment': 'red', 'character': 'minion', 'red_neighbors': 0, 'alive': 0, 'drunk': 0},
+        {'id': 4, 'alignment': 'blue', 'character': 'townfolk', 'red_neighbors': 2, 'alive': 0, 'drunk': 0},
+        {'id': 5, 'alignment': 'blue', 'character': 'townfolk', 'red_neighbors': 1, 'alive': 1, 'drunk': 0},
+    ]
+
+
+def test_visible_board_for_player_hides_seating():
+    tokens_count, red, alive, drunk, demon, red_neighbors = unpack_board(visible_board(board_tokens(), moderator=False))
+
+    assert tokens_count == 5
+    assert red == 0 and drunk == 0 and demon is None
+    assert alive == 0b10011
+    assert red_neighbors == [1, 2, None, None, 1]
+
+
+def test_visible_board_for_moderator_clears_dead_tokens():
+    tokens_count, red, alive, drunk, demon, red_neighbors = unpack_board(visible_board(board_tokens(), moderator=True))
+
+    assert red == 0b00001  # мёртвый красный жетон 3 рисуется серым
+    assert demon == 0
+    assert drunk == 0b00010
+    assert red_neighbors == [1, 2, None, None, 1]
+
+
+def test_visible_board_ignores_hidden_differences():
+    tokens = board_tokens()
+    other = board_tokens()
+    other[0].update(alignment='blue', character='townfolk')
+    other[3]['red_neighbors'] = 0
+
+    assert visible_board(tokens, moderator=False) == visible_board(other, moderator=False)
+    assert visible_board(tokens, moderator=True) != visible_board(other, moderator=True)
+
+
+def test_rejects_red_neighbors_above_limit():
+    tokens = board_tokens()
+    tokens[1]['red_neighbors'] = 3
+    with pytest.raises(ValueError):
+        encode_board(tokens)
+
+
+def test_rejects_more_than_16_tokens():
+    tokens = [
+        {'id': token_id, 'alignment': 'blue', 'character': 'townfolk', 'red_neighbors': 0, 'alive': 1, 'drunk': 0}
+        for token_id in range(1, 18)
+    ]
+    with pytest.raises(ValueError):
+        encode_board(tokens)
+    with pytest.raises(ValueError):
+        visible_board(tokens, moderator=False)
@@ -0,0 +1,67 @@
+# tests/test_broadcast.py
+
+import asyncio
+import time
+
+from telegram.error import Forbidden, RetryAfter
+
+from broadcast import Broadcaster, TokenBucket
+
+
+class StubBot:
+    """
+    Заглушка Bot: отвечает RetryAfter заданное число раз на чат, в заблокированные чаты не отправляет.
+    """
+
+    def __init__(self, retry_after=None, blocked=()):
+        self.retry_after = dict(retry_after or {})
+        self.blocked = set(blocked)
+        self.calls = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls.append(chat_id)
+        if self.retry_after.get(chat_id):
+            self.retry_after[chat_id] -= 1
+            raise RetryAfter(0)
+        if chat_id in self.blocked:
+            raise Forbidden("bot was blocked by the user")
+        return f"{chat_id}:{text}"
+
+
+def test_token_bucket_waits_after_burst():
+    bucket = TokenBucket(rate=20, capacity=2)
+
+    async def scenario():
+        started = time.perf_counter()
+        for _ in range(3):
+            await bucket.acquire()
+        return time.perf_counter() - started
+
+    # Два токена сразу, третий - через 1/20 секунды
+    assert 0.04 <= asyncio.run(scenario()) < 0.5
+    assert not bucket.idle()
+
+
+def test_broadcast_retries_and_reports_each_recipient():
+    broadcaster = Broadcaster(global_rate=1000, chat_rate=1000, chat_burst=10, max_retries=3)
+    bot = StubBot(retry_after={1: 2}, blocked={3})
+
+    results = asyncio.run(broadcaster.broadcast(bot, [1, 2, 3, 2], "ход игрока"))
+
+    assert list(results) == [1, 2, 3]
+    assert results[1] == {'ok': True, 'attempts': 3, 'error': None, 'result': '1:ход игрока'}
+    assert results[2] == {'ok': True, 'attempts': 1, 'error': None, 'result': '2:ход игрока'}
+    assert results[3]['ok'] is False and 'blocked' in results[3]['error'] and results[3]['attempts'] == 1
+    assert sorted(bot.calls) == [1, 1, 1, 2, 3]
+    assert broadcaster.stats() == {'sent': 2, 'failed': 1, 'retries': 2, 'chat_buckets': 3}
+
+
+def test_broadcast_gives_up_after_max_retries():
+    broadcaster = Broadcaster(global_rate=1000, chat_rate=1000, chat_burst=10, max_retries=1)
+    bot = StubBot(retry_after={1: 5})
+
+    results = asyncio.run(broadcaster.broadcast(bot, [1], "текст"))
+
+    assert results[1]['ok'] is False and results[1]['attempts'] == 2
+    assert bot.calls == [1, 1]
+    assert broadcaster.stats()['failed'] == 1
@@ -0,0 +1,98 @@
+# tests/test_database.py
+
+import pytest
+
+from db_connection import get_connection, read_transaction
+
+
+def create_game(database, tokens_count=7):
+    game_id = database.add_game_set(tokens_count, 2, 'player', 200, 'moderator', 100)
+    database.add_tokens(game_id, [('blue', 'townfolk', 0)] * tokens_count)
+    return game_id
+
+
+def trace_statements(statements):
+    """
+    Записывает выражения SQL соединения текущего потока в список statements.
+    """
+    get_connection().set_trace_callback(statements.append)
+
+
+def test_update_tokens_bulk_returns_diff_and_commits_once(temp_db):
+    game_id = create_game(temp_db)
+    temp_db.update_tokens_bulk(game_id, {3: {'red_neighbors': 1}})
+    statements = []
+    trace_statements(statements)
+
+    diff = temp_db.update_tokens_bulk(game_id, {
+        2: {'alignment': 'red', 'character': 'demon'},
+        3: {'red_neighbors': 1, 'alive': 0},
+        4: {'red_neighbors': 0},
+        99: {'alive': 0},
+    })
+
+    # Неизменившиеся значения и отсутствующие жетоны в разницу не попадают
+    assert diff == {
+        2: {'alignment': ('blue', 'red'), 'character': ('townfolk', 'demon')},
+        3: {'alive': (1, 0)},
+    }
+    assert [statement.split()[0] for statement in statements].count('COMMIT') == 1
+    tokens = {token['id']: token for token in temp_db.get_all_tokens(game_id)}
+    assert tokens[2]['alignment'] == 'red' and tokens[2]['character'] == 'demon'
+    assert tokens[3]['alive'] == 0 and tokens[3]['red_neighbors'] == 1
+
+
+def test_update_tokens_bulk_without_changes_does_not_write(temp_db):
+    game_id = create_game(temp_db)
+    statements = []
+    trace_statements(statements)
+
+    assert temp_db.update_tokens_bulk(game_id, {1: {'red_neighbors': 0}}) == {}
+    assert temp_db.update_tokens_bulk(game_id, {}) == {}
+    assert not any(statement.startswith(('UPDATE', 'COMMIT')) for statement in statements)
+
+
+def test_update_tokens_bulk_rejects_unknown_fields(temp_db):
+    game_id = create_game(temp_db)
+    with pytest.raises(ValueError, match='color'):
+        temp_db.update_tokens_bulk(game_id, {1: {'color': 'red'}})
+
+
+def test_get_token_by_id_reads_alive_column(temp_db):
+    game_id = temp_db.add_game_set(7, 2, 'player', 200, 'moderator', 100)
+    temp_db.add_tokens(game_id, [('blue', 'townfolk', 0)] * 7)
+    temp_db.update_tokens_bulk(game_id, {2: {'red_neighbors': 1, 'alive': 0}})
+
+    # red_neighbors=0 у живого жетона и red_neighbors=1 у мёртвого: alive не зависит от числа
+    assert temp_db.get_token_by_id(game_id, 1) == {
+        'id': 1, 'alignment': 'blue', 'character': 'townfolk', 'red_neighbors': 0, 'alive': True,
+    }
+    assert temp_db.get_token_by_id(game_id, 2)['alive'] is False
+    assert temp_db.get_token_by_id(game_id, 8) is None
+
+
+@pytest.mark.parametrize('isolation_level', ['', None])
+def test_get_game_state_reads_one_snapshot(temp_db, isolation_level):
+    game_id = temp_db.add_game_set(7, 2, 'player', 200, 'moderator', 100)
+    temp_db.add_tokens(game_id, [('blue', 'townfolk', 0)] * 7)
+    conn = get_connection()
+    conn.isolation_level = isolation_level
+
+    game_set, tokens = temp_db.get_game_state(200)
+
+    assert game_set['id'] == game_id
+    assert [token['id'] for token in tokens] == list(range(1, 8))
+    assert not conn.in_transaction
+    assert temp_db.get_game_state(999) == (None, [])
+
+
+def test_read_transaction_rolls_back_on_error(temp_db):
+    conn = get_connection()
+    with pytest.raises(ZeroDivisionError):
+        with read_transaction() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM users')
+            1 / 0
+
+    assert not conn.in_transaction
+    with read_transaction() as cursor:
+        assert cursor.execute('SELECT COUNT(*) FROM users').fetchone() == (0,)
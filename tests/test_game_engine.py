@@ -0,0 +1,87 @@
+# tests/test_game_engine.py
+
+import random
+
+from game_engine import GameState, BLUE, RED, EXECUTED, KILLED, SHOWN, WON
+from game_snapshot import GameSnapshot
+from red_neighbors_handlers import compute_red_neighbors
+
+
+def make_tokens(tokens_count, red_ids, demon_id):
+    return [
+        {
+            'id': token_id,
+            'alignment': 'red' if token_id in red_ids else 'blue',
+            'character': 'demon' if token_id == demon_id else ('minion' if token_id in red_ids else 'townfolk'),
+            'red_neighbors': 0,
+            'alive': 1,
+            'drunk': 0,
+        }
+        for token_id in range(1, tokens_count + 1)
+    ]
+
+
+def make_snapshot(tokens_count=7, red_ids=(2, 5), demon_id=5):
+    game_set = {'id': 1, 'moderator_id': 100, 'player_id': 200, 'tokens_count': tokens_count}
+    return GameSnapshot(game_set, make_tokens(tokens_count, red_ids, demon_id))
+
+
+def test_execute_updates_neighbors():
+    state = GameState([False, True, False, False, False, False, False], demon=1)
+    assert state.red_neighbors[0] == 1 and state.red_neighbors[2] == 1
+
+    events = state.execute(2)
+
+    assert events[0] == (EXECUTED, 2, 0)
+    assert (SHOWN, 3, 1) in events
+    assert not state.alive[2]
+    assert state.red_neighbors[3] == 1
+
+
+def test_red_wins_when_two_tokens_left():
+    state = GameState([True, False, False, False], demon=0)
+    state.execute(1)
+    events = state.kill(2)
+
+    assert events[-1] == (WON, -1, RED)
+    assert state.winner == RED
+
+
+def test_hitting_demon_keeps_it_alive():
+    for transition in (GameState.execute, GameState.kill):
+        state = GameState([False, True, False, False, False], demon=1)
+
+        events = transition(state, 1)
+
+        assert events == ((WON, 1, BLUE),)
+        assert state.winner == BLUE
+        assert state.alive[1]
+        assert not any(kind in (EXECUTED, KILLED) for kind, _, _ in events)
+
+
+def test_snapshot_does_not_write_demon_as_dead():
+    for action in ('execute', 'kill'):
+        snapshot = make_snapshot()
+
+        getattr(snapshot, action)(5)
+
+        assert snapshot.winner == BLUE
+        assert snapshot.token(5)['alive'] == 1
+        assert not snapshot.dirty
+
+
+def test_engine_and_bot_recount_agree():
+    rng = random.Random(5)
+    for _ in range(200):
+        tokens_count = rng.randint(7, 16)
+        red_ids = rng.sample(range(1, tokens_count + 1), rng.randint(1, 4))
+        snapshot = make_snapshot(tokens_count, red_ids, red_ids[0])
+        snapshot.recount_red_neighbors()
+        for _ in range(rng.randint(0, tokens_count)):
+            targets = [token_id for token_id in snapshot.alive_tokens() if token_id != red_ids[0]]
+            if snapshot.winner or not targets:
+                break
+            rng.choice((snapshot.execute, snapshot.kill))(rng.choice(targets))
+
+        expected = compute_red_neighbors(snapshot.token_list())
+        assert {token_id: snapshot.token(token_id)['red_neighbors'] for token_id in expected} == expected
@@ -0,0 +1,75 @@
+# tests/test_game_snapshot.py
+
+import asyncio
+
+import game_snapshot
+from game_engine import BLUE
+from game_snapshot import load_game_snapshot
+
+
+def create_game(database):
+    """
+    7 жетонов: 2 - красный, 5 - демон; числа соседей в базе ещё не посчитаны.
+    """
+    game_id = database.add_game_set(7, 2, 'player', 200, 'moderator', 100)
+    database.add_tokens(game_id, [('blue', 'townfolk', 0)] * 7)
+    database.update_tokens_bulk(game_id, {
+        2: {'alignment': 'red', 'character': 'minion'},
+        5: {'alignment': 'red', 'character': 'demon'},
+    })
+    return game_id
+
+
+def test_commit_writes_all_changes_in_one_call(temp_db, monkeypatch):
+    game_id = create_game(temp_db)
+    calls = []
+    update_tokens_bulk = game_snapshot.update_tokens_bulk
+
+    async def counting_update(game_id, changes):
+        calls.append(changes)
+        return await update_tokens_bulk(game_id, changes)
+
+    monkeypatch.setattr(game_snapshot, 'update_tokens_bulk', counting_update)
+
+    async def scenario():
+        snapshot = await load_game_snapshot(200)
+        snapshot.recount_red_neighbors()
+        snapshot.execute(3)
+        assert snapshot.dirty
+        applied = await snapshot.commit()
+        assert not snapshot.dirty
+        return snapshot, applied, await snapshot.commit()
+
+    snapshot, applied, second = asyncio.run(scenario())
+
+    # Жетон 4 сначала получил 1, а после казни 3 - 2: в базу попадает только итог
+    assert applied == {
+        1: {'red_neighbors': (0, 1)},
+        3: {'red_neighbors': (0, 1), 'alive': (1, 0)},
+        4: {'red_neighbors': (0, 2)},
+        6: {'red_neighbors': (0, 1)},
+    }
+    assert len(calls) == 1
+    assert second == {}
+    tokens = {token['id']: token for token in temp_db.get_all_tokens(game_id)}
+    assert [tokens[token_id]['red_neighbors'] for token_id in range(1, 8)] == [1, 0, 1, 2, 0, 1, 0]
+    assert tokens[3]['alive'] == 0
+    assert snapshot.token_list() == temp_db.get_all_tokens(game_id)
+
+
+def test_snapshot_of_unknown_user_is_none(temp_db):
+    assert asyncio.run(load_game_snapshot(999)) is None
+
+
+def test_commit_after_demon_hit_writes_nothing(temp_db):
+    create_game(temp_db)
+
+    async def scenario():
+        snapshot = await load_game_snapshot(100)
+        snapshot.execute(5)
+        return snapshot, await snapshot.commit()
+
+    snapshot, applied = asyncio.run(scenario())
+
+    assert snapshot.winner == BLUE
+    assert applied == {}
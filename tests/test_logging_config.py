@@ -0,0 +1,82 @@
+# tests/test_logging_config.py
+
+import asyncio
+import json
+import logging
+import queue
+
+from logging_config import (
+    ContextFilter,
+    DeferredQueueHandler,
+    JsonFormatter,
+    SamplingFilter,
+    bind_log_context,
+    clear_log_context,
+    parse_sampling,
+)
+
+
+def make_record(name='database', level=logging.INFO, msg='запрос', args=()):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_parse_sampling():
+    assert parse_sampling('database=10, game_process_handlers=5,,') == {'database': 10, 'game_process_handlers': 5}
+    assert parse_sampling('noisy=0') == {'noisy': 1}
+    assert parse_sampling('') == {}
+
+
+def test_sampling_keeps_every_nth_below_warning():
+    sampling = SamplingFilter({'database': 3})
+
+    kept = [sampling.filter(make_record()) for _ in range(7)]
+
+    assert kept == [True, False, False, True, False, False, True]
+    # Предупреждения, другие логгеры и потомки настроенного логгера
+    assert all(sampling.filter(make_record(level=logging.WARNING)) for _ in range(5))
+    assert all(sampling.filter(make_record(name='bot')) for _ in range(5))
+    assert [sampling.filter(make_record(name='database.tokens')) for _ in range(4)] == [True, False, False, True]
+
+
+def test_context_filter_adds_bound_fields():
+    context_filter = ContextFilter()
+
+    async def handle(user_id, game_id):
+        clear_log_context()
+        bind_log_context(user_id=user_id)
+        await asyncio.sleep(0)
+        bind_log_context(game_id=game_id)
+        await asyncio.sleep(0)
+        record = make_record()
+        context_filter.filter(record)
+        return record.user_id, record.game_id
+
+    async def scenario():
+        # Одновременные обновления не видят контекст друг друга
+        return await asyncio.gather(handle(200, 1), handle(300, 2))
+
+    assert asyncio.run(scenario()) == [(200, 1), (300, 2)]
+
+    clear_log_context()
+    record = make_record()
+    context_filter.filter(record)
+    assert record.user_id is None and record.game_id is None
+
+
+def test_queued_record_keeps_mutable_args_and_formats_json():
+    log_queue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    tokens = [1, 2]
+
+    bind_log_context(user_id=200, game_id=7)
+    try:
+        handler.handle(make_record(msg='Жетоны %s, игра %d', args=(tokens, 7)))
+    finally:
+        clear_log_context()
+    tokens.append(3)
+
+    entry = json.loads(JsonFormatter().format(log_queue.get_nowait()))
+    assert entry['msg'] == 'Жетоны [1, 2], игра 7'
+    assert entry['user_id'] == 200 and entry['game_id'] == 7
+    assert entry['level'] == 'INFO' and entry['logger'] == 'database'
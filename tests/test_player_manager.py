@@ -0,0 +1,46 @@
+# tests/test_player_manager.py
+
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import player_manager
+
+
+def test_moderator_notice_does_not_wait_for_sends(monkeypatch, caplog):
+    async def get_moderators():
+        return [{'id': 1, 'username': 'first'}, {'id': 2, 'username': 'blocked'}]
+
+    monkeypatch.setattr(player_manager, 'get_moderators', get_moderators)
+
+    async def scenario():
+        release = asyncio.Event()
+        sent = []
+        tasks = []
+
+        class SlowBot:
+            async def send_message(self, chat_id, text):
+                await release.wait()
+                if chat_id == 2:
+                    raise RuntimeError("bot was blocked by the user")
+                sent.append(chat_id)
+
+        def create_task(coroutine):
+            task = asyncio.create_task(coroutine)
+            tasks.append(task)
+            return task
+
+        context = SimpleNamespace(bot=SlowBot(), application=SimpleNamespace(create_task=create_task))
+
+        # Обработчик возвращается, пока рассылка ещё ждёт Telegram
+        await asyncio.wait_for(player_manager.player_start_game_notice(context, 'player', 200), timeout=1)
+        assert sent == [] and len(tasks) == 1
+
+        release.set()
+        await asyncio.gather(*tasks)
+        await asyncio.sleep(0)
+        return sent
+
+    with caplog.at_level(logging.ERROR, logger='player_manager'):
+        assert asyncio.run(scenario()) == [1]
+    assert "модератору blocked (2)" in caplog.text
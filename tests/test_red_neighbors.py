@@ -0,0 +1,45 @@
+# tests/test_red_neighbors.py
+
+import asyncio
+
+from red_neighbors_handlers import compute_red_neighbors, count_red_neighbors_of_blue_tokens
+
+
+def make_tokens():
+    """
+    7 жетонов: 2 - красный демон, 3 - мёртв, 5 - пьяный синий, который показывает 2.
+    """
+    tokens = [
+        {'id': token_id, 'alignment': 'blue', 'character': 'townfolk', 'red_neighbors': 0, 'alive': 1, 'drunk': 0}
+        for token_id in range(1, 8)
+    ]
+    tokens[1].update(alignment='red', character='demon')
+    tokens[2]['alive'] = 0
+    tokens[4].update(drunk=1, red_neighbors=2)
+    return tokens
+
+
+def test_compute_skips_red_dead_and_drunk_tokens():
+    # Мёртвый жетон 3 выпал из круга: у жетона 4 соседи 2 и 5
+    assert compute_red_neighbors(make_tokens()) == {1: 1, 4: 1, 6: 0, 7: 0}
+
+
+def test_recount_writes_only_changed_tokens(temp_db):
+    game_id = temp_db.add_game_set(7, 1, 'player', 200, 'moderator', 100)
+    temp_db.add_tokens(game_id, [('blue', 'townfolk', 0)] * 7)
+    temp_db.update_tokens_bulk(game_id, {
+        token['id']: {field: token[field] for field in ('alignment', 'character', 'red_neighbors', 'alive', 'drunk')}
+        for token in make_tokens()
+    })
+
+    async def scenario():
+        return await count_red_neighbors_of_blue_tokens(game_id), await count_red_neighbors_of_blue_tokens(game_id)
+
+    first, second = asyncio.run(scenario())
+
+    assert first == {1, 4}
+    assert second == set()
+    tokens = {token['id']: token for token in temp_db.get_all_tokens(game_id)}
+    assert {token_id: tokens[token_id]['red_neighbors'] for token_id in tokens} == {
+        1: 1, 2: 0, 3: 0, 4: 1, 5: 2, 6: 0, 7: 0,
+    }
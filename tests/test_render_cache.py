@@ -0,0 +1,43 @@
+# tests/test_render_cache.py
+
+from render_cache import RenderCache
+
+
+def test_evicts_least_recently_used_by_byte_budget():
+    cache = RenderCache(max_bytes=10)
+    cache.put('a', b'aaaa')
+    cache.put('b', b'bbb')
+    cache.put('c', b'cc')
+    assert cache.get('a') == b'aaaa'  # 'a' теперь использовалась последней
+
+    cache.put('d', b'ddd')  # 12 байт > 10: вытесняется 'b'
+
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == [b'aaaa', b'cc', b'ddd']
+    assert cache.size_bytes == 9 and len(cache) == 3
+
+    cache.put('e', b'eeeeeeee')  # вытесняются все, кроме новой записи
+    assert len(cache) == 1 and cache.size_bytes == 8
+
+
+def test_replacing_key_updates_size():
+    cache = RenderCache(max_bytes=10)
+    cache.put('a', b'aaaa')
+    cache.put('a', b'aaaaaaa')
+    cache.put('b', b'bbb')
+
+    assert cache.size_bytes == 10
+    assert cache.get('a') == b'aaaaaaa' and cache.get('b') == b'bbb'
+
+
+def test_entry_larger_than_budget_is_not_cached():
+    cache = RenderCache(max_bytes=4)
+    cache.put('a', b'aa')
+    cache.put('big', b'12345')
+
+    assert cache.get('big') is None
+    assert cache.get('a') == b'aa'
+    assert cache.stats() == {'entries': 1, 'size_bytes': 2, 'max_bytes': 4, 'hits': 1, 'misses': 1}
+
+    cache.clear()
+    assert len(cache) == 0 and cache.size_bytes == 0
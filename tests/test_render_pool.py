@@ -0,0 +1,35 @@
+# tests/test_render_pool.py
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import render_pool
+from render_pool import RenderPool
+
+RENDER_TIME = 0.05
+
+
+def test_queue_wait_is_not_counted_as_render_time(monkeypatch):
+    def render(*args):
+        time.sleep(RENDER_TIME)
+        return b'png' + bytes(args)
+    monkeypatch.setattr(render_pool, 'get_board_renderer', lambda: SimpleNamespace(render=render))
+    pool = RenderPool(kind='thread', workers=1, queue_size=1)
+
+    async def scenario():
+        return await asyncio.gather(*(pool.render(index) for index in range(3)))
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+    assert [png_bytes for png_bytes, _, _ in results] == [b'png\x00', b'png\x01', b'png\x02']
+    for _, _, render_seconds in results:
+        assert RENDER_TIME * 0.8 <= render_seconds < RENDER_TIME * 1.8
+    # Третья отрисовка ждёт две предыдущие
+    assert max(wait_seconds for _, wait_seconds, _ in results) >= RENDER_TIME * 1.8
+    stats = pool.stats()
+    assert stats['completed'] == 3
+    assert stats['render_seconds'] == sum(render_seconds for _, _, render_seconds in results)
@@ -0,0 +1,101 @@
+# tests/test_seating_solver.py
+
+import random
+from itertools import combinations
+
+from board_codec import board_from_state, decode_board, visible_board, unpack_board
+from game_engine import GameState
+from seating_solver import solve_seating
+
+
+def alive_ring(alive):
+    positions = [position for position, is_alive in enumerate(alive) if is_alive]
+    return {position: (positions[index - 1], positions[(index + 1) % len(positions)])
+            for index, position in enumerate(positions)}
+
+
+def brute_force(boards, red_count, max_drunk=1):
+    """
+    Прямой перебор: boards - список (alive, shown), последняя доска текущая.
+    """
+    tokens_count = len(boards[-1][0])
+    seatings = 0
+    for reds in combinations(range(tokens_count), red_count):
+        if not any(boards[-1][0][position] for position in reds):
+            continue
+        consistent = True
+        for alive, shown in boards:
+            mismatches = 0
+            for position, (left, right) in alive_ring(alive).items():
+                if position in reds or shown[position] is None:
+                    continue
+                count = 0 if left == position else (left in reds) + (right in reds)
+                mismatches += count != shown[position]
+            consistent = consistent and mismatches <= max_drunk
+        seatings += consistent
+    return seatings
+
+
+def player_board(state):
+    return visible_board(decode_board(board_from_state(state)), moderator=False)
+
+
+def play_history(rng, tokens_count, red_count, days):
+    red_positions = rng.sample(range(tokens_count), red_count)
+    state = GameState([position in red_positions for position in range(tokens_count)], red_positions[0])
+    history = []
+    for _ in range(days):
+        for position in red_positions:
+            state.set_bluff(position, rng.randint(0, 2))
+        state.sober_all()
+        blue = [p for p in state.alive_positions() if not state.red[p]]
+        if blue:
+            state.set_drunk(rng.choice(blue), rng.randint(0, 2))
+        history.append(player_board(state))
+        targets = [p for p in state.alive_positions() if p != state.demon]
+        state.execute(rng.choice(targets))
+        targets = [p for p in state.alive_positions() if p != state.demon]
+        state.kill(rng.choice(targets))
+        if state.winner:
+            break
+    return state, history
+
+
+def as_day(board):
+    tokens_count, _, alive, _, _, shown = unpack_board(board)
+    return [bool(alive >> position & 1) for position in range(tokens_count)], shown
+
+
+def test_history_matches_brute_force():
+    rng = random.Random(3)
+    for _ in range(60):
+        tokens_count = rng.randint(7, 12)
+        red_count = rng.randint(1, 3)
+        state, history = play_history(rng, tokens_count, red_count, days=3)
+        current = decode_board(player_board(state))
+
+        result = solve_seating(current, red_count, history=history)
+
+        boards = [as_day(board) for board in history] + [as_day(player_board(state))]
+        assert result['seatings'] == brute_force(boards, red_count)
+        assert result['seatings'] >= 1
+        assert result['red'][state.demon + 1] > 0
+
+
+def test_history_rules_out_seatings():
+    # День 1: все живы, жетон 2 трезвый синий и показывает 0 - значит 1 и 3 синие.
+    # День 2: жетон 2 мёртв, текущая карта сама по себе допускает красный жетон 1.
+    tokens_count = 7
+    day_one = GameState([False] * tokens_count)
+    history = (player_board(day_one),)
+    current = [
+        {'id': token_id, 'alignment': 'blue', 'character': 'townfolk',
+         'red_neighbors': 1 if token_id in (3, 7) else 0, 'alive': 0 if token_id == 2 else 1, 'drunk': 0}
+        for token_id in range(1, tokens_count + 1)
+    ]
+
+    without_history = solve_seating(current, 1, max_drunk=0)
+    with_history = solve_seating(current, 1, max_drunk=0, history=history)
+
+    assert without_history['red'][1] == 1.0
+    assert with_history['seatings'] == 0
@@ -0,0 +1,81 @@
+# tests/test_sqlite_persistence.py
+
+import asyncio
+import logging
+
+import async_database
+from sqlite_persistence import SQLitePersistence
+
+
+def test_flush_round_trip(temp_db):
+    async def scenario():
+        persistence = SQLitePersistence()
+        await persistence.update_user_data(200, {'game_set': {'id': 1, 'player_username': 'player'}})
+        await persistence.update_user_data(300, {'stale': True})
+        await persistence.update_chat_data(200, {'board': 'abc'})
+        await persistence.update_bot_data({'version': 2})
+        await persistence.update_conversation('moderator_conv', (200, 200), 5)
+        await persistence.drop_user_data(300)
+        await persistence.flush()
+
+        restored = SQLitePersistence()
+        return persistence, restored, (
+            await restored.get_user_data(),
+            await restored.get_chat_data(),
+            await restored.get_bot_data(),
+            await restored.get_conversations('moderator_conv'),
+        )
+
+    persistence, restored, (user_data, chat_data, bot_data, conversations) = asyncio.run(scenario())
+
+    assert user_data == {200: {'game_set': {'id': 1, 'player_username': 'player'}}}
+    assert chat_data == {200: {'board': 'abc'}}
+    assert bot_data == {'version': 2}
+    assert conversations == {(200, 200): 5}
+    assert persistence.flushes >= 1
+
+
+def test_unchanged_values_are_not_written_again(temp_db):
+    async def scenario():
+        persistence = SQLitePersistence()
+        await persistence.update_user_data(200, {'a': 1})
+        await persistence.flush()
+        flushes = persistence.flushes
+        await persistence.update_user_data(200, {'a': 1})
+        await persistence.flush()
+        return flushes, persistence.flushes
+
+    flushes_before, flushes_after = asyncio.run(scenario())
+    assert flushes_after == flushes_before
+
+
+def test_failed_write_is_requeued(temp_db, monkeypatch, caplog):
+    save_persistence = async_database.save_persistence
+    attempts = []
+
+    async def failing_once(upserts, deletes, db_path):
+        attempts.append(sorted(key for _, key, _ in upserts))
+        if len(attempts) == 1:
+            # Пока идёт неудачная запись, приходит более новое значение
+            await persistence.update_user_data(200, {'turn': 2})
+            raise OSError("disk I/O error")
+        await save_persistence(upserts, deletes, db_path)
+
+    monkeypatch.setattr(async_database, 'save_persistence', failing_once)
+    persistence = SQLitePersistence()
+
+    async def scenario():
+        await persistence.update_user_data(200, {'turn': 1})
+        await persistence.update_user_data(300, {'turn': 1})
+        # Фоновая запись падает и возвращает изменения в буфер, flush записывает их повторно
+        with caplog.at_level(logging.ERROR, logger='sqlite_persistence'):
+            await persistence.flush()
+        return await SQLitePersistence().get_user_data()
+
+    user_data = asyncio.run(scenario())
+
+    assert "disk I/O error" in caplog.text
+    assert attempts == [['200', '300'], ['200', '300']]
+    # Более новое значение не перезаписано старым из неудачной попытки
+    assert user_data == {200: {'turn': 2}, 300: {'turn': 1}}
+    assert persistence.flushes == 1
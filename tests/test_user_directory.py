@@ -0,0 +1,58 @@
+# tests/test_user_directory.py
+
+from db_connection import get_connection
+from user_directory import UserDirectory, get_user_directory
+
+
+def insert_user(user_id, username, moderator=0):
+    conn = get_connection()
+    with conn:
+        conn.execute('INSERT INTO users (id, username, moderator) VALUES (?, ?, ?)', (user_id, username, moderator))
+
+
+def test_loads_lazily_once(temp_db):
+    insert_user(1, 'moderator', 1)
+    directory = UserDirectory()
+    assert directory.stats()['users'] == 0 and directory.loads == 0
+
+    assert directory.get_by_username('moderator')['id'] == 1
+    assert directory.get_by_id(2) is None
+    insert_user(2, 'player')
+    # Записи в обход справочника не видны до invalidate
+    assert directory.get_by_id(2) is None
+    assert directory.loads == 1
+
+    directory.invalidate()
+    assert directory.get_by_id(2) == {'id': 2, 'username': 'player', 'moderator': False, 'on_game': False}
+    assert directory.loads == 2
+    assert [user['id'] for user in directory.moderators()] == [1]
+
+
+def test_returns_copies(temp_db):
+    insert_user(1, 'player')
+    directory = UserDirectory()
+    directory.get_by_id(1)['username'] = 'changed'
+    assert directory.get_by_id(1)['username'] == 'player'
+
+
+def test_database_writes_go_through_directory(temp_db):
+    directory = get_user_directory()
+    assert temp_db.get_moderators() == []
+    loads = directory.loads
+
+    temp_db.add_user('moderator', 1, moderator=True)
+    temp_db.add_user('player', 2)
+    temp_db.update_user_on_game(2, True)
+    temp_db.add_user('renamed_player', 2)
+
+    assert temp_db.get_moderators() == [{'id': 1, 'username': 'moderator'}]
+    assert temp_db.get_user_by_username('player') is None
+    assert temp_db.get_user_by_username('renamed_player') == {
+        'id': 2, 'username': 'renamed_player', 'moderator': False, 'on_game': True,
+    }
+    assert temp_db.is_user_moderator(1) and not temp_db.is_user_moderator(2)
+    # Справочник не перечитывался: все изменения внесены при записи
+    assert directory.loads == loads
+
+    directory.invalidate()
+    assert temp_db.get_user_by_id(2)['on_game'] is True
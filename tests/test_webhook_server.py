@@ -0,0 +1,90 @@
+# tests/test_webhook_server.py
+
+import asyncio
+import json
+import warnings
+from types import SimpleNamespace
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from telegram import Bot, Update
+
+from webhook_server import DRAINING_KEY, SECRET_TOKEN_HEADER, create_webhook_app
+
+HEADERS = {SECRET_TOKEN_HEADER: 'secret'}
+
+# Обновление в том виде, в каком его присылает Telegram
+RECORDED_UPDATE = {
+    'update_id': 10001,
+    'message': {
+        'message_id': 7,
+        'date': 1700000000,
+        'chat': {'id': 200, 'type': 'private', 'username': 'player', 'first_name': 'Player'},
+        'from': {'id': 200, 'is_bot': False, 'first_name': 'Player', 'username': 'player'},
+        'text': '/start',
+        'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+    },
+}
+
+
+def make_application():
+    # Bot не инициализируется: de_json только привязывает его к объектам обновления
+    return SimpleNamespace(bot=Bot('123456:TEST'), update_queue=asyncio.Queue())
+
+
+def post(app, body, headers=HEADERS):
+    async def scenario():
+        async with TestClient(TestServer(app)) as client:
+            response = await client.post('/telegram', data=body,
+                                         headers={'Content-Type': 'application/json', **headers})
+            return response.status
+    return asyncio.run(scenario())
+
+
+def test_valid_update_is_queued():
+    application = make_application()
+    app = create_webhook_app(application, path='/telegram', secret_token='secret')
+
+    assert post(app, json.dumps(RECORDED_UPDATE)) == 200
+
+    update = application.update_queue.get_nowait()
+    assert isinstance(update, Update)
+    assert update.update_id == 10001
+    assert update.message.text == '/start'
+    assert update.effective_user.id == 200
+    assert application.update_queue.empty()
+
+
+@pytest.mark.parametrize('body', [
+    b'{not json',
+    b'\xff\xfe',
+    b'',
+    b'[]',
+    b'"text"',
+    b'{"update_id": 1, "message": 5}',
+])
+def test_malformed_update_is_rejected(body):
+    application = make_application()
+    app = create_webhook_app(application, path='/telegram', secret_token='secret')
+
+    assert post(app, body) == 400
+    assert application.update_queue.empty()
+
+
+def test_draining_rejects_new_updates_without_warnings():
+    application = SimpleNamespace(bot=None, update_queue=asyncio.Queue())
+    app = create_webhook_app(application, path='/telegram', secret_token='secret')
+
+    async def scenario():
+        async with TestClient(TestServer(app)) as client:
+            headers = {SECRET_TOKEN_HEADER: 'secret'}
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                app[DRAINING_KEY].set()
+            response = await client.post('/telegram', json={'update_id': 1}, headers=headers)
+            assert response.status == 503
+            response = await client.post('/telegram', json={'update_id': 1}, headers={SECRET_TOKEN_HEADER: 'wrong'})
+            assert response.status == 403
+
+    asyncio.run(scenario())
+    assert application.update_queue.empty()
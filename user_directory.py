@@ -0,0 +1,150 @@
+# user_directory.py
+
+import logging
+import threading
+from db_connection import get_connection
+
+logger = logging.getLogger(__name__)
+
+
+class UserDirectory:
+    """
+    Копия таблицы users в памяти с индексами по id и username.
+    Загружается целиком при первом обращении, дальше изменения пользователей
+    вносятся сюда сразу после записи в базу (write-through).
+    """
+
+    def __init__(self, db_path='empaths.db'):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._by_id = None
+        self._by_username = None
+
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def _ensure_loaded(self):
+        if self._by_id is not None:
+            return
+        conn = get_connection(self.db_path)
+        rows = conn.execute('SELECT id, username, moderator, on_game FROM users').fetchall()
+        self._by_id = {}
+        self._by_username = {}
+        for user_id, username, moderator, on_game in rows:
+            self._store(user_id, username, moderator, on_game)
+        self.loads += 1
+        logger.info(f"Справочник пользователей загружен: {len(self._by_id)} пользователей.")
+
+    def _store(self, user_id, username, moderator, on_game):
+        previous = self._by_id.get(user_id)
+        if previous is not None and self._by_username.get(previous['username']) is previous:
+            del self._by_username[previous['username']]
+        user = {
+            'id': user_id,
+            'username': username,
+            'moderator': bool(moderator),
+            'on_game': bool(on_game)
+        }
+        self._by_id[user_id] = user
+        if username is not None:
+            self._by_username[username] = user
+
+    def _found(self, user):
+        if user is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(user)
+
+    def get_by_id(self, user_id):
+        """
+        Возвращает копию данных пользователя по id или None.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return self._found(self._by_id.get(user_id))
+
+    def get_by_username(self, username):
+        """
+        Возвращает копию данных пользователя по username или None.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return self._found(self._by_username.get(username))
+
+    def all_users(self):
+        """
+        Возвращает копии данных всех пользователей.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            self.hits += 1
+            return [dict(user) for user in self._by_id.values()]
+
+    def moderators(self):
+        """
+        Возвращает копии данных всех модераторов.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            self.hits += 1
+            return [dict(user) for user in self._by_id.values() if user['moderator']]
+
+    def put(self, user_id, username, moderator, on_game=False):
+        """
+        Добавляет или обновляет пользователя после записи в базу.
+        """
+        with self._lock:
+            if self._by_id is None:
+                return
+            previous = self._by_id.get(user_id)
+            if previous is not None and on_game is None:
+                on_game = previous['on_game']
+            self._store(user_id, username, moderator, bool(on_game))
+
+    def set_on_game(self, user_id, on_game):
+        """
+        Обновляет поле on_game после записи в базу.
+        """
+        with self._lock:
+            if self._by_id is None:
+                return
+            user = self._by_id.get(user_id)
+            if user is not None:
+                user['on_game'] = bool(on_game)
+
+    def invalidate(self):
+        """
+        Сбрасывает справочник; он будет перечитан из базы при следующем обращении.
+        """
+        with self._lock:
+            self._by_id = None
+            self._by_username = None
+
+    def stats(self):
+        """
+        Возвращает статистику обращений к справочнику.
+        """
+        with self._lock:
+            return {
+                'users': len(self._by_id) if self._by_id is not None else 0,
+                'hits': self.hits,
+                'misses': self.misses,
+                'loads': self.loads
+            }
+
+
+_directories = {}
+_directories_lock = threading.Lock()
+
+
+def get_user_directory(db_path='empaths.db'):
+    """
+    Возвращает справочник пользователей для указанной базы данных.
+    """
+    directory = _directories.get(db_path)
+    if directory is None:
+        with _directories_lock:
+            directory = _directories.setdefault(db_path, UserDirectory(db_path))
+    return directory
@@ -0,0 +1,130 @@
+# webhook_server.py
+
+import asyncio
+import hmac
+import json
+import logging
+import os
+import signal
+from aiohttp import web
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8080))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+# Публичный адрес бота. Если не задан, setWebhook не вызывается (например, при локальной проверке)
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN')
+# Сколько секунд ждать завершения запросов, которые уже принимаются, при остановке сервера
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT', 30))
+
+SECRET_TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+APPLICATION_KEY = web.AppKey('application')
+SECRET_TOKEN_KEY = web.AppKey('secret_token', str)
+DRAINING_KEY = web.AppKey('draining', asyncio.Event)
+
+
+async def handle_update(request: web.Request) -> web.Response:
+    """
+    Принимает обновление от Telegram и кладёт его в очередь приложения.
+    """
+    secret_token = request.app[SECRET_TOKEN_KEY]
+    if secret_token:
+        received = request.headers.get(SECRET_TOKEN_HEADER, '')
+        if not hmac.compare_digest(received.encode(), secret_token.encode()):
+            logger.warning(f"Отклонён запрос к вебхуку с неверным секретным токеном от {request.remote}.")
+            return web.Response(status=403)
+
+    # Во время остановки новые обновления не принимаем: Telegram повторит их позже
+    if request.app[DRAINING_KEY].is_set():
+        return web.Response(status=503)
+
+    try:
+        data = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        logger.warning("Получено обновление с некорректным JSON.")
+        return web.Response(status=400)
+
+    application = request.app[APPLICATION_KEY]
+    if not isinstance(data, dict):
+        logger.warning("Получено обновление, которое не является JSON-объектом.")
+        return web.Response(status=400)
+    try:
+        update = Update.de_json(data, application.bot)
+    except (TypeError, ValueError, KeyError, AttributeError) as e:
+        logger.warning(f"Не удалось разобрать обновление: {e}")
+        return web.Response(status=400)
+    if update is None:
+        return web.Response(status=400)
+    await application.update_queue.put(update)
+    return web.Response()
+
+
+def create_webhook_app(application, path=WEBHOOK_PATH, secret_token=WEBHOOK_SECRET_TOKEN) -> web.Application:
+    """
+    Создаёт aiohttp-приложение, которое передаёт обновления в application.update_queue.
+    app[DRAINING_KEY] - asyncio.Event: после set() новые обновления получают 503.
+    Событие кладётся в приложение до запуска, потому что после runner.setup() приложение заморожено.
+    """
+    app = web.Application()
+    app[APPLICATION_KEY] = application
+    app[SECRET_TOKEN_KEY] = secret_token
+    app[DRAINING_KEY] = asyncio.Event()
+    app.router.add_post(path, handle_update)
+    return app
+
+
+async def serve_webhook(application, listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT, path=WEBHOOK_PATH,
+                        webhook_url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET_TOKEN):
+    """
+    Запускает приложение в режиме вебхука и работает до SIGINT/SIGTERM.
+    При остановке сервер перестаёт принимать обновления, дожидается обработки
+    уже полученных и только затем останавливает приложение.
+    """
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+
+    webhook_app = create_webhook_app(application, path, secret_token)
+    runner = web.AppRunner(webhook_app, shutdown_timeout=WEBHOOK_DRAIN_TIMEOUT)
+    await runner.setup()
+    site = web.TCPSite(runner, listen, port)
+    await site.start()
+    logger.info(f"Вебхук слушает http://{listen}:{port}{path}")
+
+    if webhook_url:
+        await application.bot.set_webhook(
+            url=webhook_url,
+            secret_token=secret_token,
+            allowed_updates=Update.ALL_TYPES
+        )
+        logger.info(f"Вебхук зарегистрирован в Telegram: {webhook_url}")
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+
+    try:
+        await stop_event.wait()
+    finally:
+        logger.info("Остановка вебхука: ждём обработки полученных обновлений...")
+        webhook_app[DRAINING_KEY].set()
+        await runner.cleanup()
+        # Application.stop обрабатывает все обновления, которые уже лежат в очереди
+        await application.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        logger.info("Вебхук остановлен.")
+
+
+def run_webhook(application):
+    """
+    Синхронная обёртка над serve_webhook, аналог application.run_polling().
+    """
+    asyncio.run(serve_webhook(application))